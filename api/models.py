@@ -1,3 +1,4 @@
+import re
 from typing import Union, Literal, List, Optional
 from pydantic import BaseModel, Field, field_validator, model_validator
 from enum import Enum
@@ -18,22 +19,16 @@ class GPUConfig(BaseModel):
     enabled: bool = Field(default=False, description="是否启用GPU加速")
     num_devices: int = Field(default=1, ge=1, le=8, description="GPU设备数量")
     num_workers: int = Field(default=4, ge=1, le=16, description="GPU工作进程数")
-    torch_device: str = Field(default="cuda", description="PyTorch设备")
-    cuda_visible_devices: str = Field(default="0", description="可见GPU设备")
+    torch_device: str = Field(
+        default="cuda", description="PyTorch设备（由设备调度器按分配的设备决定）"
+    )
+    cuda_visible_devices: str = Field(
+        default="0", description="允许使用的GPU编号，设备调度器在其中分配空闲设备"
+    )
 
-    def apply_environment(self):
-        """应用GPU环境变量"""
-        import os
 
-        if self.enabled:
-            os.environ["NUM_DEVICES"] = str(self.num_devices)
-            os.environ["NUM_WORKERS"] = str(self.num_workers)
-            os.environ["TORCH_DEVICE"] = self.torch_device
-            os.environ["CUDA_VISIBLE_DEVICES"] = self.cuda_visible_devices
-            print(
-                f"🔧 GPU环境变量已应用: 设备数={self.num_devices}, "
-                f"工作进程={self.num_workers}"
-            )
+# 页码范围格式：逗号分隔的页码或页码区间（从1开始），如 "1-3,7,10-12"
+PAGE_RANGE_PATTERN = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
 
 
 class BaseConversionConfig(BaseModel):
@@ -42,6 +37,30 @@ class BaseConversionConfig(BaseModel):
     output_format: OutputFormat = Field(
         default=OutputFormat.markdown, description="输出格式"
     )
+    capture_profile: bool = Field(
+        default=False, description="是否采集cProfile性能剖析（用于排查慢任务）"
+    )
+    page_range: Optional[str] = Field(
+        default=None,
+        description='转换页码范围（从1开始），如 "1-3,7,10-12"；为空时转换全部页面',
+    )
+
+    @field_validator("page_range")
+    @classmethod
+    def validate_page_range(cls, v):
+        """验证页码范围格式"""
+        if v is None:
+            return v
+        v = re.sub(r"\s+", "", v)
+        if not v:
+            return None
+        if not PAGE_RANGE_PATTERN.match(v):
+            raise ValueError(f"页码范围格式无效: {v}")
+        for part in v.split(","):
+            start, _, end = part.partition("-")
+            if int(start) < 1 or (end and int(end) < int(start)):
+                raise ValueError(f"页码范围无效: {part}")
+        return v
 
 
 class MarkerConfig(BaseConversionConfig):
@@ -61,13 +80,15 @@ class MarkerConfig(BaseConversionConfig):
         default=True, description="是否禁用图片提取以提升速度"
     )
 
+    # 额外输出格式 - 与主输出共享同一次模型推理，只额外运行渲染器
+    extra_output_formats: List[OutputFormat] = Field(
+        default_factory=list,
+        description="同一次转换额外生成的输出格式（如 markdown 之外再输出 chunks）",
+    )
+
     # GPU配置 - 使用统一的对象结构
     gpu_config: GPUConfig = Field(default_factory=GPUConfig, description="GPU配置")
 
-    def apply_gpu_environment(self):
-        """应用GPU环境变量"""
-        self.gpu_config.apply_environment()
-
     def get_gpu_config_dict(self) -> dict:
         """获取GPU配置字典"""
         return self.gpu_config.model_dump()
@@ -88,6 +109,13 @@ class MarkerConfig(BaseConversionConfig):
         if self.force_ocr:
             print("⚠️ 警告: Marker模式下启用force_ocr可能不是最佳选择")
 
+        # 去除重复格式与主输出格式
+        self.extra_output_formats = [
+            output_format
+            for output_format in dict.fromkeys(self.extra_output_formats)
+            if output_format != self.output_format
+        ]
+
         return self
 
 
@@ -173,3 +201,23 @@ class ConversionResponse(BaseModel):
     success: bool = Field(description="是否成功")
     task_id: str = Field(description="任务ID")
     message: str = Field(description="响应消息")
+
+
+class BatchConversionRequest(BaseModel):
+    """批量转换请求模型 - 批次内全部文件使用同一份配置"""
+
+    config: Union[MarkerConfig, OCRConfig] = Field(
+        discriminator="conversion_mode", description="转换配置"
+    )
+
+
+class BatchConversionResponse(BaseModel):
+    """批量转换响应模型"""
+
+    success: bool = Field(description="是否成功")
+    batch_id: str = Field(description="批次ID")
+    task_ids: List[str] = Field(description="已提交的任务ID")
+    skipped: List[dict] = Field(
+        default_factory=list, description="未提交的任务 [{task_id, error}]"
+    )
+    message: str = Field(description="响应消息")
@@ -1,70 +1,93 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
-from fastapi.responses import FileResponse
+import json
+import asyncio
+import logging
+import importlib
+from functools import partial
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
 from api.models import (
     ConversionRequest,
     ConfigValidationResponse,
+    MarkerConfig,
     OCRConfig,
     ConversionResponse,
+    BatchConversionRequest,
+    BatchConversionResponse,
 )
 from utils.file_handler import FileHandler
 from utils.progress import progress_manager
+from utils.task_manifest import task_manifest
+from utils.bundle import bundle_cache, bundle_digest
+from utils.janitor import storage_janitor
+from utils.admission import (
+    admission_controller,
+    count_pdf_pages,
+    estimate_cost,
+    select_pages,
+)
+from utils.task_queue import conversion_queue, ConversionJob
+from utils.metrics import ADMISSION_REJECTIONS
+from utils.tracing import tracer, log_event
+from utils.checkpoint import CheckpointStore
+from utils.preflight import preflight_analyzer
+from utils.prerender import prerender_cache
+from utils.batch import (
+    batch_registry,
+    open_pdf_archive,
+    extract_member,
+    member_filename,
+    BATCH_MAX_FILES,
+)
+from utils.devices import device_scheduler
+from utils.cpu_budget import cpu_budget
+from utils.profiling import PROFILE_FILENAME, CPROFILE_FILENAME, CPROFILE_STATS_FILENAME
 
 from core.converter import convert_pdf_task
-from core.scan_converter import scan_convert_pdf_task
+from core.marker_worker import marker_warm_pool
 
 router = APIRouter()
 
 
+async def scan_convert_pdf_task(
+    pdf_path: str, task_id: str, config: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    OCR转换任务入口
+
+    扫描转换依赖 OpenCV、Tesseract 与 langdetect，首个OCR任务开始时才在线程中导入，
+    避免拖慢服务启动或阻塞事件循环
+    """
+    module = await asyncio.to_thread(importlib.import_module, "core.scan_converter")
+    return await module.scan_convert_pdf_task(pdf_path, task_id, config)
+
+
 def find_output_file(
-    output_path: Path, output_format: str = "markdown"
+    task_id: str, output_format: Optional[str] = None
 ) -> Optional[Path]:
     """
-    动态查找输出文件
+    通过任务清单查找输出文件
 
     Args:
-        output_path: 输出目录路径
-        output_format: 输出格式
+        task_id: 任务ID
+        output_format: 输出格式，为 None 时返回主输出
 
     Returns:
         找到的文件路径，如果未找到则返回None
     """
-    if not output_path.exists():
+    output_file = task_manifest.get_output_file(task_id, output_format)
+    if output_file is None or not output_file.exists():
         return None
+    task_manifest.touch(task_id)
+    return output_file
+
 
-    # 根据输出格式查找对应文件
-    if output_format in ["markdown", "md"]:
-        # 查找 .md 文件
-        md_files = list(output_path.glob("*.md"))
-        if md_files:
-            return md_files[0]  # 返回第一个找到的 .md 文件
-    elif output_format == "json":
-        # 查找 .json 文件
-        json_files = list(output_path.glob("*.json"))
-        if json_files:
-            return json_files[0]
-    elif output_format == "html":
-        # 查找 .html 文件
-        html_files = list(output_path.glob("*.html"))
-        if html_files:
-            return html_files[0]
-    elif output_format == "chunks":
-        # 查找 _chunks.json 文件
-        chunks_files = list(output_path.glob("*_chunks.json"))
-        if chunks_files:
-            return chunks_files[0]
-
-    # 如果没找到特定格式，尝试查找任何输出文件
-    all_files = []
-    all_files.extend(output_path.glob("*.md"))
-    all_files.extend(output_path.glob("*.json"))
-    all_files.extend(output_path.glob("*.html"))
-
-    if all_files:
-        return all_files[0]
-
-    return None
+def missing_output_detail(task_id: str, output_format: Optional[str] = None) -> str:
+    """输出文件不存在时的错误信息，区分任务没有结果与任务未生成指定的输出格式"""
+    if output_format and task_manifest.get_output_file(task_id) is not None:
+        return f"该任务未生成 {output_format} 输出"
+    return "结果文件不存在"
 
 
 @router.post("/validate-config", response_model=ConfigValidationResponse)
@@ -117,8 +140,9 @@ def _validate_marker_config(config_data: dict) -> ConfigValidationResponse:
     errors = []
     warnings = []
 
-    # 检查GPU配置
+    # 检查GPU配置（按服务器实际设备容量）
     gpu_config = config_data.get("gpu_config", {})
+    errors.extend(device_scheduler.validate(gpu_config))
     if gpu_config.get("enabled", False):
         # GPU启用时的验证
         if gpu_config.get("num_devices", 1) > 8:
@@ -210,56 +234,163 @@ async def auto_fix_config(config_data: dict):
         raise HTTPException(status_code=500, detail=f"配置自动修复失败: {str(e)}")
 
 
-@router.post("/convert", response_model=ConversionResponse)
-async def start_conversion(
-    request: ConversionRequest, background_tasks: BackgroundTasks
-):
-    """启动PDF转换任务 - 使用新的配置系统"""
-    try:
-        task_id = request.task_id
+def _get_client_id(http_request: Request) -> str:
+    """识别客户端，用于队列公平调度"""
+    client_id = http_request.headers.get("X-Client-ID")
+    if client_id:
+        return client_id
+    return http_request.client.host if http_request.client else "anonymous"
 
-        # 使用 FileHandler 查找文件
-        file_handler = FileHandler()
-        pdf_files = list(file_handler.upload_folder.glob(f"{task_id}_*"))
-        if not pdf_files:
-            raise HTTPException(status_code=404, detail="未找到上传的文件")
-
-        pdf_path = str(pdf_files[0])
-
-        # 启动进度跟踪
-        progress_manager.start_task(task_id)
-
-        # 配置处理
-        config_dict = request.config.dict()
-
-        # 根据配置类型自动分发
-        if isinstance(request.config, OCRConfig):
-            # OCR转换任务 - 无需GPU配置
-            background_tasks.add_task(
-                scan_convert_pdf_task,
-                pdf_path=pdf_path,
-                task_id=task_id,
-                config=config_dict,
-            )
-            message = f"OCR转换任务已启动 (质量模式: {request.config.ocr_quality})"
 
-        else:  # MarkerConfig
-            # 应用GPU配置 - 仅Marker模式需要
-            if request.config.gpu_config.enabled:
-                request.config.apply_gpu_environment()
+def _select_task_func(config: Union[MarkerConfig, OCRConfig]):
+    """根据配置类型选择转换函数，返回 (转换函数, 响应消息)"""
+    if isinstance(config, OCRConfig):
+        # OCR转换任务 - 无需GPU配置
+        return (
+            scan_convert_pdf_task,
+            f"OCR转换任务已启动 (质量模式: {config.ocr_quality})",
+        )
 
-            # Marker转换任务
-            background_tasks.add_task(
-                convert_pdf_task, pdf_path=pdf_path, task_id=task_id, config=config_dict
-            )
-            gpu_status = "启用" if request.config.gpu_config.enabled else "禁用"
-            message = f"Marker转换任务已启动 (GPU: {gpu_status})"
+    # MarkerConfig - 设备由设备调度器在任务开始时分配，此处只按实际容量校验
+    errors = device_scheduler.validate(config.gpu_config.model_dump())
+    if errors:
+        raise HTTPException(status_code=400, detail="; ".join(errors))
+    gpu_status = "启用" if config.gpu_config.enabled else "禁用"
+    return convert_pdf_task, f"Marker转换任务已启动 (GPU: {gpu_status})"
+
+
+def _admission_error(reason: str, retry_after: Optional[int]) -> HTTPException:
+    """准入被拒绝时的响应"""
+    ADMISSION_REJECTIONS.inc(reason=reason)
+    if retry_after:
+        return HTTPException(
+            status_code=429,
+            detail=f"服务器繁忙: {reason}",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return HTTPException(status_code=503, detail=reason)
 
-        return ConversionResponse(success=True, task_id=task_id, message=message)
 
-    except Exception as e:
-        print(f"❌ [ERROR] 启动转换失败: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"启动转换失败: {str(e)}")
+@router.post("/convert", response_model=ConversionResponse)
+async def start_conversion(request: ConversionRequest, http_request: Request):
+    """启动PDF转换任务 - 使用新的配置系统"""
+    with tracer.span("api.convert", task_id=request.task_id) as span:
+        try:
+            task_id = request.task_id
+
+            # 通过任务清单查找上传文件
+            file_handler = FileHandler()
+            upload_path = file_handler.find_upload_file(task_id)
+            if upload_path is None:
+                raise HTTPException(status_code=404, detail="未找到上传的文件")
+
+            if task_id in conversion_queue.running or conversion_queue.position(
+                task_id
+            ):
+                raise HTTPException(status_code=409, detail="任务已在队列中")
+
+            pdf_path = str(upload_path)
+
+            # 配置处理（设备配置无效时在准入前拒绝）
+            config_dict = request.config.dict()
+            task_func, message = _select_task_func(request.config)
+
+            # 估算任务成本并进行准入控制（仅计入所选页码），优先使用上传时的预检结果
+            preflight = task_manifest.get_preflight(task_id)
+            if preflight is not None:
+                if preflight["needs_password"]:
+                    raise HTTPException(status_code=400, detail="PDF已加密，无法转换")
+                total_pages = preflight["page_count"]
+            else:
+                total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+            try:
+                pages = len(select_pages(request.config.page_range, total_pages))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            cost = estimate_cost(config_dict, pages)
+            span.set_attribute("mode", cost.mode)
+            span.set_attribute("pages", pages)
+            decision = admission_controller.try_admit(
+                task_id, cost, conversion_queue.projected_finish_times()
+            )
+            if not decision.admitted:
+                span.set_attribute("admission.rejected", decision.reason)
+                raise _admission_error(decision.reason, decision.retry_after)
+
+            # 以 Marker 模式转换时预渲染的扫描页不会被用到
+            if not isinstance(request.config, OCRConfig):
+                prerender_cache.discard(task_id)
+
+            position = conversion_queue.submit(
+                ConversionJob(
+                    task_id=task_id,
+                    func=task_func,
+                    kwargs={
+                        "pdf_path": pdf_path,
+                        "task_id": task_id,
+                        "config": config_dict,
+                    },
+                    cost=cost,
+                    client_id=_get_client_id(http_request),
+                )
+            )
+            span.set_attribute("queue.position", position)
+            if position:
+                message += f"，排队位置: {position}"
+
+            return ConversionResponse(success=True, task_id=task_id, message=message)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_event("❌ 启动转换失败", logging.ERROR, error=str(e))
+            raise HTTPException(status_code=500, detail=f"启动转换失败: {str(e)}")
+
+
+@router.post("/cancel/{task_id}")
+async def cancel_conversion(task_id: str, keep_partial: bool = False):
+    """取消转换任务，keep_partial 为 True 时保留已完成页面的输出"""
+    state = conversion_queue.cancel(task_id, keep_partial)
+    if state is None:
+        raise HTTPException(status_code=404, detail="任务不在队列中或已结束")
+
+    message = "任务已取消" if state == "queued" else "已请求取消，正在停止处理"
+    return {
+        "success": True,
+        "task_id": task_id,
+        "state": state,
+        "keep_partial": keep_partial,
+        "message": message,
+    }
+
+
+@router.get("/queue-status")
+async def get_queue_status():
+    """获取转换队列与准入控制状态"""
+    return {
+        "queue": conversion_queue.get_status(),
+        "admission": admission_controller.get_status(),
+        "devices": device_scheduler.get_status(),
+        "cpu_budget": cpu_budget.get_status(),
+        "speculation": {
+            "prerender": prerender_cache.get_status(),
+            "marker_warm": marker_warm_pool.get_status(),
+        },
+    }
+
+
+def _speculate(task_id: str, file_path: Path, report: Optional[dict]) -> None:
+    """利用上传到开始转换之间的空闲时间，按预检结果预渲染扫描页或预热 Marker 子进程"""
+    if report is None or report["needs_password"]:
+        return
+    if report["recommended_mode"] == "ocr":
+        from utils.ocr_engine import OCREngine
+
+        scale_factor = OCREngine.get_scan_image_enhancement()["scale_factor"]
+        prerender_cache.schedule(task_id, str(file_path), scale_factor)
+    elif report["recommended_mode"] == "marker" and not conversion_queue.running:
+        # 已有任务运行时不再额外占用模型内存
+        marker_warm_pool.warm()
 
 
 @router.post("/upload")
@@ -272,14 +403,20 @@ async def upload_file(file: UploadFile = File(...)):
         # 生成任务ID
         task_id = file_handler.generate_task_id()
 
-        # 保存文件
-        await file_handler.save_upload_file(file, task_id)
+        # 保存文件并立即预检（只解析文档结构，不渲染页面）
+        with tracer.span("api.upload", task_id=task_id, filename=file.filename):
+            file_path = await file_handler.save_upload_file(file, task_id)
+            report = await asyncio.to_thread(
+                preflight_analyzer.try_run, task_id, file_path
+            )
+            await asyncio.to_thread(_speculate, task_id, file_path, report)
 
         return {
             "success": True,
             "task_id": task_id,
             "filename": file.filename,
             "message": "文件上传成功",
+            "preflight": preflight_analyzer.summarize(report) if report else None,
         }
 
     except ValueError as e:
@@ -288,6 +425,284 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
 
 
+@router.get("/preflight/{task_id}")
+async def get_preflight(task_id: str, pages: bool = True):
+    """获取PDF预检结果（上传时已自动执行，未预检时立即执行），pages 控制是否返回逐页明细"""
+    try:
+        report = await asyncio.to_thread(preflight_analyzer.get, task_id, pages)
+        return {"task_id": task_id, **report}
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"预检失败: {str(e)}")
+
+
+# ==================== 批量任务 ====================
+
+
+@router.post("/batch/upload")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """批量上传：一次上传多个PDF或ZIP压缩包，每个PDF登记为一个任务并归入同一批次"""
+    try:
+        file_handler = FileHandler()
+        batch_id = batch_registry.generate_batch_id()
+
+        with tracer.span("api.batch_upload", batch_id=batch_id, files=len(files)):
+            # 上传内容已由框架缓存到临时文件，逐个文件、逐个ZIP成员流式写入上传目录，
+            # 不把整个文件或压缩包读入内存
+            documents = []
+            rejected = []
+            archives = []
+            try:
+                for file in files:
+                    await file.seek(0)
+                    if (file.filename or "").lower().endswith(".zip"):
+                        try:
+                            archive, members, skipped = await asyncio.to_thread(
+                                open_pdf_archive, file.file, file_handler.max_file_size
+                            )
+                        except ValueError as e:
+                            rejected.append(
+                                {"filename": file.filename, "error": str(e)}
+                            )
+                            continue
+                        archives.append(archive)
+                        rejected.extend(skipped)
+                        documents.extend(
+                            (member_filename(info), archive, info) for info in members
+                        )
+                    else:
+                        documents.append((file.filename, None, file.file))
+
+                if len(documents) > BATCH_MAX_FILES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"单个批次最多包含 {BATCH_MAX_FILES} 个PDF文件",
+                    )
+
+                saved = []
+                for filename, archive, source in documents:
+                    task_id = file_handler.generate_task_id()
+                    save = partial(
+                        file_handler.save_upload_stream,
+                        filename=filename,
+                        task_id=task_id,
+                    )
+                    try:
+                        if archive is None:
+                            file_path = await asyncio.to_thread(save, source)
+                        else:
+                            file_path = await asyncio.to_thread(
+                                extract_member, archive, source, save
+                            )
+                    except ValueError as e:
+                        rejected.append({"filename": filename, "error": str(e)})
+                        continue
+                    saved.append((task_id, filename, file_path))
+            finally:
+                for archive in archives:
+                    archive.close()
+
+            tasks = []
+            for task_id, filename, file_path in saved:
+                report = await asyncio.to_thread(
+                    preflight_analyzer.try_run, task_id, file_path
+                )
+                tasks.append(
+                    {
+                        "task_id": task_id,
+                        "filename": filename,
+                        "pages": report["page_count"] if report else None,
+                        "recommended_mode": (
+                            report["recommended_mode"] if report else None
+                        ),
+                    }
+                )
+
+            if not tasks:
+                raise HTTPException(status_code=400, detail="没有可转换的PDF文件")
+            batch_registry.create(batch_id, tasks, rejected)
+
+        # 按页数多数决定批次的推荐模式，Marker 模式提前预热子进程
+        marker_pages = sum(
+            t["pages"] or 0 for t in tasks if t["recommended_mode"] == "marker"
+        )
+        total_pages = sum(t["pages"] or 0 for t in tasks)
+        recommended_mode = "marker" if marker_pages * 2 >= total_pages else "ocr"
+        if recommended_mode == "marker" and not conversion_queue.running:
+            await asyncio.to_thread(marker_warm_pool.warm)
+
+        log_event(
+            "📦 批量上传完成",
+            batch_id=batch_id,
+            files=len(tasks),
+            rejected=len(rejected),
+            pages=total_pages,
+        )
+        return {
+            "success": True,
+            "batch_id": batch_id,
+            "tasks": tasks,
+            "rejected": rejected,
+            "total_pages": total_pages,
+            "recommended_mode": recommended_mode,
+            "message": f"批量上传成功，共 {len(tasks)} 个文件",
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量上传失败: {str(e)}")
+
+
+@router.post("/batch/{batch_id}/convert", response_model=BatchConversionResponse)
+async def start_batch_conversion(
+    batch_id: str, request: BatchConversionRequest, http_request: Request
+):
+    """以同一份配置转换批次内的全部文件，任务在队列中连续调度"""
+    with tracer.span("api.batch_convert", batch_id=batch_id) as span:
+        try:
+            record = batch_registry.get(batch_id)
+            if record is None:
+                raise HTTPException(status_code=404, detail="批次不存在")
+            if any(
+                task["task_id"] in conversion_queue.running
+                or conversion_queue.position(task["task_id"])
+                for task in record["tasks"]
+            ):
+                raise HTTPException(status_code=409, detail="批次已在队列中")
+
+            file_handler = FileHandler()
+            config_dict = request.config.dict()
+            task_func, message = _select_task_func(request.config)
+            client_id = _get_client_id(http_request)
+
+            jobs = []
+            skipped = []
+            for task in record["tasks"]:
+                task_id = task["task_id"]
+                upload_path = file_handler.find_upload_file(task_id)
+                if upload_path is None:
+                    skipped.append({"task_id": task_id, "error": "未找到上传的文件"})
+                    continue
+
+                preflight = task_manifest.get_preflight(task_id)
+                if preflight is not None:
+                    if preflight["needs_password"]:
+                        skipped.append(
+                            {"task_id": task_id, "error": "PDF已加密，无法转换"}
+                        )
+                        continue
+                    total_pages = preflight["page_count"]
+                else:
+                    total_pages = await asyncio.to_thread(
+                        count_pdf_pages, str(upload_path)
+                    )
+                try:
+                    pages = len(select_pages(request.config.page_range, total_pages))
+                except ValueError as e:
+                    skipped.append({"task_id": task_id, "error": str(e)})
+                    continue
+
+                cost = estimate_cost(config_dict, pages)
+                if not admission_controller.fits_memory(cost):
+                    skipped.append(
+                        {"task_id": task_id, "error": "任务所需内存超过服务器上限"}
+                    )
+                    continue
+
+                jobs.append(
+                    ConversionJob(
+                        task_id=task_id,
+                        func=task_func,
+                        kwargs={
+                            "pdf_path": str(upload_path),
+                            "task_id": task_id,
+                            "config": dict(config_dict),
+                        },
+                        cost=cost,
+                        client_id=client_id,
+                        batch_id=batch_id,
+                    )
+                )
+
+            if not jobs:
+                reasons = "；".join(sorted({item["error"] for item in skipped}))
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"批次中没有可转换的文件（{reasons}）",
+                )
+
+            # 批次按总成本整体接纳：服务器空闲时总是接纳，繁忙时在队列排空后重试
+            decision = admission_controller.try_admit_batch(
+                {job.task_id: job.cost for job in jobs},
+                conversion_queue.projected_finish_times(),
+            )
+            if not decision.admitted:
+                span.set_attribute("admission.rejected", decision.reason)
+                raise _admission_error(decision.reason, decision.retry_after)
+
+            if not isinstance(request.config, OCRConfig):
+                for job in jobs:
+                    prerender_cache.discard(job.task_id)
+
+            conversion_queue.submit_many(jobs)
+            batch_registry.record_submission(
+                batch_id, request.config.model_dump(mode="json"), skipped
+            )
+            span.set_attribute("tasks", len(jobs))
+            log_event(
+                "📦 批量转换已提交",
+                batch_id=batch_id,
+                tasks=len(jobs),
+                skipped=len(skipped),
+            )
+
+            return BatchConversionResponse(
+                success=True,
+                batch_id=batch_id,
+                task_ids=[job.task_id for job in jobs],
+                skipped=skipped,
+                message=f"{message}，批次共 {len(jobs)} 个任务",
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_event("❌ 启动批量转换失败", logging.ERROR, error=str(e))
+            raise HTTPException(status_code=500, detail=f"启动批量转换失败: {str(e)}")
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """获取批次汇总进度与各任务状态"""
+    status = batch_registry.get_status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    return status
+
+
+@router.post("/batch/{batch_id}/cancel")
+async def cancel_batch(batch_id: str, keep_partial: bool = False):
+    """取消批次内全部排队与运行中的任务"""
+    record = batch_registry.get(batch_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="批次不存在")
+
+    states = {"queued": 0, "running": 0}
+    for task in record["tasks"]:
+        state = conversion_queue.cancel(task["task_id"], keep_partial)
+        if state is not None:
+            states[state] += 1
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "cancelled": states,
+        "keep_partial": keep_partial,
+    }
+
+
 @router.get("/progress/{task_id}")
 async def get_progress(task_id: str):
     """获取转换进度"""
@@ -301,37 +716,85 @@ async def get_progress(task_id: str):
             "status": task_data.get("status", "unknown"),
             "progress": task_data.get("progress", 0.0),
             "error": task_data.get("error"),
+            "partial": task_data.get("partial", False),
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取进度失败: {str(e)}")
 
 
-@router.get("/result/{task_id}")
-async def get_result(task_id: str):
-    """获取转换结果"""
-    try:
-        # 使用 FileHandler 获取输出文件路径
-        file_handler = FileHandler()
-        output_path = file_handler.ensure_output_directory(task_id)
+def _partial_result(task_id: str, since: int) -> Optional[dict]:
+    """
+    运行中任务的已完成页面
 
-        # 动态查找输出文件
-        output_file = find_output_file(output_path)
+    Args:
+        task_id: 任务ID
+        since: 客户端已收到的片段数，只返回其后新增的片段
 
-        if not output_file or not output_file.exists():
-            raise HTTPException(status_code=404, detail="结果文件不存在")
+    Returns:
+        运行中且已有完成页面时返回结果字典，否则返回 None
+    """
+    output_dir = FileHandler().get_output_directory(task_id)
+    partial = CheckpointStore.read_partial(output_dir)
+    if partial is None:
+        return None
+
+    segments = partial["segments"]
+    contents = []
+    for segment in segments[since:]:
+        if segment["kind"] == "page":
+            contents.append(
+                f"## 第 {segment['pages'][0]} 页\n\n{segment['content'].strip()}"
+            )
+        else:
+            contents.append(segment["content"].strip())
+
+    return {
+        "task_id": task_id,
+        "in_progress": True,
+        "content": "\n\n".join(contents),
+        "segments": segments[since:],
+        "next_since": len(segments),
+        "completed_pages": partial["completed_pages"],
+        "total_pages": partial["total_pages"],
+        "has_images": False,
+        "image_count": 0,
+    }
+
+
+@router.get("/result/{task_id}")
+async def get_result(task_id: str, since: int = 0, output_format: Optional[str] = None):
+    """
+    获取转换结果；任务运行中时返回已完成的页面（since 为已收到的片段数），
+    output_format 选择同一次转换生成的其他输出格式（默认主输出）
+    """
+    try:
+        task_data = progress_manager.get_progress(task_id) or {}
+        if task_data.get("status") in ("queued", "processing"):
+            partial = await asyncio.to_thread(_partial_result, task_id, max(since, 0))
+            if partial is None:
+                raise HTTPException(status_code=404, detail="任务尚无已完成的页面")
+            return partial
+
+        # 通过任务清单查找输出文件
+        output_file = find_output_file(task_id, output_format)
+
+        if not output_file:
+            raise HTTPException(
+                status_code=404, detail=missing_output_detail(task_id, output_format)
+            )
 
         # 读取内容
         with open(output_file, "r", encoding="utf-8") as f:
             content = f.read()
 
-        # 检查是否有图片
-        image_dir = output_path / "images"
-        has_images = image_dir.exists() and any(image_dir.iterdir())
-        image_count = len(list(image_dir.glob("*"))) if has_images else 0
+        # 图片信息直接取自任务清单
+        image_count = len(task_manifest.get_images(task_id))
+        has_images = image_count > 0
 
         return {
             "task_id": task_id,
+            "in_progress": False,
             "content": content,
             "has_images": has_images,
             "image_count": image_count,
@@ -339,71 +802,127 @@ async def get_result(task_id: str):
             "file_format": output_file.suffix,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取结果失败: {str(e)}")
 
 
 @router.get("/download/{task_id}")
-async def download_result(task_id: str):
-    """下载转换结果"""
+async def download_result(task_id: str, output_format: Optional[str] = None):
+    """下载转换结果，output_format 选择同一次转换生成的其他输出格式（默认主输出）"""
     try:
-        # 使用 FileHandler 获取输出文件路径
-        file_handler = FileHandler()
-        output_path = file_handler.ensure_output_directory(task_id)
+        # 通过任务清单查找输出文件
+        output_file = find_output_file(task_id, output_format)
 
-        # 动态查找输出文件
-        output_file = find_output_file(output_path)
-
-        if not output_file or not output_file.exists():
-            raise HTTPException(status_code=404, detail="结果文件不存在")
+        if not output_file:
+            raise HTTPException(
+                status_code=404, detail=missing_output_detail(task_id, output_format)
+            )
 
         # 根据文件类型设置MIME类型
         mime_types = {
             ".md": "text/markdown",
             ".json": "application/json",
+            ".jsonl": "application/x-ndjson",
             ".html": "text/html",
+            ".txt": "text/plain",
         }
         media_type = mime_types.get(output_file.suffix, "text/plain")
+        # chunks 与 json 同为 .json 文件，下载文件名保留 _chunks 区分
+        suffix = (
+            f"_chunks{output_file.suffix}"
+            if output_file.stem.endswith("_chunks")
+            else output_file.suffix
+        )
 
         return FileResponse(
             path=output_file,
-            filename=f"converted_{task_id}{output_file.suffix}",
+            filename=f"converted_{task_id}{suffix}",
             media_type=media_type,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"下载失败: {str(e)}")
 
 
+def _bundle_response(
+    task_id: str, kind: str, entries: list, checksums: list
+) -> Response:
+    """返回压缩包响应 - 命中缓存直接返回文件，否则边生成边流式输出"""
+    file_handler = FileHandler()
+    output_path = file_handler.get_output_directory(task_id)
+    digest = bundle_digest(checksums)
+    filename = f"{kind}_{task_id}.zip"
+    task_manifest.touch(task_id)
+
+    cached = bundle_cache.get_cached(output_path, kind, digest)
+    if cached is not None:
+        return FileResponse(
+            path=cached, filename=filename, media_type="application/zip"
+        )
+
+    return StreamingResponse(
+        bundle_cache.stream_and_cache(output_path, kind, digest, entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/download-images/{task_id}")
 async def download_images(task_id: str):
     """下载图片包"""
     try:
-        # 使用 FileHandler 获取输出文件路径
-        file_handler = FileHandler()
-        output_path = file_handler.ensure_output_directory(task_id)
-        image_dir = output_path / "images"
+        images = task_manifest.get_images(task_id)
 
-        if not image_dir.exists():
+        if not images:
             raise HTTPException(status_code=404, detail="图片目录不存在")
 
-        # 创建ZIP文件
-        import zipfile
+        entries = [(image["name"], Path(image["path"])) for image in images]
+        checksums = [(image["name"], image["sha256"]) for image in images]
 
-        zip_path = output_path / f"images_{task_id}.zip"
+        return _bundle_response(task_id, "images", entries, checksums)
 
-        with zipfile.ZipFile(zip_path, "w") as zipf:
-            for image_file in image_dir.glob("*"):
-                zipf.write(image_file, image_file.name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"下载图片失败: {str(e)}")
 
-        return FileResponse(
-            path=zip_path,
-            filename=f"images_{task_id}.zip",
-            media_type="application/zip",
-        )
 
+@router.get("/download-bundle/{task_id}")
+async def download_bundle(task_id: str):
+    """下载全部输出打包（各格式输出、元数据与图片）"""
+    try:
+        record = task_manifest.get(task_id)
+        if not record or not record["outputs"]:
+            raise HTTPException(status_code=404, detail="结果文件不存在")
+
+        entries = []
+        checksums = []
+        for output in record["outputs"].values():
+            output_path = Path(output["path"])
+            entries.append((output_path.name, output_path))
+            checksums.append((output_path.name, output["sha256"]))
+
+        metadata_file = record.get("metadata_file")
+        if metadata_file and Path(metadata_file).exists():
+            stat = Path(metadata_file).stat()
+            entries.append(("metadata.json", Path(metadata_file)))
+            checksums.append(("metadata.json", f"{stat.st_size}-{stat.st_mtime_ns}"))
+
+        for image in record["images"]:
+            arcname = f"images/{image['name']}"
+            entries.append((arcname, Path(image["path"])))
+            checksums.append((arcname, image["sha256"]))
+
+        return _bundle_response(task_id, "bundle", entries, checksums)
+
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"下载图片失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"打包下载失败: {str(e)}")
 
 
 @router.get("/images/{task_id}/{filename}")
@@ -424,6 +943,88 @@ async def get_image(task_id: str, filename: str):
         raise HTTPException(status_code=500, detail=f"获取图片失败: {str(e)}")
 
 
+@router.get("/profile/{task_id}")
+async def get_task_profile(task_id: str):
+    """获取任务耗时剖析（每页各阶段耗时、Tesseract调用与所选OCR配置）"""
+    try:
+        output_dir = FileHandler().get_output_directory(task_id)
+        profile_file = output_dir / PROFILE_FILENAME
+
+        if not profile_file.exists():
+            raise HTTPException(status_code=404, detail="耗时剖析不存在")
+
+        with open(profile_file, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+
+        # 若开启了 cProfile 采集，附带统计摘要
+        stats_file = output_dir / CPROFILE_STATS_FILENAME
+        if stats_file.exists():
+            profile["cprofile_stats"] = stats_file.read_text(encoding="utf-8")
+            profile["cprofile_download"] = f"/api/profile/{task_id}/cprofile"
+
+        return profile
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取耗时剖析失败: {str(e)}")
+
+
+@router.get("/profile/{task_id}/cprofile")
+async def download_cprofile(task_id: str):
+    """下载原始 cProfile 数据（可用 snakeviz 等工具查看）"""
+    output_dir = FileHandler().get_output_directory(task_id)
+    prof_file = output_dir / CPROFILE_FILENAME
+
+    if not prof_file.exists():
+        raise HTTPException(status_code=404, detail="cProfile 数据不存在")
+
+    return FileResponse(
+        path=prof_file,
+        filename=f"{task_id}.prof",
+        media_type="application/octet-stream",
+    )
+
+
+@router.get("/traces/{task_id}")
+async def get_task_traces(task_id: str):
+    """获取任务最近的追踪 span，区分排队等待与实际处理耗时"""
+    summary = tracer.summarize_task(task_id)
+    if not summary["spans"]:
+        raise HTTPException(status_code=404, detail="未找到任务的追踪数据")
+    return summary
+
+
+@router.post("/tasks/{task_id}/pin")
+async def pin_task(task_id: str):
+    """固定任务，使其不被自动清理"""
+    record = task_manifest.set_pinned(task_id, True)
+    if record is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return {"task_id": task_id, "pinned": True}
+
+
+@router.delete("/tasks/{task_id}/pin")
+async def unpin_task(task_id: str):
+    """取消固定任务"""
+    record = task_manifest.set_pinned(task_id, False)
+    if record is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return {"task_id": task_id, "pinned": False}
+
+
+@router.get("/storage-metrics")
+async def get_storage_metrics():
+    """获取存储清理统计与当前磁盘用量"""
+    return storage_janitor.get_metrics()
+
+
+@router.get("/cpu-budget")
+async def get_cpu_budget():
+    """获取CPU线程分配计划（当前模式与其他模式的对比）及各任务的线程占用"""
+    return cpu_budget.get_status()
+
+
 @router.get("/gpu-status")
 async def get_gpu_status():
     """获取GPU状态"""
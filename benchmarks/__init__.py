@@ -0,0 +1,10 @@
+"""
+性能基准测试
+用 reportlab 生成确定性的合成PDF语料，逐页测量 ScanPDFConverter 各处理阶段与 OCREngine 检测器的耗时，
+输出机器可读的 JSON 结果，并支持对比两次运行的结果
+
+用法:
+    python -m benchmarks corpus               # 仅生成语料
+    python -m benchmarks run -o base.json     # 运行基准测试
+    python -m benchmarks compare base.json new.json
+"""
@@ -0,0 +1,442 @@
+"""
+基准测试命令行（python -m benchmarks --help）
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import logging
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.corpus import build_corpus, corpus_digest
+from benchmarks.compare import compare_results
+from benchmarks.runner import STAGE_NAMES
+
+DEFAULT_CORPUS_DIR = Path(__file__).parent / ".corpus"
+
+# 进度信息输出到标准错误，标准输出只保留结果
+console = Console(stderr=True)
+output_console = Console()
+
+
+def _load_corpus(corpus_dir: Path, patterns, force: bool = False):
+    documents = build_corpus(corpus_dir, force=force)
+    if patterns:
+        documents = [
+            doc
+            for doc in documents
+            if any(fnmatch.fnmatch(doc["name"], pattern) for pattern in patterns)
+        ]
+    return documents
+
+
+@click.group()
+def main():
+    """PDF转换性能基准测试"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
+
+@main.command()
+@click.option(
+    "--corpus-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DEFAULT_CORPUS_DIR,
+    show_default=True,
+)
+@click.option("--force", is_flag=True, help="重新生成全部文档")
+def corpus(corpus_dir: Path, force: bool):
+    """生成合成PDF语料"""
+    documents = build_corpus(corpus_dir, force=force)
+    for doc in documents:
+        output_console.print(
+            f"{doc['name']:<16} {doc['pages']:>5} 页  {doc['sha256'][:12]}"
+        )
+    output_console.print(f"语料摘要: {corpus_digest(documents)}")
+
+
+@main.command()
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="结果 JSON 路径（默认输出到标准输出）",
+)
+@click.option(
+    "--corpus-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DEFAULT_CORPUS_DIR,
+    show_default=True,
+)
+@click.option(
+    "-d", "--documents", multiple=True, help="只测量匹配的文档，如 'scanned-*'"
+)
+@click.option(
+    "-s",
+    "--stages",
+    default=",".join(STAGE_NAMES),
+    show_default=True,
+    help="要测量的阶段（逗号分隔）",
+)
+@click.option(
+    "--max-pages",
+    type=click.IntRange(min=0),
+    default=20,
+    show_default=True,
+    help="每个文档最多测量的页数（均匀抽样），0 表示全部页面",
+)
+@click.option("--repeat", type=click.IntRange(min=1), default=1, show_default=True)
+@click.option("--tesseract-cmd", default=None, help="Tesseract 可执行文件路径")
+def run(
+    output, corpus_dir: Path, documents, stages: str, max_pages, repeat, tesseract_cmd
+):
+    """运行基准测试"""
+    stage_list = [stage.strip() for stage in stages.split(",") if stage.strip()]
+    unknown = set(stage_list) - set(STAGE_NAMES)
+    if unknown:
+        raise click.BadParameter(f"未知阶段: {', '.join(sorted(unknown))}")
+
+    # 转换器模块导入时会初始化任务清单，避免在当前目录留下清单目录
+    os.environ.setdefault("MANIFEST_DIR", str(corpus_dir / ".manifests"))
+    from benchmarks.runner import configure_tesseract, run_benchmark
+
+    docs = _load_corpus(corpus_dir, documents)
+    if not docs:
+        console.print("[red]没有匹配的文档[/]")
+        sys.exit(1)
+
+    tesseract_version = configure_tesseract(tesseract_cmd)
+    if tesseract_version is None:
+        console.print("[yellow]⚠️ Tesseract 不可用，跳过 OCR 阶段[/]")
+
+    result = run_benchmark(
+        docs,
+        stage_list,
+        max_pages or None,
+        repeat,
+        tesseract_version,
+        corpus_digest(docs),
+        progress=lambda message: console.print(f"⏱️ {message}", highlight=False),
+    )
+
+    payload = json.dumps(result, ensure_ascii=False, indent=2)
+    if output is None:
+        click.echo(payload)
+        return
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(payload, encoding="utf-8")
+
+    summary = result["summary"]
+    console.print(
+        f"📊 {summary['pages_measured']} 页, {summary['pages_per_second']} 页/秒, "
+        f"p50 {summary['page_latency']['p50_ms']}ms, "
+        f"p95 {summary['page_latency']['p95_ms']}ms, "
+        f"峰值内存 {summary['peak_rss_mb']}MB"
+    )
+    console.print(f"📄 结果: {output}")
+
+
+@main.command()
+@click.argument(
+    "baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument("current", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--threshold",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="判定变化的阈值（百分比）",
+)
+@click.option(
+    "--all", "show_all", is_flag=True, help="显示全部指标（默认只显示有变化的）"
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="对比结果 JSON 路径",
+)
+@click.option("--fail-on-regression", is_flag=True, help="存在性能回退时以非零状态退出")
+def compare(baseline, current, threshold, show_all, output, fail_on_regression):
+    """对比两次基准测试结果"""
+    diff = compare_results(
+        json.loads(baseline.read_text(encoding="utf-8")),
+        json.loads(current.read_text(encoding="utf-8")),
+        threshold,
+    )
+    for warning in diff["warnings"]:
+        console.print(f"[yellow]⚠️ {warning}[/]")
+
+    table = Table(title=f"基准对比（阈值 ±{threshold}%）")
+    for column in ("范围", "指标", "基准", "当前", "变化"):
+        table.add_column(
+            column, justify="right" if column in ("基准", "当前", "变化") else "left"
+        )
+    styles = {"regression": "red", "improvement": "green", "unchanged": "dim"}
+    for row in diff["rows"]:
+        if row["verdict"] == "unchanged" and not show_all:
+            continue
+        style = styles[row["verdict"]]
+        table.add_row(
+            row["scope"],
+            row["metric"],
+            f"{row['baseline']:g}",
+            f"{row['current']:g}",
+            f"[{style}]{row['change_percent']:+.1f}%[/]",
+        )
+    output_console.print(table)
+    output_console.print(
+        f"回退 {diff['regressions']} 项，改进 {diff['improvements']} 项"
+    )
+
+    if output is not None:
+        output.write_text(
+            json.dumps(diff, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    if fail_on_regression and diff["regressions"]:
+        sys.exit(1)
+
+
+@main.command()
+@click.option(
+    "--url",
+    default=None,
+    help="压测已运行的服务（默认在本进程内启动应用并使用桩后端）",
+)
+@click.option(
+    "-u", "--users", type=click.IntRange(min=1), default=20, show_default=True
+)
+@click.option(
+    "--duration", type=float, default=30.0, show_default=True, help="压测时长（秒）"
+)
+@click.option(
+    "--ramp-up",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="虚拟用户逐个启动的总时长（秒）",
+)
+@click.option("--poll-interval", type=float, default=0.5, show_default=True)
+@click.option("--think-time", type=float, default=0.0, show_default=True)
+@click.option("--download", is_flag=True, help="完成后同时下载结果")
+@click.option(
+    "-m",
+    "--mode",
+    type=click.Choice(["marker", "ocr"]),
+    default="marker",
+    show_default=True,
+)
+@click.option(
+    "--document",
+    default="text-en-10",
+    show_default=True,
+    help="上传的语料文档",
+)
+@click.option(
+    "--pdf",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="上传指定的PDF（覆盖 --document）",
+)
+@click.option(
+    "--corpus-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DEFAULT_CORPUS_DIR,
+    show_default=True,
+)
+@click.option("--real-backend", is_flag=True, help="本地启动时使用真实转换器而非桩后端")
+@click.option("--stub-fixed", type=float, default=0.2, show_default=True)
+@click.option("--stub-per-page", type=float, default=0.05, show_default=True)
+@click.option("--stub-jitter", type=float, default=0.2, show_default=True)
+@click.option("--stub-failure-rate", type=float, default=0.0, show_default=True)
+@click.option(
+    "--max-concurrent",
+    type=click.IntRange(min=1),
+    default=None,
+    help="本地启动时的并发转换数（MAX_CONCURRENT_JOBS）",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="结果 JSON 路径",
+)
+def loadtest(
+    url,
+    users,
+    duration,
+    ramp_up,
+    poll_interval,
+    think_time,
+    download,
+    mode,
+    document,
+    pdf,
+    corpus_dir,
+    real_backend,
+    stub_fixed,
+    stub_per_page,
+    stub_jitter,
+    stub_failure_rate,
+    max_concurrent,
+    output,
+):
+    """HTTP 压测：按接口统计吞吐量与延迟，判断 Web 层与转换器谁先饱和"""
+    import asyncio
+    import tempfile
+    from contextlib import nullcontext
+
+    from benchmarks.loadtest import LoadTest, ServerThread, prepare_local_server
+
+    if pdf is None:
+        docs = _load_corpus(corpus_dir, [document])
+        if not docs:
+            console.print(f"[red]语料中没有文档 {document}[/]")
+            sys.exit(1)
+        pdf = Path(docs[0]["path"])
+    # 本地启动应用会切换工作目录，先读取文档并解析输出路径
+    pdf_bytes = pdf.read_bytes()
+    if output is not None:
+        output = output.resolve()
+
+    with tempfile.TemporaryDirectory(prefix="pdf-loadtest-") as workdir:
+        if url is None:
+            stub = None
+            if not real_backend:
+                from benchmarks.stub_backend import StubBackend
+
+                stub = StubBackend(
+                    fixed_seconds=stub_fixed,
+                    seconds_per_page=stub_per_page,
+                    jitter=stub_jitter,
+                    failure_rate=stub_failure_rate,
+                )
+            server = ServerThread(prepare_local_server(workdir, max_concurrent, stub))
+            backend = "real" if real_backend else "stub"
+        else:
+            # 外部服务使用其自身的转换器，桩后端参数不生效
+            server = nullcontext()
+            backend = "external"
+
+        with server:
+            base_url = url or server.base_url
+            console.print(
+                f"🚀 {users} 个虚拟用户, {duration}s, 后端: {backend}, 目标: {base_url}"
+            )
+            result = asyncio.run(
+                LoadTest(
+                    base_url,
+                    pdf_bytes,
+                    pdf.name,
+                    {"conversion_mode": mode},
+                    users=users,
+                    duration=duration,
+                    ramp_up=ramp_up,
+                    poll_interval=poll_interval,
+                    think_time=think_time,
+                    download=download,
+                ).run()
+            )
+    result["settings"]["backend"] = backend
+    if backend == "stub":
+        result["settings"]["stub"] = {
+            "fixed_seconds": stub_fixed,
+            "seconds_per_page": stub_per_page,
+            "jitter": stub_jitter,
+            "failure_rate": stub_failure_rate,
+        }
+
+    table = Table(title=f"接口统计（{result['elapsed_seconds']}s）")
+    for column in ("接口", "请求数", "请求/秒", "p50", "p95", "p99", "最大", "非2xx"):
+        table.add_column(column, justify="left" if column == "接口" else "right")
+    for name, stats in result["endpoints"].items():
+        table.add_row(
+            name,
+            str(stats["requests"]),
+            f"{stats['requests_per_second']:g}",
+            f"{stats['p50_ms']:g}ms",
+            f"{stats['p95_ms']:g}ms",
+            f"{stats['p99_ms']:g}ms",
+            f"{stats['max_ms']:g}ms",
+            str(stats["non_2xx"]),
+        )
+    output_console.print(table)
+
+    jobs = result["jobs"]
+    output_console.print(
+        f"📊 完成 {jobs.get('completed', 0)} 个任务, {jobs['jobs_per_second']} 任务/秒, "
+        f"端到端 p50 {jobs['latency']['p50_ms']}ms, p95 {jobs['latency']['p95_ms']}ms, "
+        f"拒绝 {jobs.get('rejected', 0)}, 失败 {jobs.get('failed', 0)}"
+    )
+    queue = result["queue"]
+    if queue:
+        output_console.print(
+            f"📋 槽位利用率 {queue['mean_utilization']:.0%}, "
+            f"平均队列深度 {queue['mean_queue_depth']}, 最大 {queue['max_queue_depth']}"
+        )
+    output_console.print(f"🔍 瓶颈: {result['bottleneck']['reason']}")
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        console.print(f"📄 结果: {output}")
+
+
+@main.command()
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option(
+    "--budget",
+    type=float,
+    default=None,
+    help="导入 main 的耗时预算（秒，默认 3.0）",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="结果 JSON 路径",
+)
+def startup(repeat, budget, output):
+    """检查服务启动耗时与延迟加载，超出预算时以非零状态退出"""
+    from benchmarks.startup import (
+        DEFAULT_BUDGET_SECONDS,
+        check_startup,
+        measure_startup,
+    )
+
+    budget = DEFAULT_BUDGET_SECONDS if budget is None else budget
+    result = measure_startup(repeat)
+    problems = check_startup(result, budget)
+    result["budget_seconds"] = budget
+    result["problems"] = problems
+
+    output_console.print(
+        f"⏱️ 导入 main: 中位数 {result['import_seconds']['median']}s, "
+        f"最大 {result['import_seconds']['max']}s "
+        f"(进程总耗时中位数 {result['process_seconds']['median']}s, 预算 {budget}s)"
+    )
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    for problem in problems:
+        console.print(f"[red]❌ {problem}[/]")
+    if problems:
+        sys.exit(1)
+    output_console.print("✅ 启动耗时在预算内，转换引擎均为延迟加载")
+
+
+if __name__ == "__main__":
+    main()
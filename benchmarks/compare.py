@@ -0,0 +1,136 @@
+"""
+基准结果对比
+按指标计算两次运行的变化百分比，超过阈值且方向变差的指标标记为性能回退
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+# (指标路径, 越大越好)
+SUMMARY_METRICS: List[Tuple[str, bool]] = [
+    ("pages_per_second", True),
+    ("page_latency.p50_ms", False),
+    ("page_latency.p95_ms", False),
+    ("peak_rss_mb", False),
+]
+STAGE_METRICS: List[Tuple[str, bool]] = [
+    ("p50_ms", False),
+    ("p95_ms", False),
+]
+
+
+def _lookup(data: Dict[str, Any], path: str) -> Optional[float]:
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def _diff(
+    scope: str,
+    metric: str,
+    baseline: Optional[float],
+    current: Optional[float],
+    higher_is_better: bool,
+    threshold: float,
+) -> Optional[Dict[str, Any]]:
+    """单个指标的对比结果，任一侧缺失时返回 None"""
+    if baseline is None or current is None:
+        return None
+    change = (current - baseline) / baseline * 100 if baseline else 0.0
+    worse = change < -threshold if higher_is_better else change > threshold
+    better = change > threshold if higher_is_better else change < -threshold
+    return {
+        "scope": scope,
+        "metric": metric,
+        "baseline": baseline,
+        "current": current,
+        "change_percent": round(change, 2),
+        "verdict": "regression" if worse else "improvement" if better else "unchanged",
+    }
+
+
+def _diff_block(
+    scope: str,
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float,
+) -> List[Dict[str, Any]]:
+    """对比一组汇总（整体或单个文档）的全部指标"""
+    rows = []
+    for path, higher_is_better in SUMMARY_METRICS:
+        rows.append(
+            _diff(
+                scope,
+                path,
+                _lookup(baseline, path),
+                _lookup(current, path),
+                higher_is_better,
+                threshold,
+            )
+        )
+    for stage in sorted(
+        set(baseline.get("stages", {})) & set(current.get("stages", {}))
+    ):
+        for key, higher_is_better in STAGE_METRICS:
+            rows.append(
+                _diff(
+                    scope,
+                    f"stages.{stage}.{key}",
+                    baseline["stages"][stage].get(key),
+                    current["stages"][stage].get(key),
+                    higher_is_better,
+                    threshold,
+                )
+            )
+    return [row for row in rows if row is not None]
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 5.0
+) -> Dict[str, Any]:
+    """
+    对比两次基准测试结果
+
+    Args:
+        baseline: 基准结果
+        current: 当前结果
+        threshold: 判定变化的阈值（百分比）
+
+    Returns:
+        Dict[str, Any]: {"warnings", "rows", "regressions", "improvements"}
+    """
+    warnings = []
+    if baseline["settings"].get("corpus_digest") != current["settings"].get(
+        "corpus_digest"
+    ):
+        warnings.append("两次运行的语料不同，结果不可直接比较")
+    for key in ("max_pages", "repeat"):
+        if baseline["settings"].get(key) != current["settings"].get(key):
+            warnings.append(f"两次运行的 {key} 设置不同")
+    for key in ("cpu_count", "processor", "tesseract"):
+        if baseline["environment"].get(key) != current["environment"].get(key):
+            warnings.append(f"运行环境的 {key} 不同")
+
+    rows = _diff_block("summary", baseline["summary"], current["summary"], threshold)
+    baseline_documents = {doc["name"]: doc for doc in baseline["documents"]}
+    for document in current["documents"]:
+        previous = baseline_documents.get(document["name"])
+        if previous is not None:
+            rows.extend(_diff_block(document["name"], previous, document, threshold))
+
+    return {
+        "baseline": {
+            "created_at": baseline["created_at"],
+            "git_revision": baseline["environment"].get("git_revision"),
+        },
+        "current": {
+            "created_at": current["created_at"],
+            "git_revision": current["environment"].get("git_revision"),
+        },
+        "threshold_percent": threshold,
+        "warnings": warnings,
+        "regressions": sum(1 for row in rows if row["verdict"] == "regression"),
+        "improvements": sum(1 for row in rows if row["verdict"] == "improvement"),
+        "rows": rows,
+    }
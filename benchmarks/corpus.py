@@ -0,0 +1,270 @@
+"""
+合成PDF语料
+所有内容由固定随机种子生成，reportlab 以 invariant 模式输出（不写入时间戳与随机ID），
+同一版本的代码在任何机器上生成的文件逐字节一致，便于对比不同运行的结果
+"""
+
+import io
+import json
+import random
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfgen import canvas
+
+# 语料格式版本，生成逻辑变化时递增，旧语料自动重建
+CORPUS_VERSION = 1
+CORPUS_MANIFEST = "corpus.json"
+
+# reportlab 内置的 CID 中文字体，无需字体文件
+CJK_FONT = "STSong-Light"
+LATIN_FONT = "Helvetica"
+
+# 扫描页的栅格化分辨率
+SCAN_DPI = 150
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 56
+
+ENGLISH_WORDS = (
+    "the system converts scanned documents into structured text with layout "
+    "analysis table detection language identification and quality control "
+    "performance throughput latency memory pipeline stage result report page "
+    "model engine configuration invoice contract research paper method data "
+    "experiment figure section summary conclusion reference appendix value"
+).split()
+
+CHINESE_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动"
+    "同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自"
+    "二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+    "文档转换识别表格数据系统处理结果性能页面质量配置模型"
+)
+
+
+@dataclass
+class DocumentSpec:
+    """语料中的一个文档"""
+
+    name: str
+    kind: str  # text / scanned / mixed / table
+    lang: str  # en / zh / mixed
+    pages: int
+    seed: int
+
+    def filename(self) -> str:
+        return f"{self.name}.pdf"
+
+
+# 默认语料：覆盖文本型、扫描型、混合型、中英文、表格密集型文档与 1/10/100/1000 页规模
+DEFAULT_SPECS = [
+    DocumentSpec("text-en-1", "text", "en", 1, 101),
+    DocumentSpec("text-en-10", "text", "en", 10, 102),
+    DocumentSpec("text-en-100", "text", "en", 100, 103),
+    DocumentSpec("text-en-1000", "text", "en", 1000, 104),
+    DocumentSpec("text-zh-10", "text", "zh", 10, 105),
+    DocumentSpec("scanned-en-10", "scanned", "en", 10, 106),
+    DocumentSpec("scanned-zh-10", "scanned", "zh", 10, 107),
+    DocumentSpec("mixed-10", "mixed", "mixed", 10, 108),
+    DocumentSpec("table-en-10", "table", "en", 10, 109),
+    DocumentSpec("table-zh-10", "table", "zh", 10, 110),
+]
+
+
+def _register_fonts() -> None:
+    if CJK_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+
+
+def _sentence(rng: random.Random, lang: str) -> str:
+    """生成一行文本"""
+    if lang == "zh":
+        return "".join(rng.choice(CHINESE_CHARS) for _ in range(rng.randint(18, 30)))
+    words = [rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(8, 12))]
+    return " ".join(words).capitalize() + "."
+
+
+def _page_lang(spec: DocumentSpec, page_num: int) -> str:
+    if spec.lang == "mixed":
+        return "zh" if page_num % 2 else "en"
+    return spec.lang
+
+
+def _draw_text_page(pdf: canvas.Canvas, rng: random.Random, lang: str) -> str:
+    """绘制正文页，返回页面文本"""
+    font, size, leading = (CJK_FONT, 12, 20) if lang == "zh" else (LATIN_FONT, 11, 16)
+    lines = [
+        _sentence(rng, lang) for _ in range(int((PAGE_HEIGHT - 2 * MARGIN) / leading))
+    ]
+    pdf.setFont(font, size)
+    y = PAGE_HEIGHT - MARGIN
+    for line in lines:
+        pdf.drawString(MARGIN, y, line)
+        y -= leading
+    return "\n".join(lines)
+
+
+def _draw_table_page(pdf: canvas.Canvas, rng: random.Random, lang: str) -> str:
+    """绘制带网格线的表格页，返回页面文本"""
+    font = CJK_FONT if lang == "zh" else LATIN_FONT
+    headers = (
+        ["编号", "名称", "数量", "单价", "金额"]
+        if lang == "zh"
+        else ["No.", "Item", "Qty", "Price", "Amount"]
+    )
+    columns, rows = len(headers), 30
+    cell_width = (PAGE_WIDTH - 2 * MARGIN) / columns
+    cell_height = (PAGE_HEIGHT - 2 * MARGIN) / (rows + 1)
+
+    table = [headers]
+    for row in range(rows):
+        quantity, price = rng.randint(1, 99), rng.randint(100, 9999) / 100
+        name = (
+            "".join(rng.choice(CHINESE_CHARS) for _ in range(4))
+            if lang == "zh"
+            else rng.choice(ENGLISH_WORDS)
+        )
+        table.append(
+            [
+                str(row + 1),
+                name,
+                str(quantity),
+                f"{price:.2f}",
+                f"{quantity * price:.2f}",
+            ]
+        )
+
+    pdf.setLineWidth(0.8)
+    top = PAGE_HEIGHT - MARGIN
+    for index in range(rows + 2):
+        y = top - index * cell_height
+        pdf.line(MARGIN, y, PAGE_WIDTH - MARGIN, y)
+    for index in range(columns + 1):
+        x = MARGIN + index * cell_width
+        pdf.line(x, top, x, top - (rows + 1) * cell_height)
+
+    pdf.setFont(font, 10)
+    for row_index, row in enumerate(table):
+        y = top - (row_index + 1) * cell_height + cell_height * 0.3
+        for column_index, value in enumerate(row):
+            pdf.drawString(MARGIN + column_index * cell_width + 4, y, value)
+    return "\n".join(" ".join(row) for row in table)
+
+
+def _rasterize(page_pdf: bytes) -> Image.Image:
+    """把单页PDF栅格化为灰度图，模拟扫描件"""
+    with fitz.open(stream=page_pdf, filetype="pdf") as document:
+        pix = document.load_page(0).get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+        return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def _render_single_page(draw, rng: random.Random, lang: str) -> Tuple[bytes, str]:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    text = draw(pdf, rng, lang)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue(), text
+
+
+def generate_document(spec: DocumentSpec, path: Path) -> Dict[str, Any]:
+    """
+    生成单个文档
+
+    Returns:
+        Dict[str, Any]: 文档描述（含用于语言检测的参考文本）
+    """
+    _register_fonts()
+    rng = random.Random(spec.seed)
+    pdf = canvas.Canvas(str(path), pagesize=A4, invariant=1)
+    pdf.setTitle(spec.name)
+
+    sample_text = ""
+    for page_num in range(spec.pages):
+        lang = _page_lang(spec, page_num)
+        scanned = spec.kind == "scanned" or (spec.kind == "mixed" and page_num % 3 == 2)
+        draw = _draw_table_page if spec.kind == "table" else _draw_text_page
+
+        if scanned:
+            page_pdf, text = _render_single_page(draw, rng, lang)
+            pdf.drawImage(
+                ImageReader(_rasterize(page_pdf)), 0, 0, PAGE_WIDTH, PAGE_HEIGHT
+            )
+        else:
+            text = draw(pdf, rng, lang)
+        pdf.showPage()
+        if not sample_text:
+            sample_text = text[:300]
+
+    pdf.save()
+    return {
+        **asdict(spec),
+        "path": str(path),
+        "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+        "size": path.stat().st_size,
+        "sample_text": sample_text,
+    }
+
+
+def build_corpus(
+    directory: Path,
+    specs: Optional[List[DocumentSpec]] = None,
+    force: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    生成语料（已存在且版本一致的文档直接复用）
+
+    Args:
+        directory: 语料目录
+        specs: 文档列表，默认使用 DEFAULT_SPECS
+        force: 是否强制重新生成
+
+    Returns:
+        List[Dict[str, Any]]: 文档描述列表
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    specs = specs or DEFAULT_SPECS
+
+    manifest_path = directory / CORPUS_MANIFEST
+    existing: Dict[str, Dict[str, Any]] = {}
+    if manifest_path.exists() and not force:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("version") == CORPUS_VERSION:
+            existing = {doc["name"]: doc for doc in manifest["documents"]}
+
+    documents = []
+    for spec in specs:
+        path = directory / spec.filename()
+        document = existing.get(spec.name)
+        if document is None or document["seed"] != spec.seed or not path.exists():
+            print(f"📝 生成语料: {spec.name} ({spec.pages} 页)")
+            document = generate_document(spec, path)
+        documents.append(document)
+
+    # 保留清单中其他已生成的文档
+    names = {doc["name"] for doc in documents}
+    merged = documents + [doc for name, doc in existing.items() if name not in names]
+    manifest_path.write_text(
+        json.dumps(
+            {"version": CORPUS_VERSION, "documents": merged},
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    return documents
+
+
+def corpus_digest(documents: List[Dict[str, Any]]) -> str:
+    """语料摘要，用于确认两次运行使用了相同的输入"""
+    payload = "".join(sorted(doc["sha256"] for doc in documents))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
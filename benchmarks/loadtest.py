@@ -0,0 +1,364 @@
+"""
+HTTP 压测
+多个并发虚拟用户按真实前端的调用顺序驱动 FastAPI 应用：上传 → 提交转换 → 轮询进度 → 读取结果（可选下载），
+按接口统计吞吐量与延迟百分位，并定期采样队列状态，判断先饱和的是 Web 层还是转换器
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from benchmarks.runner import percentile, summarize_latencies
+
+# 有任务排队的采样占比不低于该值时视为转换器已饱和
+# （槽位可能因内存预算而无法全部占满，因此以排队而非槽位利用率为准）
+CONVERTER_SATURATION_QUEUED_FRACTION = 0.5
+
+# 接口 p95 延迟超过该值（毫秒）时视为 Web 层已饱和
+WEB_SATURATION_P95_MS = 500.0
+
+
+@dataclass
+class EndpointStats:
+    """单个接口的统计"""
+
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def record(self, status: str, seconds: float) -> None:
+        self.statuses[status] += 1
+        self.latencies.append(seconds)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        errors = sum(
+            count
+            for status, count in self.statuses.items()
+            if not status.startswith("2")
+        )
+        return {
+            **summarize_latencies(self.latencies),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+            "requests": len(self.latencies),
+            "requests_per_second": (
+                round(len(self.latencies) / elapsed, 3) if elapsed else 0.0
+            ),
+            "non_2xx": errors,
+            "statuses": dict(self.statuses),
+        }
+
+
+class ServerThread:
+    """在后台线程中用 uvicorn 运行应用（真实的 HTTP 栈）"""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        if not port:
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "ServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("压测服务启动失败")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+class LoadTest:
+    """虚拟用户压测"""
+
+    def __init__(
+        self,
+        base_url: str,
+        pdf_bytes: bytes,
+        pdf_name: str,
+        config: Dict[str, Any],
+        users: int = 10,
+        duration: float = 30.0,
+        ramp_up: float = 5.0,
+        poll_interval: float = 0.5,
+        think_time: float = 0.0,
+        download: bool = False,
+    ):
+        self.base_url = base_url
+        self.pdf_bytes = pdf_bytes
+        self.pdf_name = pdf_name
+        self.config = config
+        self.users = users
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.poll_interval = poll_interval
+        self.think_time = think_time
+        self.download = download
+
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.job_latencies: List[float] = []
+        self.jobs = Counter()
+        self.queue_samples: List[Dict[str, Any]] = []
+
+    async def _request(
+        self, client: httpx.AsyncClient, method: str, name: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        """发送请求并按接口模板记录状态与延迟"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.endpoints.setdefault(name, EndpointStats()).record(
+            status, time.perf_counter() - start
+        )
+        return response
+
+    async def _job(self, client: httpx.AsyncClient, deadline: float) -> None:
+        """一个完整的转换流程"""
+        start = time.perf_counter()
+        response = await self._request(
+            client,
+            "POST",
+            "POST /api/upload",
+            "/api/upload",
+            files={"file": (self.pdf_name, self.pdf_bytes, "application/pdf")},
+        )
+        if response is None or response.status_code != 200:
+            self.jobs["upload_failed"] += 1
+            return
+        task_id = response.json()["task_id"]
+
+        response = await self._request(
+            client,
+            "POST",
+            "POST /api/convert",
+            "/api/convert",
+            json={"task_id": task_id, "config": self.config},
+        )
+        if response is None:
+            self.jobs["convert_failed"] += 1
+            return
+        if response.status_code in (429, 503):
+            # 准入控制拒绝：按 Retry-After 退避（不超过剩余时间）
+            self.jobs["rejected"] += 1
+            retry_after = float(response.headers.get("Retry-After", 1))
+            await asyncio.sleep(min(retry_after, max(deadline - time.monotonic(), 0)))
+            return
+        if response.status_code != 200:
+            self.jobs["convert_failed"] += 1
+            return
+        self.jobs["submitted"] += 1
+
+        status = "queued"
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            response = await self._request(
+                client,
+                "GET",
+                "GET /api/progress/{task_id}",
+                f"/api/progress/{task_id}",
+            )
+            if response is not None and response.status_code == 200:
+                status = response.json()["status"]
+                if status in ("completed", "failed", "cancelled"):
+                    break
+        else:
+            self.jobs["unfinished"] += 1
+            return
+
+        if status != "completed":
+            self.jobs[status] += 1
+            return
+
+        await self._request(
+            client, "GET", "GET /api/result/{task_id}", f"/api/result/{task_id}"
+        )
+        if self.download:
+            await self._request(
+                client, "GET", "GET /api/download/{task_id}", f"/api/download/{task_id}"
+            )
+        self.jobs["completed"] += 1
+        self.job_latencies.append(time.perf_counter() - start)
+
+    async def _user(
+        self, client: httpx.AsyncClient, delay: float, deadline: float
+    ) -> None:
+        await asyncio.sleep(delay)
+        while time.monotonic() < deadline:
+            await self._job(client, deadline)
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+    async def _monitor(self, client: httpx.AsyncClient, deadline: float) -> None:
+        """每秒采样队列状态（不计入接口统计）"""
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/api/queue-status")
+                queue = response.json()["queue"]
+                self.queue_samples.append(
+                    {
+                        "queue_depth": queue["queue_depth"],
+                        "running": len(queue["running"]),
+                        "max_concurrent": queue["max_concurrent"],
+                    }
+                )
+            except (httpx.HTTPError, KeyError, ValueError):
+                pass
+            await asyncio.sleep(1.0)
+
+    async def run(self) -> Dict[str, Any]:
+        """运行压测并返回报告"""
+        limits = httpx.Limits(max_connections=self.users * 2 + 2)
+        async with httpx.AsyncClient(
+            base_url=self.base_url, timeout=60.0, limits=limits
+        ) as client:
+            start = time.monotonic()
+            deadline = start + self.duration
+            await asyncio.gather(
+                self._monitor(client, deadline),
+                *(
+                    self._user(client, self.ramp_up * index / self.users, deadline)
+                    for index in range(self.users)
+                ),
+            )
+            elapsed = time.monotonic() - start
+        return self.report(elapsed)
+
+    def _queue_summary(self) -> Dict[str, Any]:
+        if not self.queue_samples:
+            return {}
+        max_concurrent = self.queue_samples[-1]["max_concurrent"] or 1
+        utilization = [
+            sample["running"] / max_concurrent for sample in self.queue_samples
+        ]
+        return {
+            "samples": len(self.queue_samples),
+            "max_concurrent": max_concurrent,
+            "max_queue_depth": max(s["queue_depth"] for s in self.queue_samples),
+            "mean_queue_depth": round(
+                sum(s["queue_depth"] for s in self.queue_samples)
+                / len(self.queue_samples),
+                2,
+            ),
+            "mean_utilization": round(sum(utilization) / len(utilization), 3),
+            "queued_fraction": round(
+                sum(1 for s in self.queue_samples if s["queue_depth"])
+                / len(self.queue_samples),
+                3,
+            ),
+        }
+
+    @staticmethod
+    def _bottleneck(
+        endpoints: Dict[str, Dict[str, Any]], queue: Dict[str, Any]
+    ) -> Dict[str, str]:
+        """根据队列利用率与接口延迟判断先饱和的一层"""
+        if queue.get("queued_fraction", 0) >= CONVERTER_SATURATION_QUEUED_FRACTION:
+            return {
+                "tier": "converters",
+                "reason": "任务持续排队（并发槽位或内存预算已用尽），吞吐量受转换器限制",
+            }
+        slow = [
+            name
+            for name, stats in endpoints.items()
+            if stats["p95_ms"] > WEB_SATURATION_P95_MS or stats["non_2xx"]
+        ]
+        if slow:
+            return {
+                "tier": "web",
+                "reason": f"转换器未饱和，但以下接口变慢或出错: {', '.join(slow)}",
+            }
+        return {"tier": "none", "reason": "两层均未饱和，可增加虚拟用户数"}
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {
+            name: stats.summary(elapsed)
+            for name, stats in sorted(self.endpoints.items())
+        }
+        queue = self._queue_summary()
+        return {
+            "created_at": datetime.now().isoformat(),
+            "settings": {
+                "base_url": self.base_url,
+                "users": self.users,
+                "duration": self.duration,
+                "ramp_up": self.ramp_up,
+                "poll_interval": self.poll_interval,
+                "think_time": self.think_time,
+                "document": self.pdf_name,
+                "config": self.config,
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "jobs": {
+                **dict(self.jobs),
+                "jobs_per_second": (
+                    round(self.jobs["completed"] / elapsed, 3) if elapsed else 0.0
+                ),
+                "latency": summarize_latencies(self.job_latencies),
+            },
+            "endpoints": endpoints,
+            "queue": queue,
+            "bottleneck": self._bottleneck(endpoints, queue),
+        }
+
+
+def prepare_local_server(
+    workdir: str, max_concurrent: Optional[int], stub: Optional[Any]
+):
+    """
+    为本地压测准备应用：数据目录指向临时目录，按需替换为桩后端
+
+    必须在导入 main 及任何 utils 模块之前调用：数据目录单例在导入时按环境变量创建，
+    先导入会使用相对默认路径，切换工作目录后写入仓库自身的数据目录
+    """
+    imported = sorted(name for name in sys.modules if name.startswith("utils."))
+    if imported:
+        raise RuntimeError(f"utils 模块已在设置数据目录前导入: {', '.join(imported)}")
+
+    # 切换工作目录前解析为绝对路径
+    workdir = os.path.abspath(workdir)
+    for name, sub in (
+        ("UPLOAD_DIR", "uploads"),
+        ("OUTPUT_DIR", "outputs"),
+        ("MANIFEST_DIR", "manifests"),
+        ("BATCH_DIR", "batches"),
+    ):
+        os.environ[name] = os.path.join(workdir, sub)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["TRACE_EXPORT_PATH"] = os.path.abspath(
+        os.getenv("TRACE_EXPORT_PATH", os.path.join(workdir, "traces.jsonl"))
+    )
+    if max_concurrent:
+        os.environ["MAX_CONCURRENT_JOBS"] = str(max_concurrent)
+    if stub is not None:
+        # 桩后端不使用模型，不需要预热 Marker 子进程
+        os.environ["SPECULATION_ENABLED"] = "false"
+
+    # 应用按相对路径挂载 static/ 与 templates/
+    os.chdir(Path(__file__).resolve().parent.parent)
+    import main
+
+    if stub is not None:
+        stub.install()
+    return main.app
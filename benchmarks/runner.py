@@ -0,0 +1,379 @@
+"""
+基准测试执行
+逐页执行扫描转换的各处理阶段（渲染、图像增强、检测器、Tesseract），记录每个阶段与每页的耗时，
+汇总为 pages/sec、p50/p95 单页延迟与峰值内存（RSS）
+"""
+
+import os
+import sys
+import time
+import shutil
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+import psutil
+
+RESULT_SCHEMA_VERSION = 1
+
+# 各阶段按执行顺序排列；requires_tesseract 的阶段在 Tesseract 不可用时跳过
+STAGES = [
+    {"name": "render", "requires_tesseract": False},
+    {"name": "enhance", "requires_tesseract": False},
+    {"name": "table_detection", "requires_tesseract": False},
+    {"name": "language_detection", "requires_tesseract": False},
+    {"name": "document_type", "requires_tesseract": False},
+    {"name": "tesseract_sample", "requires_tesseract": True},
+    {"name": "ocr", "requires_tesseract": True},
+]
+STAGE_NAMES = [stage["name"] for stage in STAGES]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """线性插值百分位数（q 取 0-100）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_latencies(values: List[float]) -> Dict[str, float]:
+    """耗时列表（秒）汇总为毫秒统计"""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(max(values) * 1000, 3) if values else 0.0,
+        "total_seconds": round(sum(values), 4),
+    }
+
+
+class PeakRSSSampler:
+    """后台线程定期采样当前进程的 RSS，记录峰值"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, self._process.memory_info().rss)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self._sample()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / 1024**2, 2)
+
+
+def configure_tesseract(tesseract_cmd: Optional[str] = None) -> Optional[str]:
+    """
+    确定可用的 Tesseract 并返回其版本（不可用时返回 None）
+
+    转换器模块中写死了 Windows 安装路径，该路径不存在时改用 PATH 中的 tesseract
+    """
+    import pytesseract
+
+    candidates = [
+        tesseract_cmd,
+        os.getenv("TESSERACT_CMD"),
+        pytesseract.pytesseract.tesseract_cmd,
+        shutil.which("tesseract"),
+    ]
+    for candidate in candidates:
+        if candidate and (os.path.exists(candidate) or shutil.which(candidate)):
+            pytesseract.pytesseract.tesseract_cmd = candidate
+            try:
+                return str(pytesseract.get_tesseract_version())
+            except Exception:
+                continue
+    return None
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def collect_environment(tesseract_version: Optional[str]) -> Dict[str, Any]:
+    """记录运行环境，对比时用于判断两次结果是否可比"""
+    import fitz
+    import cv2
+
+    return {
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_mb": round(psutil.virtual_memory().total / 1024**2),
+        "pymupdf": fitz.VersionBind,
+        "opencv": cv2.__version__,
+        "tesseract": tesseract_version,
+    }
+
+
+class StageBenchmark:
+    """对单个文档逐页执行各处理阶段并计时"""
+
+    def __init__(self, stages: List[str], max_pages: Optional[int] = None):
+        from api.models import OCRConfig
+        from core.scan_converter import ScanPDFConverter
+        from utils.ocr_engine import OCREngine
+
+        self.stages = stages
+        self.max_pages = max_pages
+        self.engine = OCREngine
+        self.converter = ScanPDFConverter(config=OCRConfig())
+        self.scale_factor = OCREngine.get_scan_image_enhancement()["scale_factor"]
+
+    def select_pages(self, page_count: int) -> List[int]:
+        """均匀抽样待测页面（页码从0开始）"""
+        if not self.max_pages or page_count <= self.max_pages:
+            return list(range(page_count))
+        step = page_count / self.max_pages
+        return [int(index * step) for index in range(self.max_pages)]
+
+    def _page_stages(self, document, page_num: int, reference_text: str):
+        """按顺序生成 (阶段名, 调用) ，后面的阶段使用前面阶段的结果"""
+        import io
+        import fitz
+        from PIL import Image
+
+        state: Dict[str, Any] = {"text": reference_text}
+
+        def render():
+            page = document.load_page(page_num)
+            matrix = fitz.Matrix(self.scale_factor, self.scale_factor)
+            data = page.get_pixmap(matrix=matrix).tobytes("png")
+            state["image"] = Image.open(io.BytesIO(data))
+            state["image"].load()
+            # 文本页使用文本层作为检测器输入，扫描页使用语料的参考文本
+            state["text"] = page.get_text("text").strip()[:300] or reference_text
+
+        def enhance():
+            state["image"] = self.converter._enhance_image_quality(state["image"])
+
+        def table_detection():
+            self.engine.has_table_structure(state["image"])
+
+        def language_detection():
+            self.engine.detect_language(state["text"])
+
+        def document_type():
+            self.engine.detect_document_type(state["image"], state["text"])
+
+        def tesseract_sample():
+            state["text"] = (
+                self.engine.get_sample_text_for_detection(state["image"])
+                or state["text"]
+            )
+
+        def ocr():
+            self.converter._multi_ocr_recognize(state["image"])
+
+        calls: Dict[str, Callable[[], None]] = {
+            "render": render,
+            "enhance": enhance,
+            "table_detection": table_detection,
+            "language_detection": language_detection,
+            "document_type": document_type,
+            "tesseract_sample": tesseract_sample,
+            "ocr": ocr,
+        }
+        # 渲染是其余阶段的输入，始终执行
+        for name in STAGE_NAMES:
+            if name == "render" or name in self.stages:
+                yield name, calls[name]
+
+    def run_document(self, document_info: Dict[str, Any]) -> Dict[str, Any]:
+        """测量单个文档"""
+        import fitz
+
+        stage_times: Dict[str, List[float]] = {name: [] for name in self.stages}
+        page_times: List[float] = []
+
+        with PeakRSSSampler() as sampler, fitz.open(document_info["path"]) as document:
+            pages = self.select_pages(document.page_count)
+            start = time.perf_counter()
+            for page_num in pages:
+                page_start = time.perf_counter()
+                for name, call in self._page_stages(
+                    document, page_num, document_info.get("sample_text", "")
+                ):
+                    stage_start = time.perf_counter()
+                    call()
+                    if name in stage_times:
+                        stage_times[name].append(time.perf_counter() - stage_start)
+                page_times.append(time.perf_counter() - page_start)
+            elapsed = time.perf_counter() - start
+
+        return {
+            "name": document_info["name"],
+            "kind": document_info["kind"],
+            "lang": document_info["lang"],
+            "sha256": document_info["sha256"],
+            "pages": document_info["pages"],
+            "pages_measured": len(pages),
+            "sampled": len(pages) < document_info["pages"],
+            "elapsed_seconds": round(elapsed, 4),
+            "pages_per_second": round(len(pages) / elapsed, 3) if elapsed else 0.0,
+            "page_latency": summarize_latencies(page_times),
+            "stages": {
+                name: summarize_latencies(times) for name, times in stage_times.items()
+            },
+            "peak_rss_mb": sampler.peak_mb,
+            "_page_times": page_times,
+            "_stage_times": stage_times,
+        }
+
+
+def run_benchmark(
+    documents: List[Dict[str, Any]],
+    stages: List[str],
+    max_pages: Optional[int],
+    repeat: int,
+    tesseract_version: Optional[str],
+    corpus_digest: str,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        documents: 语料文档描述
+        stages: 要测量的阶段
+        max_pages: 每个文档最多测量的页数（均匀抽样），None 表示全部页面
+        repeat: 每个文档重复测量的次数（取全部重复的合并统计）
+        tesseract_version: Tesseract 版本，None 表示不可用
+        corpus_digest: 语料摘要
+        progress: 进度回调
+
+    Returns:
+        Dict[str, Any]: 基准测试结果
+    """
+    from langdetect import DetectorFactory
+
+    # langdetect 默认随机初始化，固定种子保证检测路径可重复
+    DetectorFactory.seed = 0
+
+    skipped_stages = {}
+    if tesseract_version is None:
+        for stage in STAGES:
+            if stage["requires_tesseract"] and stage["name"] in stages:
+                skipped_stages[stage["name"]] = "Tesseract 不可用"
+        stages = [name for name in stages if name not in skipped_stages]
+
+    benchmark = StageBenchmark(stages, max_pages)
+
+    # 预热：首次调用时的模块加载与内存分配不计入结果
+    if documents:
+        warmup = StageBenchmark(stages, max_pages=1)
+        warmup.run_document(documents[0])
+
+    results = []
+    all_page_times: List[float] = []
+    all_stage_times: Dict[str, List[float]] = {name: [] for name in stages}
+    total_elapsed = 0.0
+    total_pages = 0
+    with PeakRSSSampler() as sampler:
+        for document_info in documents:
+            runs = []
+            for iteration in range(repeat):
+                if progress:
+                    progress(f"{document_info['name']} ({iteration + 1}/{repeat})")
+                runs.append(benchmark.run_document(document_info))
+            result = _merge_runs(runs)
+            total_elapsed += result["elapsed_seconds"]
+            total_pages += result["pages_measured"]
+            all_page_times.extend(result.pop("_page_times"))
+            for name, times in result.pop("_stage_times").items():
+                all_stage_times[name].extend(times)
+            results.append(result)
+
+    return {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "environment": collect_environment(tesseract_version),
+        "settings": {
+            "stages": stages,
+            "max_pages": max_pages,
+            "repeat": repeat,
+            "corpus_digest": corpus_digest,
+        },
+        "skipped_stages": skipped_stages,
+        "summary": {
+            "documents": len(results),
+            "pages_measured": total_pages,
+            "elapsed_seconds": round(total_elapsed, 4),
+            "pages_per_second": (
+                round(total_pages / total_elapsed, 3) if total_elapsed else 0.0
+            ),
+            "page_latency": summarize_latencies(all_page_times),
+            "stages": {
+                name: summarize_latencies(times)
+                for name, times in all_stage_times.items()
+            },
+            "peak_rss_mb": sampler.peak_mb,
+        },
+        "documents": results,
+    }
+
+
+def _merge_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并同一文档多次重复测量的结果"""
+    merged = dict(runs[0])
+    if len(runs) == 1:
+        return merged
+
+    page_times = [t for run in runs for t in run["_page_times"]]
+    stage_times = {
+        name: [t for run in runs for t in run["_stage_times"][name]]
+        for name in runs[0]["_stage_times"]
+    }
+    elapsed = sum(run["elapsed_seconds"] for run in runs)
+    pages = sum(run["pages_measured"] for run in runs)
+    merged.update(
+        {
+            "pages_measured": pages,
+            "elapsed_seconds": round(elapsed, 4),
+            "pages_per_second": round(pages / elapsed, 3) if elapsed else 0.0,
+            "page_latency": summarize_latencies(page_times),
+            "stages": {
+                name: summarize_latencies(times) for name, times in stage_times.items()
+            },
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+            "_page_times": page_times,
+            "_stage_times": stage_times,
+        }
+    )
+    return merged
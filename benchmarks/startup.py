@@ -0,0 +1,117 @@
+"""
+服务启动耗时检查
+在全新子进程中导入 main（与每个 uvicorn worker 启动时相同），测量导入耗时，
+并检查转换引擎的重量级依赖没有在启动时被导入
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List
+
+from benchmarks.runner import percentile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 启动耗时预算（秒，取各次测量的中位数）
+DEFAULT_BUDGET_SECONDS = 3.0
+
+# 只应在首次转换时（或转换子进程中）导入的模块
+DEFERRED_MODULES = (
+    "marker",
+    "torch",
+    "surya",
+    "transformers",
+    "cv2",
+    "langdetect",
+    "core.scan_converter",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+deferred = {deferred!r}
+loaded = sorted(
+    name for name in sys.modules if name.split(".")[0] in deferred or name in deferred
+)
+print(json.dumps({{"import_seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def _probe_once(workdir: str) -> Dict[str, Any]:
+    """在子进程中导入一次 main"""
+    env = dict(os.environ)
+    for name, sub in (
+        ("UPLOAD_DIR", "uploads"),
+        ("OUTPUT_DIR", "outputs"),
+        ("MANIFEST_DIR", "manifests"),
+        ("BATCH_DIR", "batches"),
+    ):
+        env[name] = os.path.join(workdir, sub)
+    env["TRACE_EXPORT_PATH"] = os.path.join(workdir, "traces.jsonl")
+    env["LOG_LEVEL"] = "WARNING"
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(deferred=DEFERRED_MODULES)],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"导入 main 失败:\n{completed.stderr.strip()}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = wall
+    return result
+
+
+def measure_startup(repeat: int = 5) -> Dict[str, Any]:
+    """
+    多次测量启动耗时
+
+    Returns:
+        Dict[str, Any]: 导入耗时与进程总耗时的中位数/最大值、启动时加载的延迟模块
+    """
+    with tempfile.TemporaryDirectory(prefix="pdf-startup-") as workdir:
+        # 第一次运行用于预热文件系统缓存与字节码，不计入结果
+        _probe_once(workdir)
+        runs = [_probe_once(workdir) for _ in range(repeat)]
+
+    imports = [run["import_seconds"] for run in runs]
+    processes = [run["process_seconds"] for run in runs]
+    return {
+        "repeat": repeat,
+        "import_seconds": {
+            "median": round(percentile(imports, 50), 3),
+            "max": round(max(imports), 3),
+        },
+        "process_seconds": {
+            "median": round(percentile(processes, 50), 3),
+            "max": round(max(processes), 3),
+        },
+        "deferred_modules_loaded": sorted(
+            {name for run in runs for name in run["loaded"]}
+        ),
+    }
+
+
+def check_startup(result: Dict[str, Any], budget: float) -> List[str]:
+    """返回违反启动预算的问题列表（为空表示通过）"""
+    problems = []
+    median = result["import_seconds"]["median"]
+    if median > budget:
+        problems.append(f"导入 main 耗时 {median}s，超过预算 {budget}s")
+    if result["deferred_modules_loaded"]:
+        problems.append(
+            "启动时导入了应延迟加载的模块: "
+            + ", ".join(result["deferred_modules_loaded"])
+        )
+    return problems
@@ -0,0 +1,85 @@
+"""
+桩转换后端
+替换 api.routes 中的 convert_pdf_task / scan_convert_pdf_task：不加载模型、不执行OCR，
+按配置的耗时逐页推进进度并写出与真实转换相同位置的输出文件，
+用于在压测中把 Web 层（上传、进度轮询、结果读取、排队）与转换器的速度分开。
+utils 模块在导入时按环境变量创建数据目录单例，因此只在转换时导入，
+构造桩后端不会早于 prepare_local_server 设置数据目录
+"""
+
+import asyncio
+import random
+from pathlib import Path
+from typing import Dict, Any
+
+
+class StubBackend:
+    """可配置耗时的桩转换后端"""
+
+    def __init__(
+        self,
+        fixed_seconds: float = 0.2,
+        seconds_per_page: float = 0.05,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            fixed_seconds: 每个任务的固定耗时（模拟模型加载等开销）
+            seconds_per_page: 每页耗时
+            jitter: 耗时的随机浮动比例（0.2 表示 ±20%）
+            failure_rate: 任务失败的概率
+            seed: 随机种子
+        """
+        self.fixed_seconds = fixed_seconds
+        self.seconds_per_page = seconds_per_page
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def _vary(self, seconds: float) -> float:
+        return max(seconds * (1 + self._random.uniform(-self.jitter, self.jitter)), 0)
+
+    async def convert(
+        self, pdf_path: str, task_id: str, config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """与真实转换任务相同的签名与进度、输出约定"""
+        from utils.admission import count_pdf_pages, select_pages
+        from utils.cancellation import cancellation_registry
+        from utils.file_handler import FileHandler
+        from utils.progress import progress_manager
+        from utils.task_manifest import task_manifest
+
+        progress_manager.start_task(task_id)
+        token = cancellation_registry.get(task_id)
+
+        total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+        pages = select_pages(config.get("page_range"), total_pages)
+        await asyncio.sleep(self._vary(self.fixed_seconds))
+
+        for index in range(len(pages)):
+            if token is not None and token.is_cancelled:
+                progress_manager.cancel_task(task_id, token.reason or "cancelled")
+                return {"success": False, "error": "任务已取消"}
+            await asyncio.sleep(self._vary(self.seconds_per_page))
+            progress_manager.update_progress(task_id, 100 * (index + 1) / len(pages))
+
+        if self._random.random() < self.failure_rate:
+            progress_manager.fail_task(task_id, "桩后端模拟失败")
+            return {"success": False, "error": "桩后端模拟失败"}
+
+        output_dir = FileHandler().ensure_output_directory(task_id)
+        output_file = output_dir / f"{Path(pdf_path).stem}.md"
+        content = "".join(f"\n=== 第 {page + 1} 页 ===\nstub\n" for page in pages)
+        output_file.write_text(content, encoding="utf-8")
+        task_manifest.record_outputs(task_id, [str(output_file)])
+        progress_manager.complete_task(task_id)
+        return {"success": True, "output_file": str(output_file)}
+
+    def install(self) -> None:
+        """替换路由模块中的转换函数（两种模式都使用桩后端）"""
+        import api.routes
+
+        api.routes.convert_pdf_task = self.convert
+        api.routes.scan_convert_pdf_task = self.convert
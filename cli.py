@@ -0,0 +1,471 @@
+"""
+批量转换命令行
+不经过 HTTP 服务，直接调用 MarkerPDFConverter / ScanPDFConverter 转换整个目录或通配符匹配的PDF：
+可配置并发数，按文件校验和与转换配置跳过已完成的文件，显示 rich 进度并输出吞吐量汇总报告
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import itertools
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import click
+from rich.console import Console
+from rich.progress import (
+    Progress,
+    BarColumn,
+    MofNCompleteColumn,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
+)
+from rich.table import Table
+
+# 已完成文件的记录（位于输出目录）
+STATE_FILENAME = ".batch_state.json"
+REPORT_FILENAME = "batch_report.json"
+
+console = Console()
+
+
+def collect_inputs(inputs: List[str], recursive: bool) -> List[Path]:
+    """
+    展开输入参数为PDF文件列表
+
+    Args:
+        inputs: 文件、目录或通配符
+        recursive: 目录输入时是否递归子目录
+
+    Returns:
+        List[Path]: 去重后的PDF文件列表（按路径排序）
+    """
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = "**/*.pdf" if recursive else "*.pdf"
+            files.extend(p for p in path.glob(pattern) if p.is_file())
+        elif path.is_file():
+            files.append(path)
+        else:
+            files.extend(Path(p) for p in glob.glob(item, recursive=True))
+
+    unique = {p.resolve(): p for p in files if p.suffix.lower() == ".pdf"}
+    return sorted(unique.values())
+
+
+def build_config(mode: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """按转换模式生成经模型校验的配置字典"""
+    from api.models import MarkerConfig, OCRConfig
+
+    common = {
+        "output_format": options["output_format"],
+        "page_range": options["page_range"],
+    }
+    if mode == "ocr":
+        return OCRConfig(ocr_quality=options["ocr_quality"], **common).model_dump()
+
+    config = MarkerConfig(
+        use_llm=options["use_llm"],
+        extra_output_formats=options["extra_formats"],
+        **common,
+    )
+    config.gpu_config.enabled = options["gpu"]
+    return config.model_dump()
+
+
+def config_digest(config: Dict[str, Any]) -> str:
+    """转换配置摘要（与文件校验和一起决定是否可跳过）"""
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchState:
+    """已完成文件记录 - 以 "文件校验和:配置摘要" 为键"""
+
+    def __init__(self, output_root: Path):
+        self.path = output_root / STATE_FILENAME
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def is_done(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry and Path(entry["output_file"]).exists():
+            return entry
+        return None
+
+    def mark_done(self, key: str, entry: Dict[str, Any]) -> None:
+        self.entries[key] = entry
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+
+
+class BatchRunner:
+    """批量转换执行器"""
+
+    def __init__(
+        self,
+        files: List[Path],
+        output_root: Path,
+        mode: str,
+        workers: int,
+        options: Dict[str, Any],
+        force: bool,
+    ):
+        self.files = files
+        self.output_root = output_root
+        self.mode = mode
+        self.workers = workers
+        self.options = options
+        self.force = force
+        self.state = BatchState(output_root)
+        self.results: List[Dict[str, Any]] = []
+        self._used_names = self._reserved_names()
+
+    def _reserved_names(self) -> set:
+        """已占用的输出目录名：以往批次记录的输出目录与输出目录下已有的目录"""
+        names = {
+            Path(entry["output_file"]).parent.name
+            for entry in self.state.entries.values()
+            if entry.get("output_file")
+        }
+        if self.output_root.is_dir():
+            names.update(p.name for p in self.output_root.iterdir() if p.is_dir())
+        return names
+
+    def _output_dir(self, pdf_path: Path, checksum: str, key: str) -> Path:
+        """
+        每个文件一个输出目录
+
+        同一文件按相同配置重新转换（--force 或输出已丢失）时沿用记录中的目录；
+        其他情况下目录名被占用时追加校验和前缀区分，不会覆盖其他文件的输出
+        """
+        entry = self.state.entries.get(key)
+        if entry and entry.get("output_file"):
+            return Path(entry["output_file"]).parent
+        stem, prefix = pdf_path.stem, f"{pdf_path.stem}_{checksum[:8]}"
+        candidates = itertools.chain(
+            (stem, prefix), (f"{prefix}_{n}" for n in itertools.count(2))
+        )
+        name = next(c for c in candidates if c not in self._used_names)
+        self._used_names.add(name)
+        return self.output_root / name
+
+    def _resolve_mode(self, pdf_path: Path) -> Tuple[str, int]:
+        """确定转换模式与页数（auto 模式按预检推荐）"""
+        from utils.preflight import analyze_pdf
+
+        report = analyze_pdf(str(pdf_path))
+        if report["needs_password"]:
+            raise ValueError("PDF已加密，无法转换")
+        mode = self.mode
+        if mode == "auto":
+            mode = report["recommended_mode"] or "marker"
+        return mode, report["page_count"]
+
+    async def _convert_one(self, pdf_path: Path) -> Dict[str, Any]:
+        """转换单个文件"""
+        from core.converter import MarkerPDFConverter
+        from core.scan_converter import ScanPDFConverter
+        from api.models import OCRConfig
+        from utils.task_manifest import compute_checksum
+        from utils.cancellation import cancellation_registry
+        from utils.cpu_budget import cpu_budget
+        from utils.devices import device_scheduler
+        from utils.progress import progress_manager
+
+        start = time.perf_counter()
+        result = {"source": str(pdf_path), "status": "failed", "pages": 0}
+        try:
+            checksum = await asyncio.to_thread(compute_checksum, pdf_path)
+            mode, pages = await asyncio.to_thread(self._resolve_mode, pdf_path)
+            config = build_config(mode, self.options)
+            key = f"{checksum}:{config_digest(config)}"
+            result.update({"mode": mode, "pages": pages, "sha256": checksum})
+
+            done = None if self.force else self.state.is_done(key)
+            if done is not None:
+                result.update({"status": "skipped", "output_file": done["output_file"]})
+                return result
+
+            task_id = str(uuid.uuid4())
+            output_dir = self._output_dir(pdf_path, checksum, key)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            cancellation_registry.create(task_id, mode)
+            try:
+                await cpu_budget.acquire_async(task_id)
+                if mode == "ocr":
+                    converter = ScanPDFConverter(config=OCRConfig(**config))
+                else:
+                    # 与服务端队列相同，按任务分配设备，并发文件不会挤在同一块GPU上
+                    await device_scheduler.acquire_async(
+                        task_id, config.get("gpu_config")
+                    )
+                    converter = MarkerPDFConverter(config=config)
+                outcome = await converter.convert_pdf_async(
+                    str(pdf_path), task_id, output_dir
+                )
+            finally:
+                device_scheduler.release(task_id)
+                cpu_budget.release(task_id)
+                cancellation_registry.remove(task_id)
+                progress_manager.remove_task(task_id)
+
+            if not outcome.get("success"):
+                result["error"] = outcome.get("error") or "转换失败"
+                return result
+
+            result.update(
+                {"status": "converted", "output_file": outcome["output_file"]}
+            )
+            self.state.mark_done(
+                key,
+                {
+                    "source": str(pdf_path),
+                    "output_file": outcome["output_file"],
+                    "mode": mode,
+                    "finished_at": datetime.now().isoformat(),
+                },
+            )
+            return result
+
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            return result
+        finally:
+            result["seconds"] = round(time.perf_counter() - start, 3)
+
+    async def run(self) -> Dict[str, Any]:
+        """按并发数转换全部文件并返回汇总报告"""
+        from core.marker_worker import marker_warm_pool
+        from utils.cpu_budget import cpu_budget
+
+        # 每个并发槽位保留一个已加载模型的 Marker 子进程，文件之间复用
+        marker_warm_pool.enabled = True
+        marker_warm_pool.max_standby = self.workers
+        # 线程预算按命令行并发数分配
+        cpu_budget.slots = self.workers
+
+        started_at = datetime.now()
+        start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        for pdf_path in self.files:
+            queue.put_nowait(pdf_path)
+
+        with Progress(
+            TextColumn("[bold blue]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[pages]} 页"),
+            TimeElapsedColumn(),
+            TimeRemainingColumn(),
+            console=console,
+        ) as progress:
+            overall = progress.add_task("批量转换", total=len(self.files), pages=0)
+            converted_pages = 0
+
+            async def worker():
+                nonlocal converted_pages
+                while not queue.empty():
+                    pdf_path = queue.get_nowait()
+                    result = await self._convert_one(pdf_path)
+                    self.results.append(result)
+                    if result["status"] == "converted":
+                        converted_pages += result["pages"]
+                    style = {"converted": "green", "skipped": "dim"}.get(
+                        result["status"], "red"
+                    )
+                    progress.console.print(
+                        f"[{style}]{result['status']:>9}[/] {pdf_path} "
+                        f"({result['seconds']:.1f}s)"
+                        + (f" - {result['error']}" if result.get("error") else "")
+                    )
+                    progress.update(overall, advance=1, pages=converted_pages)
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.workers)))
+            finally:
+                await asyncio.to_thread(marker_warm_pool.discard)
+
+        return self._report(started_at, time.perf_counter() - start)
+
+    def _report(self, started_at: datetime, elapsed: float) -> Dict[str, Any]:
+        """生成汇总报告"""
+        counts = {"converted": 0, "skipped": 0, "failed": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+        converted = [r for r in self.results if r["status"] == "converted"]
+        pages = sum(r["pages"] for r in converted)
+        busy_seconds = sum(r["seconds"] for r in converted)
+
+        return {
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "mode": self.mode,
+            "workers": self.workers,
+            "files": len(self.files),
+            **counts,
+            "pages_converted": pages,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": {
+                "files_per_minute": (
+                    round(len(converted) * 60 / elapsed, 3) if elapsed else 0.0
+                ),
+                "pages_per_second": round(pages / elapsed, 3) if elapsed else 0.0,
+                "seconds_per_page": round(busy_seconds / pages, 3) if pages else 0.0,
+            },
+            "results": sorted(self.results, key=lambda r: r["source"]),
+        }
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    """在终端输出汇总表"""
+    table = Table(title="批量转换汇总", show_header=False)
+    table.add_row("文件总数", str(report["files"]))
+    table.add_row("已转换", f"[green]{report['converted']}[/]")
+    table.add_row("已跳过", str(report["skipped"]))
+    table.add_row("失败", f"[red]{report['failed']}[/]")
+    table.add_row("转换页数", str(report["pages_converted"]))
+    table.add_row("总耗时", f"{report['elapsed_seconds']:.1f} 秒")
+    throughput = report["throughput"]
+    table.add_row("文件/分钟", f"{throughput['files_per_minute']:.2f}")
+    table.add_row("页/秒", f"{throughput['pages_per_second']:.2f}")
+    table.add_row("平均每页耗时", f"{throughput['seconds_per_page']:.2f} 秒")
+    console.print(table)
+
+
+@click.command()
+@click.argument("inputs", nargs=-1, required=True)
+@click.option(
+    "-o",
+    "--output",
+    "output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("outputs/batch"),
+    show_default=True,
+    help="输出目录",
+)
+@click.option(
+    "-m",
+    "--mode",
+    type=click.Choice(["auto", "marker", "ocr"]),
+    default="auto",
+    show_default=True,
+    help="转换模式，auto 按预检结果选择",
+)
+@click.option(
+    "-w", "--workers", type=click.IntRange(1, 32), default=2, show_default=True
+)
+@click.option("-r", "--recursive", is_flag=True, help="目录输入时递归子目录")
+@click.option(
+    "--output-format",
+    type=click.Choice(["markdown", "json", "html", "chunks"]),
+    default="markdown",
+    show_default=True,
+)
+@click.option(
+    "--extra-format",
+    "extra_formats",
+    type=click.Choice(["markdown", "json", "html", "chunks"]),
+    multiple=True,
+    help="Marker 模式同一次转换额外输出的格式（可重复）",
+)
+@click.option("--page-range", default=None, help='页码范围（从1开始），如 "1-3,7"')
+@click.option(
+    "--ocr-quality",
+    type=click.Choice(["fast", "balanced", "accurate"]),
+    default="balanced",
+    show_default=True,
+)
+@click.option("--gpu", is_flag=True, help="Marker 模式启用GPU")
+@click.option("--use-llm", is_flag=True, help="Marker 模式启用LLM增强")
+@click.option("--force", is_flag=True, help="不跳过已完成的文件")
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help=f"汇总报告路径（默认 <输出目录>/{REPORT_FILENAME}）",
+)
+def main(
+    inputs,
+    output: Path,
+    mode: str,
+    workers: int,
+    recursive: bool,
+    output_format: str,
+    extra_formats: Tuple[str, ...],
+    page_range: Optional[str],
+    ocr_quality: str,
+    gpu: bool,
+    use_llm: bool,
+    force: bool,
+    report: Optional[Path],
+):
+    """批量转换目录或通配符匹配的PDF文件"""
+    output.mkdir(parents=True, exist_ok=True)
+    # 批量任务的清单与断点写入输出目录，避免被服务端的存储清理回收
+    os.environ.setdefault("MANIFEST_DIR", str(output / ".manifests"))
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    files = collect_inputs(list(inputs), recursive)
+    if not files:
+        console.print("[red]未找到PDF文件[/]")
+        sys.exit(1)
+
+    options = {
+        "output_format": output_format,
+        "extra_formats": list(extra_formats),
+        "page_range": page_range,
+        "ocr_quality": ocr_quality,
+        "gpu": gpu,
+        "use_llm": use_llm,
+    }
+    try:
+        # 提前校验配置，避免每个文件都失败
+        build_config("ocr" if mode == "ocr" else "marker", options)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    if gpu:
+        from utils.devices import device_scheduler
+
+        errors = device_scheduler.validate(
+            build_config("marker", options)["gpu_config"]
+        )
+        if errors:
+            raise click.BadParameter("; ".join(errors), param_hint="--gpu")
+
+    console.print(f"📚 共 {len(files)} 个PDF文件，并发数 {workers}，模式 {mode}")
+    runner = BatchRunner(files, output, mode, workers, options, force)
+    summary = asyncio.run(runner.run())
+
+    report_path = report or output / REPORT_FILENAME
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(
+        json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    print_summary(summary)
+    console.print(f"📄 汇总报告: {report_path}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
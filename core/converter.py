@@ -1,15 +1,32 @@
 import os
 import json
+import logging
 import time
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from marker.converters.pdf import PdfConverter
-from marker.models import create_model_dict
-from marker.config.parser import ConfigParser
-from marker.output import text_from_rendered
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 from utils.progress import progress_manager, ProgressCallback
 from utils.file_handler import FileHandler
+from utils.task_manifest import task_manifest
+from utils.metrics import stage_timer, STAGE_SECONDS, PAGES_TOTAL
+from utils.profiling import TaskProfile
+from utils.tracing import log_event
+from utils.admission import count_pdf_pages, select_pages
+from utils.cancellation import cancellation_registry, TaskCancelledError
+from utils.checkpoint import CheckpointStore, config_fingerprint
+from utils.serialization import write_json, write_jsonl, chunks_as_jsonl
+from core.marker_worker import (
+    MarkerProcessRunner,
+    MESSAGE_READY,
+    get_shard_pages,
+    split_shards,
+    parse_page_range,
+)
+
+# Marker（torch、surya 等）只在转换子进程中使用，主进程不导入，避免拖慢服务启动
+if TYPE_CHECKING:
+    from marker.converters.pdf import PdfConverter
 
 
 class MarkerPDFConverter:
@@ -24,6 +41,16 @@ class MarkerPDFConverter:
         """
         # 处理配置参数
         self.output_format = config.get("output_format", "markdown")
+        # 主输出格式在前，额外格式与主输出共享同一次模型推理
+        self.output_formats = list(
+            dict.fromkeys(
+                _format_name(output_format)
+                for output_format in [
+                    self.output_format,
+                    *config.get("extra_output_formats", []),
+                ]
+            )
+        )
         self.use_llm = config.get("use_llm", False)
         self.force_ocr = config.get("force_ocr", False)
         self.save_images = config.get("save_images", False)
@@ -31,15 +58,37 @@ class MarkerPDFConverter:
         self.disable_image_extraction = config.get("disable_image_extraction", True)
         self.strip_existing_ocr = config.get("strip_existing_ocr", True)
         self.gpu_config = config.get("gpu_config", {})
+        self.capture_profile = config.get("capture_profile", False)
+        self.page_range = config.get("page_range")
+        self.model_load_seconds = 0.0
+        self.config = config
 
         # 保存LLM服务配置
         self.llm_service = config.get("llm_service")
 
         self.converter = None
+        self._converter_options: Dict[str, Any] = {}
+
+    @staticmethod
+    def preload() -> Dict[str, Any]:
+        """
+        加载 Marker 模型，不依赖具体转换配置（在转换子进程中调用）
+
+        设备由子进程启动时的环境变量决定（见 utils.devices）
+        """
+        from marker.models import create_model_dict
 
-        # 应用GPU配置
-        self._apply_gpu_config()
-        self._setup_converter()
+        with stage_timer("model_load", "marker"):
+            return create_model_dict()
+
+    def load_models(self, artifact_dict: Optional[Dict[str, Any]] = None):
+        """
+        创建转换器（在转换子进程中调用）
+
+        Args:
+            artifact_dict: 已加载的 Marker 模型，为 None 时在此加载
+        """
+        self._setup_converter(artifact_dict)
 
     def _check_llm_service_available(self) -> bool:
         """
@@ -56,38 +105,32 @@ class MarkerPDFConverter:
             _ = DashScopeService
             return True
         except ImportError as e:
-            print(f"⚠️  LLM服务检测失败: {e}")
-            print("   - 缺少 marker.services.dashscope.DashScopeService")
-            print("   - LLM功能将被自动禁用")
+            log_event(
+                "⚠️ LLM服务检测失败，LLM功能将被自动禁用",
+                logging.WARNING,
+                error=str(e),
+                missing="marker.services.dashscope.DashScopeService",
+            )
             return False
         except Exception as e:
-            print(f"⚠️  LLM服务检测异常: {e}")
-            print("   - LLM功能将被自动禁用")
+            log_event(
+                "⚠️ LLM服务检测异常，LLM功能将被自动禁用",
+                logging.WARNING,
+                error=str(e),
+            )
             return False
 
-    def _apply_gpu_config(self):
-        """应用GPU配置"""
-        if not self.gpu_config.get("enabled", False):
-            return
-
-        gpu_config = self.gpu_config
-        os.environ.update(
-            {
-                "NUM_DEVICES": str(gpu_config.get("num_devices", 1)),
-                "NUM_WORKERS": str(gpu_config.get("num_workers", 4)),
-                "TORCH_DEVICE": gpu_config.get("torch_device", "cuda"),
-                "CUDA_VISIBLE_DEVICES": gpu_config.get("cuda_visible_devices", "0"),
-            }
-        )
-
-    def _setup_converter(self):
+    def _setup_converter(self, artifact_dict: Optional[Dict[str, Any]] = None):
         """设置转换器配置"""
+        from marker.config.parser import ConfigParser
+        from marker.models import create_model_dict
+
         # 检测LLM服务可用性
         llm_service_available = self._check_llm_service_available()
 
         # 如果用户开启了LLM但服务不可用，自动禁用
         if self.use_llm and not llm_service_available:
-            print("🔄 自动禁用LLM功能（服务不可用）")
+            log_event("🔄 自动禁用LLM功能（服务不可用）", logging.WARNING)
             self.use_llm = False
 
         config = {
@@ -103,25 +146,19 @@ class MarkerPDFConverter:
         if self.use_llm:
             config["llm_service"] = "marker.services.dashscope.DashScopeService"
 
-        # 添加调试日志
-        print("🔍 [DEBUG] 转换器配置:")
-        print(f"   - force_ocr: {self.force_ocr}")
-        print(f"   - strip_existing_ocr: {self.strip_existing_ocr}")
-        print(f"   - save_images: {self.save_images}")
-        print(f"   - format_lines: {self.format_lines}")
-        print(f"   - disable_image_extraction: " f"{self.disable_image_extraction}")
-        print(f"   - gpu_enabled: {self.gpu_config.get('enabled', False)}")
-
-        # 添加LLM状态调试信息
-        print(f"   - use_llm: {self.use_llm}")
-        if self.use_llm:
-            print("   - llm_service: marker.services.dashscope.DashScopeService")
-            print("   - LLM状态: ✅ 已启用 (DashScope)")
-        else:
-            if llm_service_available:
-                print("   - LLM状态: ❌ 未启用")
-            else:
-                print("   - LLM状态: ❌ 已禁用 (服务不可用)")
+        # 记录转换器配置
+        log_event(
+            "🔍 转换器配置",
+            logging.DEBUG,
+            force_ocr=self.force_ocr,
+            strip_existing_ocr=self.strip_existing_ocr,
+            save_images=self.save_images,
+            format_lines=self.format_lines,
+            disable_image_extraction=self.disable_image_extraction,
+            gpu_enabled=self.gpu_config.get("enabled", False),
+            use_llm=self.use_llm,
+            llm_service_available=llm_service_available,
+        )
 
         config_parser = ConfigParser(config)
 
@@ -130,14 +167,107 @@ class MarkerPDFConverter:
         if self.use_llm:
             llm_service = config_parser.get_llm_service()
 
-        self.converter = PdfConverter(
+        if artifact_dict is None:
+            model_load_start = time.perf_counter()
+            with stage_timer("model_load", "marker"):
+                artifact_dict = create_model_dict()
+            self.model_load_seconds = time.perf_counter() - model_load_start
+
+        self._converter_options = {
+            "config": config,
+            "artifact_dict": artifact_dict,
+            "llm_service": llm_service,
+        }
+        self.converter = self._build_converter()
+
+    def _build_converter(self, page_range: Optional[str] = None) -> "PdfConverter":
+        """基于已加载的模型创建转换器，page_range 为 Marker 页码范围（从0开始）"""
+        from marker.config.parser import ConfigParser
+        from marker.converters.pdf import PdfConverter
+
+        config = dict(self._converter_options["config"])
+        if page_range is not None:
+            config["page_range"] = page_range
+        config_parser = ConfigParser(config)
+
+        return PdfConverter(
             config=config_parser.generate_config_dict(),
-            artifact_dict=create_model_dict(),
+            artifact_dict=self._converter_options["artifact_dict"],
             processor_list=config_parser.get_processors(),
             renderer=config_parser.get_renderer(),
-            llm_service=llm_service,
+            llm_service=self._converter_options["llm_service"],
         )
 
+    def render(self, pdf_path: str, page_range: Optional[str] = None) -> Dict[str, Any]:
+        """
+        转换指定页码范围并提取内容（在转换子进程中调用）
+
+        请求了多个输出格式时只构建一次文档结构（版面、OCR 等模型推理），
+        再由各格式的渲染器分别输出
+
+        Returns:
+            Dict[str, Any]: {"content": 内容, "metadata": 元数据, "images": 图片,
+            "extra_outputs": {额外格式: 内容}}
+        """
+        converter = (
+            self.converter if page_range is None else self._build_converter(page_range)
+        )
+        if len(self.output_formats) == 1:
+            return self._extract(self.output_format, converter(pdf_path))
+
+        from marker.config.parser import ConfigParser
+        from marker.util import strings_to_classes
+
+        document = converter.build_document(pdf_path)
+        payload: Optional[Dict[str, Any]] = None
+        for output_format in self.output_formats:
+            renderer_class = strings_to_classes(
+                [ConfigParser({"output_format": output_format}).get_renderer()]
+            )[0]
+            renderer = converter.resolve_dependencies(renderer_class)
+            result = self._extract(output_format, renderer(document))
+            if payload is None:
+                payload = {**result, "extra_outputs": {}}
+                continue
+            payload["extra_outputs"][output_format] = result["content"]
+            payload["images"] = {**(result["images"] or {}), **payload["images"]}
+        return payload
+
+    @staticmethod
+    def _extract(output_format: str, rendered: Any) -> Dict[str, Any]:
+        """从渲染结果中提取内容、元数据与图片"""
+        if output_format == "markdown":
+            from marker.output import text_from_rendered
+
+            text, metadata, images = text_from_rendered(rendered)
+            return {"content": text, "metadata": metadata, "images": images or {}}
+        return {
+            "content": rendered,
+            "metadata": getattr(rendered, "metadata", {}),
+            "images": getattr(rendered, "images", None) or {},
+        }
+
+    @staticmethod
+    def _merge_shards(shards: List[Dict[str, Any]]) -> Tuple[Any, Dict, Dict]:
+        """合并各分片的内容、元数据与图片（仅 markdown 会分片）"""
+        if len(shards) == 1:
+            shard = shards[0]
+            return shard["content"], shard["metadata"] or {}, shard["images"] or {}
+
+        content = "\n\n".join(shard["content"] for shard in shards)
+        metadata = dict(shards[0]["metadata"] or {})
+        images: Dict[str, Any] = {}
+        for key in ("page_stats", "table_of_contents"):
+            metadata[key] = [
+                item
+                for shard in shards
+                for item in ((shard["metadata"] or {}).get(key) or [])
+            ]
+        for shard in shards:
+            images.update(shard["images"] or {})
+        metadata["shards"] = len(shards)
+        return content, metadata, images
+
     async def convert_pdf_async(
         self, pdf_path: str, task_id: str, output_dir: Optional[str] = None
     ) -> Dict[str, Any]:
@@ -161,24 +291,15 @@ class MarkerPDFConverter:
         # 开始任务
         progress_manager.start_task(task_id, total_stages=3)
         progress_callback = ProgressCallback(task_id, progress_manager)
+        profile = TaskProfile(task_id, "marker")
+        token = cancellation_registry.create(task_id, "marker")
+        shard_results: Dict[int, Dict[str, Any]] = {}
 
         try:
             # 阶段1: 开始转换
             progress_callback(20)
-            rendered = await asyncio.to_thread(self.converter, pdf_path)
 
-            # 阶段2: 转换完成，提取结果
-            progress_callback(60)
-
-            if self.output_format == "markdown":
-                text, metadata, images = text_from_rendered(rendered)
-                content = text
-            else:
-                content = rendered
-                metadata = getattr(rendered, "metadata", {})
-                images = getattr(rendered, "images", {})
-
-            # 阶段3: 设置输出目录
+            # 设置输出目录
             if output_dir is None:
                 file_handler = FileHandler()
                 output_dir = file_handler.ensure_output_directory(task_id)
@@ -186,9 +307,163 @@ class MarkerPDFConverter:
                 output_dir = Path(output_dir)
                 output_dir.mkdir(parents=True, exist_ok=True)
 
-            # 阶段4: 保存文件
-            progress_callback(90)
-            output_file = self._save_content(content, output_dir, Path(pdf_path).stem)
+            # 仅转换所选页码；仅单独的 markdown 输出支持分片
+            total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+            pages = select_pages(self.page_range, total_pages)
+            shard_pages = (
+                get_shard_pages() if self.output_formats == ["markdown"] else 0
+            )
+            shards = split_shards(pages, shard_pages, total_pages)
+
+            # 读取已完成分片的断点
+            store = CheckpointStore(
+                output_dir,
+                config_fingerprint(
+                    task_id, pdf_path, "marker", self.config, shard_pages=shard_pages
+                ),
+                len(pages),
+            )
+            shard_results = await asyncio.to_thread(
+                store.load_shards, range(len(shards))
+            )
+            pending = [
+                (index, page_range)
+                for index, page_range in enumerate(shards)
+                if index not in shard_results
+            ]
+            if shard_results:
+                log_event("♻️ 从断点恢复", resumed_shards=len(shard_results))
+
+            # 阶段2: 在子进程中转换剩余分片（20% - 80%）
+            if pending:
+                runner = MarkerProcessRunner(
+                    self.config, pdf_path, pending, total_pages, token, output_dir
+                )
+                with profile.activate(), stage_timer("inference", "marker"):
+                    async with aclosing(runner.run()) as messages:
+                        async for message in messages:
+                            if message[0] == MESSAGE_READY:
+                                self._record_model_load(message[1], profile)
+                                continue
+
+                            _, index, payload, seconds = message
+                            shard_results[index] = payload
+                            await asyncio.to_thread(
+                                store.save_shard,
+                                index,
+                                payload,
+                                [
+                                    page + 1
+                                    for page in parse_page_range(
+                                        shards[index], total_pages
+                                    )
+                                ],
+                            )
+                            log_event(
+                                "📦 分片转换完成",
+                                logging.DEBUG,
+                                shard=index + 1,
+                                shards=len(shards),
+                                seconds=round(seconds, 2),
+                            )
+                            progress_callback(
+                                20 + 60 * len(shard_results) / len(shards)
+                            )
+
+            result = await self._finish_conversion(
+                task_id, pdf_path, output_dir, shard_results, profile, start_time
+            )
+
+            # 完整转换后不再需要断点
+            await asyncio.to_thread(store.clear)
+            return result
+
+        except TaskCancelledError as e:
+            if token.keep_partial and shard_results:
+                return await self._finish_conversion(
+                    task_id,
+                    pdf_path,
+                    output_dir,
+                    shard_results,
+                    profile,
+                    start_time,
+                    cancel_reason=e.reason,
+                )
+            progress_manager.cancel_task(task_id, e.reason)
+            log_event("⏹️ 转换已取消", reason=e.reason)
+            return {
+                "success": False,
+                "cancelled": True,
+                "error": str(e),
+                "processing_time": time.time() - start_time,
+            }
+
+        except Exception as e:
+            error_msg = f"转换失败: {str(e)}"
+            log_event(f"❌ {error_msg}", logging.ERROR)
+            progress_manager.fail_task(task_id, error_msg)
+            return {
+                "success": False,
+                "error": error_msg,
+                "processing_time": time.time() - start_time,
+            }
+
+    def _record_model_load(self, seconds: float, profile: TaskProfile) -> None:
+        """记录子进程上报的模型加载耗时"""
+        self.model_load_seconds = seconds
+        STAGE_SECONDS.observe(seconds, stage="model_load", mode="marker")
+        profile.record_stage("model_load", seconds)
+
+    async def _finish_conversion(
+        self,
+        task_id: str,
+        pdf_path: str,
+        output_dir: Path,
+        shard_results: Dict[int, Dict[str, Any]],
+        profile: TaskProfile,
+        start_time: float,
+        cancel_reason: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """合并分片结果并保存输出；cancel_reason 不为空时保存的是取消前已完成的部分"""
+        partial = cancel_reason is not None
+
+        with profile.activate(), stage_timer("extract", "marker"):
+            content, metadata, images = self._merge_shards(
+                [shard_results[index] for index in sorted(shard_results)]
+            )
+            if self.page_range:
+                metadata["page_range"] = self.page_range
+            if partial:
+                metadata["partial"] = True
+                metadata["cancel_reason"] = cancel_reason
+
+        page_stats = metadata.get("page_stats") or []
+        PAGES_TOTAL.inc(len(page_stats), mode="marker")
+
+        # 阶段3: 保存文件
+        progress_manager.update_progress(task_id, 90)
+        # 额外格式只在不分片时产生
+        extra_outputs = {}
+        if len(shard_results) == 1:
+            extra_outputs = (
+                next(iter(shard_results.values())).get("extra_outputs") or {}
+            )
+
+        with profile.activate(), stage_timer("write", "marker"):
+            output_file = self._save_content(
+                content, output_dir, Path(pdf_path).stem, metadata=metadata
+            )
+            output_files = {_format_name(self.output_format): str(output_file)}
+            for output_format, extra_content in extra_outputs.items():
+                output_files[output_format] = str(
+                    self._save_content(
+                        extra_content,
+                        output_dir,
+                        Path(pdf_path).stem,
+                        output_format,
+                        metadata,
+                    )
+                )
 
             image_paths = []
             if self.save_images and images:
@@ -196,45 +471,64 @@ class MarkerPDFConverter:
 
             metadata_file = self._save_metadata(metadata, output_dir)
 
-            end_time = time.time()
-            processing_time = end_time - start_time
+        # 保存耗时剖析
+        profile.finish()
+        profile.save(output_dir)
 
-            # 阶段5: 完成任务
-            progress_callback(100)
+        # 登记任务清单
+        task_manifest.record_outputs(
+            task_id,
+            list(output_files.values()),
+            image_paths=image_paths,
+            metadata_file=str(metadata_file),
+        )
+
+        processing_time = time.time() - start_time
+
+        # 阶段4: 完成任务
+        if partial:
+            progress_manager.cancel_task(task_id, cancel_reason, partial=True)
+            log_event("⏹️ 转换已取消，保留部分结果", reason=cancel_reason)
+        else:
+            progress_manager.update_progress(task_id, 100)
             progress_manager.complete_task(task_id, "转换完成")
 
             # 输出统计信息
-            if self.output_format == "markdown" and text:
-                char_count = len(text)
-                print(f"✅ 转换完成! 提取字符数: {char_count:,}")
+            if self.output_format == "markdown" and content:
+                log_event("✅ 转换完成", char_count=len(content))
             else:
-                print("✅ 转换完成!")
-
-            result = {
-                "success": True,
-                "output_file": str(output_file),
-                "metadata_file": str(metadata_file),
-                "image_paths": image_paths,
-                "processing_time": processing_time,
-                "output_format": self.output_format,
-                "content": content if self.output_format != "markdown" else None,
-                "text": text if self.output_format == "markdown" else None,
-            }
-
-            return result
+                log_event("✅ 转换完成")
+
+        is_markdown = self.output_format == "markdown"
+        return {
+            "success": True,
+            "cancelled": partial,
+            "output_file": str(output_file),
+            "metadata_file": str(metadata_file),
+            "image_paths": image_paths,
+            "processing_time": processing_time,
+            "output_format": self.output_format,
+            "output_files": output_files,
+            "content": content if not is_markdown else None,
+            "text": content if is_markdown else None,
+        }
 
-        except Exception as e:
-            error_msg = f"转换失败: {str(e)}"
-            progress_manager.fail_task(task_id, error_msg)
-            return {
-                "success": False,
-                "error": error_msg,
-                "processing_time": time.time() - start_time,
-            }
+    def _save_content(
+        self,
+        content: Any,
+        output_dir: Path,
+        filename: str,
+        output_format: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """
+        保存内容，output_format 为 None 时按主输出格式保存
 
-    def _save_content(self, content: Any, output_dir: Path, filename: str) -> Path:
-        """保存主要内容"""
-        if self.output_format == "markdown":
+        JSON 与 chunks 按块流式写入（默认紧凑）；chunks 以 JSON Lines 输出时，
+        块以外的字段（如 page_info）写入 metadata
+        """
+        output_format = output_format or self.output_format
+        if output_format == "markdown":
             output_file = output_dir / f"{filename}.md"
 
             # 处理markdown内容中的图片引用
@@ -242,27 +536,23 @@ class MarkerPDFConverter:
 
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(processed_content)
-        elif self.output_format == "json":
-            output_file = output_dir / f"{filename}.json"
-            with open(output_file, "w", encoding="utf-8") as f:
-                if hasattr(content, "model_dump"):
-                    json.dump(content.model_dump(), f, ensure_ascii=False, indent=2)
-                else:
-                    json.dump(content, f, ensure_ascii=False, indent=2)
-        elif self.output_format == "html":
+        elif output_format == "json":
+            output_file = write_json(content, output_dir / f"{filename}.json")
+        elif output_format == "html":
             output_file = output_dir / f"{filename}.html"
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(str(content))
-        else:  # chunks
-            output_file = output_dir / f"{filename}_chunks.json"
-            with open(output_file, "w", encoding="utf-8") as f:
-                if hasattr(content, "model_dump"):
-                    json.dump(content.model_dump(), f, ensure_ascii=False, indent=2)
-                else:
-                    json.dump(content, f, ensure_ascii=False, indent=2)
+        elif chunks_as_jsonl():
+            output_file = output_dir / f"{filename}_chunks.jsonl"
+            rest = write_jsonl(content, output_file, "blocks")
+            rest.pop("metadata", None)
+            if metadata is not None and rest:
+                metadata["chunks"] = rest
+        else:
+            output_file = write_json(content, output_dir / f"{filename}_chunks.json")
 
         # 输出保存路径信息
-        print(f"💾 已保存到: {output_file}")
+        log_event("💾 已保存", output_file=str(output_file))
 
         return output_file
 
@@ -346,6 +636,11 @@ class MarkerPDFConverter:
         return metadata_file
 
 
+def _format_name(output_format: Any) -> str:
+    """输出格式名称（配置中可能是 OutputFormat 枚举）"""
+    return getattr(output_format, "value", output_format)
+
+
 async def convert_pdf_task(
     pdf_path: str, task_id: str, config: Dict[str, Any]
 ) -> Dict[str, Any]:
@@ -366,7 +661,12 @@ async def convert_pdf_task(
     # 简化的配置日志
     output_format = config.get("output_format", "markdown")
     gpu_enabled = config.get("gpu_config", {}).get("enabled", False)
-    print(f"🔧 转换配置: 格式={output_format}, GPU={gpu_enabled}")
+    log_event(
+        "🔧 转换配置",
+        task_id=task_id,
+        output_format=output_format,
+        gpu_enabled=gpu_enabled,
+    )
 
     file_handler = FileHandler()
     output_dir = file_handler.ensure_output_directory(task_id)
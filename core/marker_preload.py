@@ -0,0 +1,56 @@
+"""
+Marker 模型预加载（prefork 模式）
+本模块由 forkserver 进程在启动时导入：导入时在 CPU 上加载一次 Marker 模型并冻结垃圾回收，
+之后 forkserver fork 出的转换子进程直接继承已加载的模型，只读权重以写时复制方式共享，
+不再由每个子进程各自加载一份。API 进程与 spawn 启动的子进程不会导入本模块；
+有GPU的主机不启用 prefork，子进程不会继承这里设置的 TORCH_DEVICE=cpu
+"""
+
+import gc
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+
+from utils.tracing import log_event
+
+# 已加载的 Marker 模型（加载失败时为 None，子进程回退为自行加载）
+artifact_dict: Optional[Dict[str, Any]] = None
+
+# 模型加载耗时（秒）
+load_seconds = 0.0
+
+
+def _load() -> None:
+    global artifact_dict, load_seconds
+
+    # CUDA 在 fork 前初始化会导致子进程无法使用，forkserver 中的模型只加载到 CPU
+    os.environ["TORCH_DEVICE"] = "cpu"
+    # torch 线程池在 forkserver 中初始化，按 CPU 线程预算设置（子进程再按任务调整）
+    from utils.cpu_budget import cpu_budget
+
+    os.environ.update(cpu_budget.worker_environment())
+    from core.converter import MarkerPDFConverter
+
+    start = time.perf_counter()
+    try:
+        artifact_dict = MarkerPDFConverter.preload()
+    except Exception as e:
+        log_event(
+            "⚠️ prefork 模型预加载失败，转换子进程将各自加载模型",
+            logging.WARNING,
+            error=str(e),
+        )
+        return
+    load_seconds = time.perf_counter() - start
+
+    # 冻结已有对象：子进程中的垃圾回收不再扫描（写入）模型对象所在的内存页，避免触发复制
+    gc.freeze()
+    log_event(
+        "🧬 prefork 模型已加载",
+        pid=os.getpid(),
+        load_seconds=round(load_seconds, 2),
+    )
+
+
+_load()
@@ -0,0 +1,589 @@
+"""
+Marker 转换子进程
+Marker 推理在独立子进程中执行，父进程在任务取消或超时时可直接终止子进程并释放显存；
+长文档可按页分片（MARKER_SHARD_PAGES），子进程加载一次模型后依次处理各分片并逐片回传结果；
+分片只覆盖请求选中的页码（page_range）。
+子进程先加载模型再等待任务，因此可在上传后提前启动（预热），转换开始时直接接管；
+prefork 模式（MARKER_PREFORK，仅没有GPU的主机）下 CPU 任务的子进程从已加载模型的 forkserver fork，以写时复制方式共享权重；
+torch 线程数由 CPU 线程预算按任务设置。
+子进程在任务之间复用，处理任务数或常驻内存达到阈值后在任务结束时回收（优雅退出），
+下一个任务改用新进程，长期运行时堆内存碎片不会持续累积
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+
+import psutil
+
+from utils.cancellation import CancellationToken, REASON_PAGE_TIMEOUT
+from utils.cpu_budget import cpu_budget
+from utils.devices import device_scheduler
+from utils.metrics import record_cache, SPECULATION_DISCARDED, WORKER_RECYCLES
+from utils.prerender import speculation_enabled
+from utils.tracing import log_event
+
+# 父进程检查取消令牌的间隔（秒）
+POLL_INTERVAL = 0.5
+
+# 终止子进程时等待其退出的时间（秒）
+TERMINATE_GRACE_SECONDS = 5
+
+# 子进程消息类型
+MESSAGE_READY = "ready"
+MESSAGE_SHARD = "shard"
+MESSAGE_ERROR = "error"
+MESSAGE_DONE = "done"
+
+# prefork 模式下由 forkserver 预先导入（导入时加载模型）的模块
+PREFORK_PRELOAD_MODULE = "core.marker_preload"
+
+
+def _prefork_requested() -> bool:
+    """是否配置了 prefork 模式（需要平台支持 forkserver，Windows 下自动回退为 spawn）"""
+    return (
+        os.getenv("MARKER_PREFORK", "false").lower() == "true"
+        and "forkserver" in multiprocessing.get_all_start_methods()
+    )
+
+
+def prefork_enabled() -> bool:
+    """
+    是否启用 prefork 模式
+
+    forkserver 中的模型只能加载到 CPU（TORCH_DEVICE=cpu），prefork 只用于没有GPU的主机；
+    有GPU时未分配设备的任务与开发模式一样由 Marker 自行选择设备，不继承 CPU 模型
+    """
+    return _prefork_requested() and not device_scheduler.has_gpu
+
+
+def _prefork_context():
+    """forkserver 启动方式（forkserver 启动时导入预加载模块）"""
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload([PREFORK_PRELOAD_MODULE])
+    return ctx
+
+
+def start_prefork_server() -> bool:
+    """
+    启动 forkserver，由其在后台加载 Marker 模型（服务启动时调用，不等待模型加载完成）
+
+    Returns:
+        bool: 是否已启动
+    """
+    if not _prefork_requested():
+        return False
+    if device_scheduler.has_gpu:
+        log_event("🧬 检测到GPU，不启用 prefork（prefork 只用于没有GPU的主机）")
+        return False
+    _prefork_context()
+    from multiprocessing import forkserver
+
+    forkserver.ensure_running()
+    log_event("🧬 已启动 prefork 服务进程，后台加载 Marker 模型")
+    return True
+
+
+def _inherited_models(device_env: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """prefork 子进程从 forkserver 继承的模型（仅未分配设备的 CPU 任务可用）"""
+    if _device_key(device_env) != "cpu":
+        return None
+    preload = sys.modules.get(PREFORK_PRELOAD_MODULE)
+    return getattr(preload, "artifact_dict", None)
+
+
+def get_shard_pages() -> int:
+    """每个分片的页数，0 表示不分片"""
+    return int(os.getenv("MARKER_SHARD_PAGES", 0))
+
+
+def format_page_range(pages: List[int]) -> str:
+    """将页码列表（从0开始）压缩为 Marker page_range 字符串（如 0-4,7）"""
+    parts = []
+    run_start = previous = pages[0]
+    for page in pages[1:] + [None]:
+        if page is not None and page == previous + 1:
+            previous = page
+            continue
+        parts.append(
+            str(run_start) if run_start == previous else f"{run_start}-{previous}"
+        )
+        if page is not None:
+            run_start = previous = page
+    return ",".join(parts)
+
+
+def parse_page_range(page_range: Optional[str], total_pages: int) -> List[int]:
+    """解析 Marker page_range 字符串为页码列表（从0开始），None 表示全部页面"""
+    if page_range is None:
+        return list(range(total_pages))
+    pages = []
+    for part in page_range.split(","):
+        start, _, end = part.partition("-")
+        pages.extend(range(int(start), int(end or start) + 1))
+    return pages
+
+
+def split_shards(
+    pages: List[int], shard_pages: int, total_pages: int
+) -> List[Optional[str]]:
+    """
+    按页数切分分片
+
+    Args:
+        pages: 待转换的页码（从0开始，升序）
+        shard_pages: 每个分片的页数，0 表示不分片
+        total_pages: 文档总页数
+
+    Returns:
+        List[Optional[str]]: Marker page_range 字符串列表，转换全部页面且不分片时为 [None]
+    """
+    if shard_pages <= 0 or len(pages) <= shard_pages:
+        return [None] if len(pages) == total_pages else [format_page_range(pages)]
+    return [
+        format_page_range(pages[start : start + shard_pages])
+        for start in range(0, len(pages), shard_pages)
+    ]
+
+
+def shard_page_count(page_range: Optional[str], total_pages: int) -> int:
+    """分片包含的页数"""
+    return len(parse_page_range(page_range, total_pages))
+
+
+def _set_torch_threads(threads: int) -> None:
+    """设置本进程的 torch 算子内线程数（模型加载后按任务设置，待命进程可被不同任务复用）"""
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _worker_main(device_env: Dict[str, str], thread_env: Dict[str, str], conn) -> None:
+    """
+    子进程入口：先加载模型，再循环等待任务并依次转换各分片；
+    模型在多个任务间复用（预热进程或完成任务后归还的进程），收到 None 时退出
+
+    Args:
+        device_env: 设备调度器分配的设备环境变量，在导入 torch 之前只对本进程生效
+        thread_env: CPU 线程预算的线程环境变量，同样在导入 torch 之前设置
+    """
+    try:
+        os.environ.update(thread_env)
+        os.environ.update(device_env)
+        # 在子进程中导入，避免父进程加载 Marker 模型
+        from core.converter import MarkerPDFConverter
+        from utils.profiling import cprofile_capture
+
+        start = time.perf_counter()
+        artifact_dict = _inherited_models(device_env)
+        if artifact_dict is None:
+            artifact_dict = MarkerPDFConverter.preload()
+        load_seconds = time.perf_counter() - start
+
+        while True:
+            job = conn.recv()
+            if job is None:
+                return
+            config, pdf_path, shards, output_dir, threads = job
+            _set_torch_threads(threads)
+
+            converter = MarkerPDFConverter(config=config)
+            converter.load_models(artifact_dict)
+            conn.send((MESSAGE_READY, load_seconds))
+            load_seconds = 0.0
+
+            with cprofile_capture(
+                config.get("capture_profile", False), Path(output_dir)
+            ):
+                for index, page_range in shards:
+                    start = time.perf_counter()
+                    payload = converter.render(pdf_path, page_range)
+                    conn.send(
+                        (MESSAGE_SHARD, index, payload, time.perf_counter() - start)
+                    )
+
+            conn.send((MESSAGE_DONE,))
+    except (EOFError, BrokenPipeError):
+        # 父进程已关闭连接（预热进程被丢弃）
+        pass
+    except Exception as e:
+        conn.send((MESSAGE_ERROR, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _device_key(device_env: Optional[Dict[str, str]]) -> str:
+    """子进程绑定的设备（决定待命进程能否被任务接管）"""
+    if not device_env:
+        return "cpu"
+    return json.dumps(device_env, sort_keys=True)
+
+
+def _start_worker(device_env: Dict[str, str]):
+    """启动 Marker 子进程，返回 (进程, 父进程端连接)"""
+    # 已分配设备的任务始终使用全新进程：forkserver 中的模型只在 CPU 上，CUDA 也不能跨 fork 继承
+    if prefork_enabled() and _device_key(device_env) == "cpu":
+        ctx = _prefork_context()
+    else:
+        ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(
+        target=_worker_main,
+        args=(device_env, cpu_budget.worker_environment(), child_conn),
+        daemon=True,
+    )
+    process.start()
+    child_conn.close()
+    return process, parent_conn
+
+
+def _rss_mb(pid: int) -> float:
+    """子进程的常驻内存（MB），prefork 子进程包含与 forkserver 共享的模型页"""
+    try:
+        return psutil.Process(pid).memory_info().rss / 1024**2
+    except psutil.Error:
+        return 0.0
+
+
+def _terminate(process) -> None:
+    """终止子进程"""
+    if process is None or not process.is_alive():
+        return
+    process.terminate()
+    process.join(TERMINATE_GRACE_SECONDS)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+class MarkerWarmPool:
+    """
+    Marker 待命进程池 - 持有已加载模型、等待任务的子进程：
+    上传后按预检结果提前启动（预热），任务正常完成后归还以供后续任务复用，闲置超时后终止；
+    同时登记全部子进程的任务数与内存，达到回收阈值的子进程不再归还
+    """
+
+    def __init__(self):
+        self.enabled = speculation_enabled()
+        self.idle_seconds = float(os.getenv("MARKER_WARM_IDLE_SECONDS", 300))
+        self.max_standby = int(os.getenv("MARKER_WARM_MAX_PROCESSES", 1))
+        # 回收阈值：子进程处理的任务数、常驻内存（MB），0 表示不限制
+        self.max_jobs = int(os.getenv("MARKER_WORKER_MAX_JOBS", 100))
+        self.max_rss_mb = float(os.getenv("MARKER_WORKER_MAX_RSS_MB", 0))
+        self._standby: List[Dict[str, Any]] = []
+        self._workers: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def start_worker(self, device_env: Dict[str, str]):
+        """启动 Marker 子进程并登记，返回 (进程, 父进程端连接)"""
+        process, conn = _start_worker(device_env)
+        with self._lock:
+            self._workers = {
+                pid: worker
+                for pid, worker in self._workers.items()
+                if worker["process"].is_alive()
+            }
+            self._workers[process.pid] = {
+                "process": process,
+                "device": _device_key(device_env),
+                "jobs": 0,
+                "started_at": time.time(),
+            }
+        return process, conn
+
+    def warm(self, device_env: Optional[Dict[str, str]] = None) -> bool:
+        """
+        启动预热进程（已有相同配置的待命进程时不重复启动）
+
+        Returns:
+            bool: 是否有可用的待命进程
+        """
+        if not self.enabled or self.max_standby <= 0:
+            return False
+        key = _device_key(device_env)
+        with self._lock:
+            if any(
+                entry["key"] == key and entry["process"].is_alive()
+                for entry in self._standby
+            ):
+                return True
+
+        process, conn = self.start_worker(device_env or {})
+        self._add(key, process, conn)
+        log_event("♨️ 已启动Marker预热进程", pid=process.pid)
+        return True
+
+    def release(
+        self, process, conn, device_env: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """
+        任务完成后归还子进程，模型保持加载；达到回收阈值的子进程在此优雅退出
+
+        Returns:
+            bool: 是否已归还或回收（未启用或进程已退出时返回 False，由调用方终止）
+        """
+        if not self.enabled or self.max_standby <= 0 or not process.is_alive():
+            return False
+        reason = self._recycle_reason(process)
+        if reason is not None:
+            self._retire(process, conn, reason)
+            return True
+        self._add(_device_key(device_env), process, conn)
+        return True
+
+    def _recycle_reason(self, process) -> Optional[str]:
+        """记录子进程完成一个任务，返回需要回收的原因（jobs / memory），无需回收时返回 None"""
+        with self._lock:
+            worker = self._workers.get(process.pid)
+            if worker is None:
+                return None
+            worker["jobs"] += 1
+            jobs = worker["jobs"]
+        if self.max_jobs and jobs >= self.max_jobs:
+            return "jobs"
+        if self.max_rss_mb and _rss_mb(process.pid) >= self.max_rss_mb:
+            return "memory"
+        return None
+
+    def _retire(self, process, conn, reason: str) -> None:
+        """回收子进程：任务已完成，通知其退出并等待，超时后终止"""
+        with self._lock:
+            worker = self._workers.pop(process.pid, {})
+        WORKER_RECYCLES.inc(reason=reason)
+        log_event(
+            "♻️ 回收Marker子进程",
+            pid=process.pid,
+            reason=reason,
+            jobs=worker.get("jobs", 0),
+            rss_mb=round(_rss_mb(process.pid), 1),
+        )
+        try:
+            conn.send(None)
+        except (OSError, EOFError):
+            pass
+        conn.close()
+        process.join(TERMINATE_GRACE_SECONDS)
+        _terminate(process)
+
+    def _add(self, key: str, process, conn) -> None:
+        """加入待命进程，超出数量上限时淘汰最早的进程"""
+        entry = {"key": key, "process": process, "conn": conn}
+        entry["timer"] = threading.Timer(self.idle_seconds, self._expire, (entry,))
+        entry["timer"].daemon = True
+        with self._lock:
+            self._standby.append(entry)
+            overflow = self._standby[: -self.max_standby]
+            self._standby = self._standby[-self.max_standby :]
+        entry["timer"].start()
+        for old in overflow:
+            self._discard(old)
+
+    def acquire(self, device_env: Optional[Dict[str, str]] = None):
+        """
+        接管配置匹配的待命进程
+
+        Returns:
+            (进程, 父进程端连接)，没有可用的待命进程时返回 None
+        """
+        key = _device_key(device_env)
+        with self._lock:
+            entry = next(
+                (
+                    e
+                    for e in self._standby
+                    if e["key"] == key and e["process"].is_alive()
+                ),
+                None,
+            )
+            if entry is not None:
+                self._standby.remove(entry)
+                entry["timer"].cancel()
+
+        record_cache("marker_warm", entry is not None)
+        if entry is None:
+            return None
+        return entry["process"], entry["conn"]
+
+    def _expire(self, entry: Dict[str, Any]) -> None:
+        """闲置超时"""
+        with self._lock:
+            if entry not in self._standby:
+                return
+            self._standby.remove(entry)
+        self._discard(entry)
+
+    def discard(self) -> None:
+        """丢弃全部待命进程"""
+        with self._lock:
+            standby, self._standby = self._standby, []
+        for entry in standby:
+            self._discard(entry)
+
+    @staticmethod
+    def _discard(entry: Dict[str, Any]) -> None:
+        entry["timer"].cancel()
+        SPECULATION_DISCARDED.inc(kind="marker_warm_process")
+        entry["conn"].close()
+        _terminate(entry["process"])
+        log_event("🧊 已终止闲置的Marker待命进程", logging.DEBUG)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            standby = {entry["process"].pid for entry in self._standby}
+            workers = [
+                worker
+                for worker in self._workers.values()
+                if worker["process"].is_alive()
+            ]
+            status = {
+                "enabled": self.enabled,
+                "prefork": prefork_enabled(),
+                "idle_seconds": self.idle_seconds,
+                "max_standby": self.max_standby,
+                "standby": [
+                    {"device": entry["key"], "pid": entry["process"].pid}
+                    for entry in self._standby
+                ],
+                "recycle": {"max_jobs": self.max_jobs, "max_rss_mb": self.max_rss_mb},
+            }
+        now = time.time()
+        status["workers"] = [
+            {
+                "pid": worker["process"].pid,
+                "device": worker["device"],
+                "state": ("standby" if worker["process"].pid in standby else "busy"),
+                "jobs": worker["jobs"],
+                "rss_mb": round(_rss_mb(worker["process"].pid), 1),
+                "uptime_seconds": round(now - worker["started_at"], 1),
+            }
+            for worker in workers
+        ]
+        return status
+
+
+class MarkerProcessRunner:
+    """Marker 子进程运行器 - 启动子进程、接收分片结果并响应取消"""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        pdf_path: str,
+        shards: List[Tuple[int, Optional[str]]],
+        total_pages: int,
+        token: CancellationToken,
+        output_dir: Path,
+    ):
+        self.config = config
+        self.pdf_path = pdf_path
+        self.shards = shards
+        self.total_pages = total_pages
+        self.token = token
+        self.output_dir = output_dir
+        self.process = None
+
+    def _shard_deadline(self, position: int) -> Optional[float]:
+        """第 position 个待处理分片的截止时间（按单页超时 × 分片页数计算）"""
+        if position >= len(self.shards):
+            return None
+        pages = shard_page_count(self.shards[position][1], self.total_pages)
+        timeout = self.token.step_timeout(pages)
+        return time.monotonic() + timeout if timeout else None
+
+    def _stop(self) -> None:
+        """终止子进程"""
+        _terminate(self.process)
+
+    async def run(self) -> AsyncIterator[Tuple]:
+        """
+        运行子进程并逐条产出消息
+
+        Yields:
+            (MESSAGE_READY, 模型加载秒数) 或 (MESSAGE_SHARD, 分片序号, 结果, 耗时秒数)
+
+        Raises:
+            TaskCancelledError: 任务被取消或超时（子进程已终止）
+            RuntimeError: 子进程转换失败或异常退出
+        """
+        lease = device_scheduler.get_lease(self.token.task_id)
+        device_env = lease.environment() if lease is not None else {}
+        warm = marker_warm_pool.acquire(device_env)
+        if warm is not None:
+            self.process, parent_conn = warm
+            log_event("♨️ 复用已加载模型的Marker子进程", pid=self.process.pid)
+        else:
+            self.process, parent_conn = await asyncio.to_thread(
+                marker_warm_pool.start_worker, device_env
+            )
+        parent_conn.send(
+            (
+                self.config,
+                self.pdf_path,
+                self.shards,
+                str(self.output_dir),
+                cpu_budget.threads_for(self.token.task_id),
+            )
+        )
+        run_start = time.perf_counter()
+
+        # 模型加载阶段只受整体超时约束
+        deadline = None
+        received = 0
+        finished = False
+        try:
+            while True:
+                wait = POLL_INTERVAL
+                if deadline is not None:
+                    wait = min(wait, max(deadline - time.monotonic(), 0.0))
+                has_message = await asyncio.to_thread(parent_conn.poll, wait)
+                self.token.raise_if_cancelled()
+
+                if not has_message:
+                    if not self.process.is_alive():
+                        raise RuntimeError(
+                            f"Marker子进程异常退出 (exitcode={self.process.exitcode})"
+                        )
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self.token.cancel(REASON_PAGE_TIMEOUT)
+                        self.token.raise_if_cancelled()
+                    continue
+
+                message = await asyncio.to_thread(parent_conn.recv)
+                kind = message[0]
+                if kind == MESSAGE_READY:
+                    deadline = self._shard_deadline(0)
+                    # 待命进程的模型早已加载，只计入本任务实际等待的时间
+                    if warm is not None:
+                        message = (MESSAGE_READY, time.perf_counter() - run_start)
+                    yield message
+                elif kind == MESSAGE_SHARD:
+                    received += 1
+                    deadline = self._shard_deadline(received)
+                    yield message
+                elif kind == MESSAGE_ERROR:
+                    raise RuntimeError(message[1])
+                else:
+                    finished = True
+                    return
+        finally:
+            # 正常完成的子进程归还待命池（或达到阈值后回收），其余情况直接终止
+            if not (
+                finished
+                and await asyncio.to_thread(
+                    marker_warm_pool.release, self.process, parent_conn, device_env
+                )
+            ):
+                await asyncio.to_thread(self._stop)
+                parent_conn.close()
+
+
+# 全局 Marker 预热进程池
+marker_warm_pool = MarkerWarmPool()
@@ -5,12 +5,13 @@
 
 import os
 import re
+import logging
 import time
 import asyncio
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import fitz  # PyMuPDF
 from PIL import Image
 import pytesseract
@@ -22,6 +23,26 @@ import io
 from api.models import OCRConfig, OutputFormat
 from utils.file_handler import FileHandler
 from utils.progress import progress_manager, ProgressCallback
+from utils.task_manifest import task_manifest
+from utils.metrics import (
+    stage_timer,
+    tesseract_timer,
+    OCR_CONFIG_SELECTED,
+    PAGES_TOTAL,
+)
+from utils.profiling import TaskProfile, get_current_profile, cprofile_capture
+from utils.tracing import tracer, log_event
+from utils.checkpoint import CheckpointStore, config_fingerprint
+from utils.cpu_budget import cpu_budget
+from utils.admission import select_pages
+from utils.prerender import prerender_cache
+from utils.cancellation import (
+    cancellation_registry,
+    CancellationToken,
+    TaskCancelledError,
+    REASON_PAGE_TIMEOUT,
+    time_left,
+)
 
 # 导入OCR引擎
 from utils.ocr_engine import OCREngine
@@ -51,6 +72,8 @@ class ScanPDFConverter:
         self.document_type_detection = self.config.document_type_detection
         self.ocr_quality = self.config.ocr_quality
         self.target_languages = self.config.target_languages
+        self.capture_profile = self.config.capture_profile
+        self.page_range = self.config.page_range
 
     async def convert_pdf_async(
         self, pdf_path: str, task_id: str, output_dir: Optional[str] = None
@@ -75,6 +98,8 @@ class ScanPDFConverter:
         # 开始任务
         progress_manager.start_task(task_id, total_stages=4)
         progress_callback = ProgressCallback(task_id, progress_manager)
+        profile = TaskProfile(task_id, "ocr")
+        token = cancellation_registry.create(task_id, "ocr")
 
         try:
             # 阶段1: 初始化
@@ -91,29 +116,53 @@ class ScanPDFConverter:
 
             # 阶段3: 执行OCR转换
             progress_callback(30)
-            result = await asyncio.to_thread(
-                self._process_pdf_pages, pdf_path, output_dir
-            )
+            with profile.activate():
+                result = await asyncio.to_thread(
+                    self._process_pdf_pages, pdf_path, output_dir, token
+                )
+
+            # 保存耗时剖析
+            profile.finish()
+            profile.save(output_dir)
 
             # 阶段4: 处理结果
             progress_callback(80)
 
+            # 登记任务清单
+            if result.get("success"):
+                task_manifest.record_outputs(
+                    task_id,
+                    [result.get("output_file")],
+                    image_paths=result.get("image_paths", []),
+                    metadata_file=result.get("metadata_file"),
+                )
+
             end_time = time.time()
             processing_time = end_time - start_time
 
-            # 完成任务
-            progress_callback(100)
-            progress_manager.complete_task(task_id, "OCR转换完成")
-
-            # 输出统计信息
-            if result.get("success") and result.get("text"):
-                char_count = len(result["text"])
-                print(f"✅ OCR转换完成! 提取字符数: {char_count:,}")
+            # 完成任务（取消时保留了部分输出）
+            if result.get("partial"):
+                progress_manager.cancel_task(
+                    task_id, result.get("cancel_reason"), partial=True
+                )
+                log_event(
+                    "⏹️ OCR转换已取消，保留部分结果",
+                    reason=result.get("cancel_reason"),
+                    completed_pages=result.get("completed_pages"),
+                )
             else:
-                print("✅ OCR转换完成!")
+                progress_callback(100)
+                progress_manager.complete_task(task_id, "OCR转换完成")
+
+                # 输出统计信息
+                if result.get("success") and result.get("text"):
+                    log_event("✅ OCR转换完成", char_count=len(result["text"]))
+                else:
+                    log_event("✅ OCR转换完成")
 
             return {
                 "success": True,
+                "cancelled": bool(result.get("partial")),
                 "output_file": result.get("output_file"),
                 "metadata_file": result.get("metadata_file"),
                 "image_paths": result.get("image_paths", []),
@@ -124,8 +173,20 @@ class ScanPDFConverter:
                 "content": result.get("content"),
             }
 
+        except TaskCancelledError as e:
+            progress_manager.cancel_task(task_id, e.reason)
+            log_event("⏹️ OCR转换已取消", reason=e.reason)
+            return {
+                "success": False,
+                "cancelled": True,
+                "error": str(e),
+                "processing_time": time.time() - start_time,
+                "conversion_mode": "ocr",
+            }
+
         except Exception as e:
             error_msg = f"OCR转换失败: {str(e)}"
+            log_event(f"❌ {error_msg}", logging.ERROR)
             progress_manager.fail_task(task_id, error_msg)
             return {
                 "success": False,
@@ -134,72 +195,76 @@ class ScanPDFConverter:
                 "conversion_mode": "ocr",
             }
 
-    def _process_pdf_pages(self, pdf_path: str, output_dir: Path) -> Dict[str, Any]:
-        """处理PDF页面并执行OCR"""
+    def _process_pdf_pages(
+        self, pdf_path: str, output_dir: Path, token: CancellationToken
+    ) -> Dict[str, Any]:
+        """处理PDF页面并执行OCR，任务取消且不保留部分结果时抛出 TaskCancelledError"""
         try:
             # 验证文件路径
             pdf_path = str(Path(pdf_path).resolve())
             if not os.path.exists(pdf_path):
                 raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
 
-            print(f"📂 处理文件: {pdf_path}")
+            # 按 CPU 线程预算限制 Tesseract 与 OpenCV 的线程数
+            cpu_budget.apply_ocr_limits()
 
             # 打开PDF文档
             pdf_document = fitz.open(pdf_path)
             total_pages = len(pdf_document)
 
-            print(f"📖 扫描版PDF识别，共 {total_pages} 页...")
-
-            text_content = ""
-
-            for page_num in range(total_pages):
-                print(f"\r   OCR进度: {page_num + 1}/{total_pages}", end="")
+            # 仅识别所选页码
+            pages = select_pages(self.page_range, total_pages)
 
-                # 加载页面
-                page = pdf_document.load_page(page_num)
-
-                # 转换为高分辨率图片
-                matrix = fitz.Matrix(
-                    OCREngine.get_scan_image_enhancement()["scale_factor"],
-                    OCREngine.get_scan_image_enhancement()["scale_factor"],
-                )
-                pix = page.get_pixmap(matrix=matrix)
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-
-                # 图像质量增强
-                if self.enhance_quality:
-                    image = self._enhance_image_quality(image)
-
-                # OCR识别
-                ocr_text = self._multi_ocr_recognize(image)
-
-                # 添加页面分隔符
-                if OCREngine.get_scan_output_config()["include_page_breaks"]:
-                    text_content += f"\n=== 第 {page_num + 1} 页 ===\n"
-
-                if ocr_text:
-                    text_content += ocr_text.strip()
+            log_event(
+                "📖 扫描版PDF识别",
+                source_file=pdf_path,
+                total_pages=total_pages,
+                selected_pages=len(pages),
+            )
 
-                text_content += "\n"
+            profile = get_current_profile()
+            store = CheckpointStore(
+                output_dir,
+                config_fingerprint(
+                    token.task_id, pdf_path, "ocr", self.config.model_dump()
+                ),
+                len(pages),
+            )
 
-            print()  # 换行
-            pdf_document.close()
+            try:
+                with cprofile_capture(self.capture_profile, output_dir):
+                    text_content, completed_pages = self._ocr_pages(
+                        pdf_document, pages, profile, token, store
+                    )
+            finally:
+                pdf_document.close()
+                # 未用到的预渲染结果不再需要
+                prerender_cache.discard(token.task_id)
+
+            partial = completed_pages < len(pages)
+            if partial and not token.keep_partial:
+                raise TaskCancelledError(token.task_id, token.reason)
 
             # 文本清理
-            cleaned_content = self._clean_text(text_content)
+            with stage_timer("clean", "ocr"):
+                cleaned_content = self._clean_text(text_content)
 
             # 生成输出文件路径
             base_name = Path(pdf_path).stem
-            output_file = self._save_content(
-                cleaned_content, output_dir, base_name, pdf_path
-            )
+            with stage_timer("write", "ocr"):
+                output_file = self._save_content(
+                    cleaned_content, output_dir, base_name, pdf_path
+                )
 
             # 保存元数据
             metadata_file = self._save_metadata(
                 {
                     "source_file": pdf_path,
                     "total_pages": total_pages,
+                    "page_range": self.page_range,
+                    "completed_pages": completed_pages,
+                    "partial": partial,
+                    "cancel_reason": token.reason if partial else None,
                     "processing_time": datetime.now().isoformat(),
                     "ocr_config": {
                         "enhance_quality": self.enhance_quality,
@@ -212,6 +277,10 @@ class ScanPDFConverter:
                 output_dir,
             )
 
+            # 完整转换后不再需要断点
+            if not partial:
+                store.clear()
+
             return {
                 "success": True,
                 "output_file": str(output_file),
@@ -219,12 +288,21 @@ class ScanPDFConverter:
                 "image_paths": [],
                 "text": cleaned_content,
                 "content": cleaned_content,
+                "partial": partial,
+                "completed_pages": completed_pages,
+                "cancel_reason": token.reason if partial else None,
             }
 
+        except TaskCancelledError:
+            raise
         except Exception as e:
-            print(f"❌ PDF处理失败: {e}")
-            print(f"📂 文件路径: {pdf_path}")
-            print(f"📁 输出目录: {output_dir}")
+            log_event(
+                "❌ PDF处理失败",
+                logging.ERROR,
+                error=str(e),
+                source_file=pdf_path,
+                output_dir=str(output_dir),
+            )
             return {
                 "success": False,
                 "output_file": None,
@@ -234,6 +312,106 @@ class ScanPDFConverter:
                 "content": None,
             }
 
+    def _ocr_pages(
+        self,
+        pdf_document,
+        pages: List[int],
+        profile: Optional[TaskProfile],
+        token: CancellationToken,
+        store: CheckpointStore,
+    ) -> Tuple[str, int]:
+        """
+        逐页渲染并执行OCR（pages 为所选页码，从0开始），每页开始前检查取消令牌；
+        已有断点的页面直接复用，新完成的页面写入断点
+
+        Returns:
+            Tuple[str, int]: (拼接后的文本, 已完成页数)
+        """
+        text_content = ""
+        completed_pages = 0
+
+        resumed = store.completed_pages()
+        if resumed:
+            log_event("♻️ 从断点恢复", resumed_pages=len(resumed))
+
+        for page_num in pages:
+            if token.is_cancelled:
+                break
+
+            checkpoint = store.load_page(page_num + 1)
+            if checkpoint is not None:
+                ocr_text = checkpoint.get("text", "")
+            else:
+                if profile is not None:
+                    profile.start_page(page_num + 1)
+
+                # 本页所有 Tesseract 调用共享一个截止时间
+                page_timeout = token.step_timeout() or 0
+                deadline = time.monotonic() + page_timeout if page_timeout else 0
+                with tracer.span("page", page=page_num + 1, total_pages=len(pages)):
+                    ocr_text = self._ocr_page(
+                        pdf_document, page_num, deadline, token.task_id
+                    )
+
+                # 单页超时：该页结果不完整，停止后续页面
+                if deadline and time.monotonic() >= deadline:
+                    token.cancel(REASON_PAGE_TIMEOUT)
+                    log_event("⏱️ 页面处理超时", logging.WARNING, page=page_num + 1)
+                    break
+
+                store.save_page(page_num + 1, {"text": ocr_text})
+
+            # 添加页面分隔符
+            if OCREngine.get_scan_output_config()["include_page_breaks"]:
+                text_content += f"\n=== 第 {page_num + 1} 页 ===\n"
+
+            if ocr_text:
+                text_content += ocr_text.strip()
+
+            text_content += "\n"
+            completed_pages += 1
+
+            # OCR阶段占总进度的 30% - 80%
+            progress_manager.update_progress(
+                token.task_id, 30 + 50 * completed_pages / len(pages)
+            )
+
+        if profile is not None:
+            profile.end_page()
+
+        return text_content, completed_pages
+
+    def _ocr_page(
+        self,
+        pdf_document,
+        page_num: int,
+        deadline: float = 0,
+        task_id: Optional[str] = None,
+    ) -> str:
+        """渲染单页并执行OCR（deadline 为本页 OCR 的截止时间，time.monotonic）"""
+        with stage_timer("render", "ocr"):
+            scale_factor = OCREngine.get_scan_image_enhancement()["scale_factor"]
+
+            # 优先使用上传后预渲染的图片
+            img_data = prerender_cache.take(task_id, page_num, scale_factor)
+            if img_data is None:
+                # 加载页面并转换为高分辨率图片
+                page = pdf_document.load_page(page_num)
+                matrix = fitz.Matrix(scale_factor, scale_factor)
+                pix = page.get_pixmap(matrix=matrix)
+                img_data = pix.tobytes("png")
+            image = Image.open(io.BytesIO(img_data))
+
+        # 图像质量增强
+        if self.enhance_quality:
+            with stage_timer("enhance", "ocr"):
+                image = self._enhance_image_quality(image)
+
+        # OCR识别
+        ocr_text = self._multi_ocr_recognize(image, deadline)
+        PAGES_TOTAL.inc(mode="ocr")
+        return ocr_text
+
     def _enhance_image_quality(self, image: Image.Image) -> Image.Image:
         """图像质量增强处理"""
         try:
@@ -266,51 +444,59 @@ class ScanPDFConverter:
             return enhanced_pil
 
         except Exception as e:
-            print(f"⚠️ 图像增强失败: {e}")
+            log_event("⚠️ 图像增强失败", logging.WARNING, error=str(e))
             return image
 
-    def _multi_ocr_recognize(self, image: Image.Image) -> str:
+    def _multi_ocr_recognize(self, image: Image.Image, deadline: float = 0) -> str:
         """基于最佳实践的多语言OCR识别"""
+        document_type = None
         try:
             # 1. 快速OCR获取样本文本进行语言检测
-            sample_text = OCREngine.get_sample_text_for_detection(image)
+            with stage_timer("language_detection", "ocr"):
+                sample_text = OCREngine.get_sample_text_for_detection(image, deadline)
 
             if sample_text and self.language_detection:
                 # 2. 语言检测
-                detected_language, confidence = OCREngine.detect_language(sample_text)
-
-                print(
-                    f"🔍 语言检测结果: {detected_language} "
-                    f"(置信度: {confidence:.2f})"
+                with stage_timer("language_detection", "ocr"):
+                    detected_language, confidence = OCREngine.detect_language(
+                        sample_text
+                    )
+
+                log_event(
+                    "🔍 语言检测结果",
+                    logging.DEBUG,
+                    language=detected_language,
+                    confidence=round(confidence, 2),
                 )
 
                 # 3. 智能配置选择
                 if detected_language == "zh":
                     # 中文文档：智能检测文档类型并选择最佳配置
                     if self.document_type_detection:
-                        document_type = OCREngine.detect_document_type(
-                            image, sample_text
-                        )
+                        with stage_timer("document_type_detection", "ocr"):
+                            document_type = OCREngine.detect_document_type(
+                                image, sample_text
+                            )
                         config = OCREngine.select_chinese_ocr_config(document_type)
                     else:
                         config = OCREngine.get_default_chinese_ocr_config()
                 elif detected_language == "en":
                     # 英文文档使用英文配置
                     config = OCREngine.get_default_english_ocr_config()
-                    print(f"📋 使用英文配置: {config['name']}")
                 else:
                     # 其他语言：使用智能中文配置
                     if self.document_type_detection:
-                        document_type = OCREngine.detect_document_type(
-                            image, sample_text
-                        )
+                        with stage_timer("document_type_detection", "ocr"):
+                            document_type = OCREngine.detect_document_type(
+                                image, sample_text
+                            )
                         config = OCREngine.select_chinese_ocr_config(document_type)
                     else:
                         config = OCREngine.get_default_chinese_ocr_config()
 
             else:
                 # 样本文本提取失败或禁用语言检测，使用默认配置
-                print("⚠️ 使用默认配置")
+                log_event("⚠️ 未能提取样本文本，使用默认配置", logging.DEBUG)
                 config = OCREngine.get_default_chinese_ocr_config()
 
             # 4. 使用选定的配置进行OCR识别
@@ -319,35 +505,51 @@ class ScanPDFConverter:
                 custom_config = f'--psm {config["psm"]} --dpi {config["dpi"]}'
 
                 # 执行OCR识别
-                ocr_text = pytesseract.image_to_string(
-                    image, lang=config["lang"], config=custom_config
-                )
-
-                print(f"✅ OCR识别完成，使用配置: {config['name']}")
+                OCR_CONFIG_SELECTED.inc(config=config["name"])
+                profile = get_current_profile()
+                if profile is not None:
+                    profile.record_ocr_config(config["name"], document_type)
+                with stage_timer("tesseract", "ocr"), tesseract_timer(config["name"]):
+                    ocr_text = pytesseract.image_to_string(
+                        image,
+                        lang=config["lang"],
+                        config=custom_config,
+                        timeout=time_left(deadline),
+                    )
+
+                log_event("✅ OCR识别完成", logging.DEBUG, config=config["name"])
 
                 return ocr_text
 
             except Exception as e:
-                print(f"⚠️ OCR识别失败: {e}")
+                log_event("⚠️ OCR识别失败", logging.WARNING, error=str(e))
                 return ""
 
         except Exception as e:
-            print(f"⚠️ 语言检测失败，使用默认配置: {e}")
+            log_event("⚠️ 语言检测失败，使用默认配置", logging.WARNING, error=str(e))
             # 语言检测失败，使用默认配置
             try:
                 config = OCREngine.get_default_chinese_ocr_config()
                 custom_config = f'--psm {config["psm"]} --dpi {config["dpi"]}'
 
-                ocr_text = pytesseract.image_to_string(
-                    image, lang=config["lang"], config=custom_config
-                )
+                OCR_CONFIG_SELECTED.inc(config=config["name"])
+                profile = get_current_profile()
+                if profile is not None:
+                    profile.record_ocr_config(config["name"])
+                with stage_timer("tesseract", "ocr"), tesseract_timer(config["name"]):
+                    ocr_text = pytesseract.image_to_string(
+                        image,
+                        lang=config["lang"],
+                        config=custom_config,
+                        timeout=time_left(deadline),
+                    )
 
-                print("✅ 使用默认配置完成OCR识别")
+                log_event("✅ OCR识别完成", logging.DEBUG, config=config["name"])
 
                 return ocr_text
 
             except Exception as e:
-                print(f"⚠️ 默认配置OCR识别失败: {e}")
+                log_event("⚠️ 默认配置OCR识别失败", logging.WARNING, error=str(e))
                 return ""
 
     def _clean_text(self, text: str) -> str:
@@ -404,6 +606,10 @@ class ScanPDFConverter:
                     page_content = lines[1].strip()
                     if page_content:
                         if output_format_config["page_headers"]:
+                            # 使用分隔符中的原始页码（指定页码范围时不连续）
+                            page_number = re.match(r"\s*(\d+)", lines[0])
+                            if page_number:
+                                i = int(page_number.group(1))
                             md_content += f"## 第 {i} 页\n\n"
                         md_content += page_content + "\n\n"
                         if output_format_config["separator_line"]:
@@ -460,7 +666,7 @@ class ScanPDFConverter:
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(content)
 
-        print(f"💾 已保存到: {output_file}")
+        log_event("💾 已保存", output_file=str(output_file))
         return output_file
 
     def _process_markdown_images(self, content: str, output_dir: Path) -> str:
@@ -528,14 +734,18 @@ async def scan_convert_pdf_task(
     try:
         ocr_config = OCRConfig(**config)
         converter = ScanPDFConverter(config=ocr_config)
-        print(f"🔧 OCR转换配置: {ocr_config.ocr_quality}模式")
+        log_event("🔧 OCR转换配置", task_id=task_id, ocr_quality=ocr_config.ocr_quality)
 
     except Exception as e:
-        print(f"❌ OCR配置处理失败: {str(e)}")
         # 使用默认配置作为后备
         ocr_config = OCRConfig()
         converter = ScanPDFConverter(config=ocr_config)
-        print("⚠️ 使用默认OCR配置继续转换")
+        log_event(
+            "⚠️ OCR配置处理失败，使用默认OCR配置继续转换",
+            logging.WARNING,
+            task_id=task_id,
+            error=str(e),
+        )
 
     output_dir = FileHandler().ensure_output_directory(task_id)
     return await converter.convert_pdf_async(pdf_path, task_id, output_dir)
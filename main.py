@@ -1,23 +1,38 @@
+import os
+import asyncio
+import logging
 import uvicorn
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 from api.routes import router
+from utils.file_handler import FileHandler
+from utils.task_manifest import task_manifest
+from utils.janitor import storage_janitor
+from utils.metrics import metrics_registry
+from utils.devices import device_scheduler
+from core.marker_worker import marker_warm_pool, start_prefork_server
 
-# 硬编码配置
 APP_NAME = "PDF转Markdown工具"
 APP_VERSION = "1.0.0"
-HOST = "0.0.0.0"
-PORT = 8001
-DEBUG = True
-WORKERS = 1
-CORS_ORIGINS = [
-    "http://localhost:3000",
-    "http://localhost:8001",
-    "http://127.0.0.1:8001",
-    "http://127.0.0.1:3000",
-]
+
+# 运行配置（环境变量），DEBUG=false 时以生产模式启动
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8001))
+DEBUG = os.getenv("DEBUG", "true").lower() == "true"
+WORKERS = int(os.getenv("WORKERS", 1))
+CORS_ORIGINS = os.getenv(
+    "CORS_ORIGINS",
+    "http://localhost:3000,http://localhost:8001,"
+    "http://127.0.0.1:8001,http://127.0.0.1:3000",
+).split(",")
+
+# 日志配置（转换链路的日志通过 utils.tracing.log_event 输出，并同时记录为 span 事件）
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(message)s",
+)
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -44,12 +59,61 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(router, prefix="/api", tags=["API"])
 
 
+@app.on_event("startup")
+async def migrate_task_manifest():
+    """首次启动时为已有的上传与输出目录建立任务清单索引"""
+    file_handler = FileHandler()
+    await asyncio.to_thread(
+        task_manifest.ensure_migrated,
+        file_handler.upload_folder,
+        file_handler.output_folder,
+    )
+
+
+@app.on_event("startup")
+async def discover_devices():
+    """盘点可用设备（nvidia-smi 在线程中执行，不阻塞事件循环）"""
+    await asyncio.to_thread(device_scheduler.discover)
+
+
+@app.on_event("startup")
+async def start_marker_prefork_server():
+    """prefork 模式下启动预加载 Marker 模型的 forkserver"""
+    await asyncio.to_thread(start_prefork_server)
+
+
+@app.on_event("startup")
+async def start_storage_janitor():
+    """启动后台存储清理"""
+    storage_janitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_storage_janitor():
+    """停止后台存储清理"""
+    await storage_janitor.stop()
+
+
+@app.on_event("shutdown")
+async def discard_marker_warm_process():
+    """终止未被使用的 Marker 预热进程"""
+    await asyncio.to_thread(marker_warm_pool.discard)
+
+
 @app.get("/")
 async def root():
     """根路径，重定向到Web界面"""
     return RedirectResponse(url="/static/index.html")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/info")
 async def info():
     """应用信息"""
@@ -57,13 +121,26 @@ async def info():
 
 
 def main():
-    """主函数"""
+    """主函数：DEBUG=true 时为自动重载的开发模式，否则为生产模式"""
+    if DEBUG:
+        uvicorn.run("main:app", host=HOST, port=PORT, reload=True)
+        return
+
+    # 任务进度、队列与取消令牌保存在进程内存中，多个 API 进程之间不共享；
+    # API 以单进程异步处理请求，转换并发由 MAX_CONCURRENT_JOBS 个 Marker 子进程承担
+    if WORKERS != 1:
+        raise SystemExit(
+            "生产模式只支持 WORKERS=1：任务状态保存在进程内，多个 API 进程会导致进度查询与取消失效，"
+            "请通过 MAX_CONCURRENT_JOBS 提高转换并发"
+        )
+    # 转换子进程从已加载模型的 forkserver fork，共享只读权重
+    os.environ.setdefault("MARKER_PREFORK", "true")
     uvicorn.run(
-        "main:app",
+        app,
         host=HOST,
         port=PORT,
-        reload=DEBUG,
-        workers=WORKERS,
+        log_level=os.getenv("LOG_LEVEL", "INFO").lower(),
+        proxy_headers=True,
     )
 
 
@@ -34,6 +34,12 @@ createApp({
 
         // 新增：转换状态跟踪
         const hasConverted = ref(false)
+        const isCancelling = ref(false)
+
+        // 新增：运行中实时结果
+        const partialSince = ref(0)
+        const completedPages = ref(0)
+        const totalPages = ref(0)
 
         // 转换配置
         const config = reactive({
@@ -386,9 +392,12 @@ createApp({
                 // 开始转换
                 isConverting.value = true
                 startTime.value = Date.now()
+                textPreview.value = ''
+                partialSince.value = 0
                 clearError()
 
-                // 使用配置管理器启动转换
+                // 使用配置管理器启动转换（先同步面板中的文本型配置）
+                updateTextConfig()
                 const currentConfig = configManager.value.getCurrentConfig()
                 const result = await configManager.value.startConversion(taskId.value)
 
@@ -418,8 +427,20 @@ createApp({
                             finalTime.value = Date.now()
                             processingTime.value = (finalTime.value - startTime.value) / 1000
                             await getResult()
+                        } else if (data.status === 'processing') {
+                            await getPartialResult()
                         } else if (data.status === 'failed') {
                             throw new Error(data.error || '转换失败')
+                        } else if (data.status === 'cancelled') {
+                            isCancelling.value = false
+                            if (data.partial) {
+                                // 已保留部分结果，照常展示
+                                finalTime.value = Date.now()
+                                processingTime.value = (finalTime.value - startTime.value) / 1000
+                                await getResult()
+                            } else {
+                                throw new Error(data.error || '任务已取消')
+                            }
                         }
                     }
                 } catch (error) {
@@ -434,6 +455,39 @@ createApp({
             }, 100)
         }
 
+        const cancelConversion = async () => {
+            if (!taskId.value || isCancelling.value) return
+            isCancelling.value = true
+            try {
+                const response = await fetch(`/api/cancel/${taskId.value}?keep_partial=true`, {
+                    method: 'POST'
+                })
+                if (!response.ok) {
+                    const data = await response.json()
+                    throw new Error(data.detail || '取消失败')
+                }
+            } catch (error) {
+                isCancelling.value = false
+                showError(`取消失败: ${error.message}`)
+            }
+        }
+
+        const getPartialResult = async () => {
+            // 运行中只拉取新完成的页面并追加到预览
+            const response = await fetch(`/api/result/${taskId.value}?since=${partialSince.value}`)
+            if (!response.ok) return
+            const data = await response.json()
+            if (!data.in_progress) return
+            if (data.content) {
+                textPreview.value = textPreview.value
+                    ? `${textPreview.value}\n\n${data.content}`
+                    : data.content
+            }
+            partialSince.value = data.next_since
+            completedPages.value = data.completed_pages
+            totalPages.value = data.total_pages || 0
+        }
+
         const getResult = async () => {
             try {
                 const response = await fetch(`/api/result/${taskId.value}`)
@@ -514,6 +568,9 @@ createApp({
             isPreviewExpanded.value = false
             showExpandButton.value = false
             hasConverted.value = false
+            partialSince.value = 0
+            completedPages.value = 0
+            totalPages.value = 0
             clearError()
         }
 
@@ -568,6 +625,11 @@ createApp({
 
             // 新增：转换状态跟踪
             hasConverted,
+            isCancelling,
+
+            // 新增：运行中实时结果
+            completedPages,
+            totalPages,
 
             // 配置
             config,
@@ -597,6 +659,7 @@ createApp({
             handleDrop,
             handleFileSelect,
             removeFile,
+            cancelConversion,
 
             // 转换函数
             startConversion,
@@ -63,6 +63,7 @@ class ConfigManager {
             save_images: false,
             format_lines: false,
             disable_image_extraction: true,
+            page_range: null,
             gpu_config: {
                 enabled: false,
                 num_devices: 1,
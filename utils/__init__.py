@@ -2,6 +2,7 @@
 
 from .file_handler import FileHandler, get_file_handler, file_handler
 from .progress import progress_manager, ProgressCallback
+from .task_manifest import TaskManifest, task_manifest
 
 __all__ = [
     "FileHandler",
@@ -9,4 +10,6 @@ __all__ = [
     "file_handler",
     "progress_manager",
     "ProgressCallback",
+    "TaskManifest",
+    "task_manifest",
 ]
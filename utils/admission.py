@@ -0,0 +1,322 @@
+"""
+准入控制
+按页数、转换模式、DPI档位与是否启用LLM估算任务成本，跟踪已承诺的CPU/GPU/内存资源，
+预算耗尽时拒绝新任务，并根据队列预计排空时间给出 Retry-After
+"""
+
+import os
+import math
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+# OCR质量模式对应的DPI档位及耗时系数
+OCR_DPI_TIERS = {
+    "fast": {"tier": "low", "seconds_per_page": 1.5},
+    "balanced": {"tier": "standard", "seconds_per_page": 3.0},
+    "accurate": {"tier": "high", "seconds_per_page": 5.0},
+}
+
+# Marker模式每页耗时（秒）
+MARKER_SECONDS_PER_PAGE = {"gpu": 1.0, "cpu": 4.0}
+
+# LLM增强每页额外耗时（秒），主要为网络等待
+LLM_SECONDS_PER_PAGE = 2.0
+
+# 单任务内存估算（MB）
+OCR_BASE_MEMORY_MB = 300
+OCR_PAGE_MEMORY_MB = {"low": 40, "standard": 60, "high": 90}
+MARKER_MODEL_MEMORY_MB = 4096
+
+
+@dataclass
+class JobCost:
+    """任务成本估算"""
+
+    pages: int
+    mode: str
+    dpi_tier: str
+    use_llm: bool
+    cpu_seconds: float
+    gpu_seconds: float
+    memory_mb: float
+
+    @property
+    def duration_seconds(self) -> float:
+        """预计运行时长"""
+        return self.cpu_seconds + self.gpu_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "duration_seconds": self.duration_seconds}
+
+
+@dataclass
+class AdmissionDecision:
+    """准入判定结果"""
+
+    admitted: bool
+    retry_after: int = 0
+    reason: str = ""
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """读取PDF页数（仅解析文档结构，不渲染页面）"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as pdf_document:
+        return pdf_document.page_count
+
+
+def select_pages(page_range: Optional[str], total_pages: int) -> List[int]:
+    """
+    解析页码范围
+
+    Args:
+        page_range: 页码范围（从1开始，如 "1-3,7"），为空表示全部页面
+        total_pages: 文档总页数
+
+    Returns:
+        List[int]: 选中的页码（从0开始，升序去重）
+
+    Raises:
+        ValueError: 页码超出文档范围
+    """
+    if not page_range:
+        return list(range(total_pages))
+
+    pages = set()
+    for part in page_range.split(","):
+        start, _, end = part.partition("-")
+        start, end = int(start), int(end or start)
+        if end > total_pages:
+            raise ValueError(f"页码范围 {part} 超出文档总页数 {total_pages}")
+        pages.update(range(start - 1, end))
+    return sorted(pages)
+
+
+def estimate_cost(config: Dict[str, Any], pages: int) -> JobCost:
+    """
+    估算转换任务成本
+
+    Args:
+        config: 转换配置字典
+        pages: 页数
+
+    Returns:
+        JobCost: 成本估算
+    """
+    pages = max(pages, 1)
+    mode = config.get("conversion_mode", "marker")
+    use_llm = bool(config.get("use_llm", False))
+
+    if mode == "ocr":
+        tier = OCR_DPI_TIERS.get(config.get("ocr_quality", "balanced"))
+        seconds_per_page = tier["seconds_per_page"]
+        if config.get("enhance_quality", True):
+            seconds_per_page += 0.5
+        return JobCost(
+            pages=pages,
+            mode=mode,
+            dpi_tier=tier["tier"],
+            use_llm=False,
+            cpu_seconds=pages * seconds_per_page,
+            gpu_seconds=0.0,
+            memory_mb=OCR_BASE_MEMORY_MB + OCR_PAGE_MEMORY_MB[tier["tier"]],
+        )
+
+    gpu_enabled = bool(config.get("gpu_config", {}).get("enabled", False))
+    seconds_per_page = MARKER_SECONDS_PER_PAGE["gpu" if gpu_enabled else "cpu"]
+    if config.get("force_ocr", False):
+        seconds_per_page *= 2
+    llm_seconds = pages * LLM_SECONDS_PER_PAGE if use_llm else 0.0
+
+    return JobCost(
+        pages=pages,
+        mode=mode,
+        dpi_tier="model",
+        use_llm=use_llm,
+        cpu_seconds=(0.0 if gpu_enabled else pages * seconds_per_page) + llm_seconds,
+        gpu_seconds=pages * seconds_per_page if gpu_enabled else 0.0,
+        memory_mb=MARKER_MODEL_MEMORY_MB,
+    )
+
+
+class AdmissionController:
+    """准入控制器 - 跟踪已承诺的资源预算"""
+
+    def __init__(self):
+        # 已承诺（排队+运行中）工作量上限，单位：秒
+        self.cpu_budget_seconds = float(os.getenv("ADMISSION_CPU_SECONDS", 3600))
+        self.gpu_budget_seconds = float(os.getenv("ADMISSION_GPU_SECONDS", 3600))
+        # 运行中任务的内存上限（MB），默认为物理内存的75%
+        default_memory_mb = psutil.virtual_memory().total / 1024**2 * 0.75
+        self.memory_budget_mb = float(
+            os.getenv("ADMISSION_MEMORY_MB", default_memory_mb)
+        )
+
+        self._lock = threading.Lock()
+        self._committed: Dict[str, JobCost] = {}
+        self._running_memory: Dict[str, float] = {}
+        self.rejected_total = 0
+
+    # ==================== 预算统计 ====================
+
+    def committed(self) -> Dict[str, float]:
+        """当前已承诺的资源"""
+        with self._lock:
+            return {
+                "cpu_seconds": sum(c.cpu_seconds for c in self._committed.values()),
+                "gpu_seconds": sum(c.gpu_seconds for c in self._committed.values()),
+                "memory_mb": sum(self._running_memory.values()),
+                "jobs": len(self._committed),
+            }
+
+    def _exceeds_budget(self, cost: JobCost, committed: Dict[str, float]) -> str:
+        """检查加入新任务后是否超出预算，返回超限原因"""
+        if committed["cpu_seconds"] + cost.cpu_seconds > self.cpu_budget_seconds:
+            return "CPU预算已耗尽"
+        if committed["gpu_seconds"] + cost.gpu_seconds > self.gpu_budget_seconds:
+            return "GPU预算已耗尽"
+        return ""
+
+    # ==================== 准入与释放 ====================
+
+    def try_admit(
+        self, task_id: str, cost: JobCost, projected_finish: Optional[list] = None
+    ) -> AdmissionDecision:
+        """
+        尝试接纳任务
+
+        Args:
+            task_id: 任务ID
+            cost: 任务成本估算
+            projected_finish: 队列中各任务预计完成时间 [(task_id, 剩余秒数)]
+
+        Returns:
+            AdmissionDecision: 准入判定
+        """
+        if not self.fits_memory(cost):
+            self.rejected_total += 1
+            return AdmissionDecision(
+                admitted=False, retry_after=0, reason="任务所需内存超过服务器上限"
+            )
+        return self._admit({task_id: cost}, cost, projected_finish)
+
+    def try_admit_batch(
+        self, costs: Dict[str, JobCost], projected_finish: Optional[list] = None
+    ) -> AdmissionDecision:
+        """
+        整批接纳批次任务（各任务的内存须已通过 fits_memory 检查）
+
+        批次按总成本与已承诺资源比较，与单个任务相同，服务器空闲时总是接纳，
+        总成本超过预算的大批次（如数百份发票）在空闲时也能执行，而不是被永久拒绝
+
+        Args:
+            costs: 各任务的成本估算 {task_id: JobCost}
+            projected_finish: 队列中各任务预计完成时间 [(task_id, 剩余秒数)]
+        """
+        total = JobCost(
+            pages=sum(c.pages for c in costs.values()),
+            mode="batch",
+            dpi_tier="",
+            use_llm=any(c.use_llm for c in costs.values()),
+            cpu_seconds=sum(c.cpu_seconds for c in costs.values()),
+            gpu_seconds=sum(c.gpu_seconds for c in costs.values()),
+            memory_mb=max((c.memory_mb for c in costs.values()), default=0.0),
+        )
+        return self._admit(costs, total, projected_finish)
+
+    def fits_memory(self, cost: JobCost) -> bool:
+        """任务所需内存是否在服务器上限之内（超出时无论何时提交都无法运行）"""
+        return cost.memory_mb <= self.memory_budget_mb
+
+    def _admit(
+        self,
+        costs: Dict[str, JobCost],
+        total: JobCost,
+        projected_finish: Optional[list],
+    ) -> AdmissionDecision:
+        """按总成本接纳一组任务"""
+        with self._lock:
+            committed = {
+                "cpu_seconds": sum(c.cpu_seconds for c in self._committed.values()),
+                "gpu_seconds": sum(c.gpu_seconds for c in self._committed.values()),
+            }
+            # 空闲时总是接纳，避免成本超出预算的大任务永远无法执行
+            reason = self._exceeds_budget(total, committed) if self._committed else ""
+            if not reason:
+                self._committed.update(costs)
+                return AdmissionDecision(admitted=True)
+
+            self.rejected_total += 1
+            retry_after = self._projected_retry_after(
+                total, committed, projected_finish or []
+            )
+            return AdmissionDecision(
+                admitted=False, retry_after=retry_after, reason=reason
+            )
+
+    def _projected_retry_after(
+        self, cost: JobCost, committed: Dict[str, float], projected_finish: list
+    ) -> int:
+        """按队列预计完成顺序模拟释放资源，直到新任务可被接纳"""
+        remaining = dict(committed)
+        for task_id, finish_seconds in sorted(projected_finish, key=lambda x: x[1]):
+            finished = self._committed.get(task_id)
+            if finished is None:
+                continue
+            remaining["cpu_seconds"] -= finished.cpu_seconds
+            remaining["gpu_seconds"] -= finished.gpu_seconds
+            if not self._exceeds_budget(cost, remaining):
+                return max(1, math.ceil(finish_seconds))
+
+        # 无法通过排空队列满足（如单任务成本超过预算），按整个队列排空时间估算
+        drain_seconds = max((f for _, f in projected_finish), default=0)
+        return max(1, math.ceil(drain_seconds))
+
+    def can_start(self, task_id: str) -> bool:
+        """检查运行中任务的内存占用是否允许该任务开始"""
+        with self._lock:
+            cost = self._committed.get(task_id)
+            if cost is None:
+                return True
+            running = sum(self._running_memory.values())
+            # 没有运行中任务时总是允许开始，避免死锁
+            return not self._running_memory or (
+                running + cost.memory_mb <= self.memory_budget_mb
+            )
+
+    def mark_running(self, task_id: str) -> None:
+        """任务开始运行，占用内存预算"""
+        with self._lock:
+            cost = self._committed.get(task_id)
+            if cost is not None:
+                self._running_memory[task_id] = cost.memory_mb
+
+    def release(self, task_id: str) -> None:
+        """任务结束，释放全部已承诺资源"""
+        with self._lock:
+            self._committed.pop(task_id, None)
+            self._running_memory.pop(task_id, None)
+
+    def get_cost(self, task_id: str) -> Optional[JobCost]:
+        """获取已接纳任务的成本估算"""
+        return self._committed.get(task_id)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取准入控制状态"""
+        return {
+            "committed": self.committed(),
+            "budget": {
+                "cpu_seconds": self.cpu_budget_seconds,
+                "gpu_seconds": self.gpu_budget_seconds,
+                "memory_mb": self.memory_budget_mb,
+            },
+            "rejected_total": self.rejected_total,
+        }
+
+
+# 全局准入控制实例
+admission_controller = AdmissionController()
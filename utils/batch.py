@@ -0,0 +1,266 @@
+"""
+批量任务
+一次请求上传多个PDF或ZIP压缩包生成一个批次：每个PDF仍是独立任务（独立的预检、转换、结果与下载），
+批次记录成员任务并统一提交一份转换配置；批次内的任务在队列中连续调度，复用已加载的模型，
+汇总进度按各任务页数加权
+"""
+
+import os
+import json
+import zlib
+import uuid
+import zipfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Any, List, Optional, Tuple
+
+from utils.progress import progress_manager
+from utils.task_manifest import task_manifest
+
+# 单个批次最多包含的PDF数量
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 500))
+
+# ZIP压缩包解压后的总大小上限（字节），防止压缩炸弹
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", 1024**3))
+
+# 已结束的任务状态
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def open_pdf_archive(
+    source: BinaryIO, max_file_size: int
+) -> Tuple[zipfile.ZipFile, List[zipfile.ZipInfo], List[Dict[str, str]]]:
+    """
+    打开ZIP压缩包并筛选其中的PDF成员（只读取目录，成员内容由 extract_member 逐个解压）
+
+    Args:
+        source: 压缩包文件对象（需可随机读取）
+        max_file_size: 单个文件大小上限（字节）
+
+    Returns:
+        Tuple: (压缩包, 可提取的PDF成员, [{"filename", "error"}])，压缩包由调用方关闭
+
+    Raises:
+        ValueError: 不是有效的ZIP文件，或解压后总大小超过上限
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise ValueError("不是有效的ZIP压缩包")
+
+    members = [
+        info
+        for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+    ]
+    if sum(info.file_size for info in members) > BATCH_MAX_ARCHIVE_BYTES:
+        archive.close()
+        raise ValueError(
+            f"压缩包解压后超过 {BATCH_MAX_ARCHIVE_BYTES // 1024**2}MB 上限"
+        )
+
+    pdfs: List[zipfile.ZipInfo] = []
+    rejected: List[Dict[str, str]] = []
+    for info in members:
+        filename = member_filename(info)
+        if filename.startswith(".") or not filename.lower().endswith(".pdf"):
+            rejected.append({"filename": info.filename, "error": "不是PDF文件"})
+            continue
+        if info.file_size > max_file_size:
+            rejected.append(
+                {
+                    "filename": info.filename,
+                    "error": f"文件大小超过限制，最大支持{max_file_size // 1024**2}MB",
+                }
+            )
+            continue
+        pdfs.append(info)
+
+    return archive, pdfs, rejected
+
+
+def member_filename(info: zipfile.ZipInfo) -> str:
+    """成员的文件名（只保留文件名，忽略压缩包内的目录结构）"""
+    return Path(info.filename).name
+
+
+def extract_member(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    save: Callable[[BinaryIO], Path],
+) -> Path:
+    """
+    逐块解压单个成员并交给 save 写入磁盘
+
+    Raises:
+        ValueError: 成员数据损坏（CRC 校验失败、压缩数据无效等），只影响该成员
+    """
+    try:
+        with archive.open(info) as member:
+            return save(member)
+    except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+        raise ValueError(f"压缩包中的文件已损坏: {e}")
+
+
+class BatchRegistry:
+    """批次登记 - 每个批次一个JSON记录，与任务清单一样在重启后仍可查询"""
+
+    def __init__(self, batch_folder: Optional[Path] = None):
+        self.batch_folder = Path(batch_folder or os.getenv("BATCH_DIR", "batches"))
+        self.batch_folder.mkdir(parents=True, exist_ok=True)
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def generate_batch_id() -> str:
+        return f"batch-{uuid.uuid4()}"
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """原子写入批次记录"""
+        record_path = self.batch_folder / f"{record['batch_id']}.json"
+        tmp_path = record_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, record_path)
+        self._records[record["batch_id"]] = record
+
+    def create(
+        self,
+        batch_id: str,
+        tasks: List[Dict[str, Any]],
+        rejected: List[Dict[str, str]],
+    ) -> Dict[str, Any]:
+        """
+        登记新批次
+
+        Args:
+            batch_id: 批次ID
+            tasks: 成员任务 [{"task_id", "filename", "pages", "recommended_mode"}]
+            rejected: 未能加入批次的文件 [{"filename", "error"}]
+        """
+        record = {
+            "batch_id": batch_id,
+            "created_at": datetime.now().isoformat(),
+            "submitted_at": None,
+            "config": None,
+            "tasks": tasks,
+            "rejected": rejected,
+        }
+        with self._lock:
+            self._write(record)
+        return record
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """获取批次记录"""
+        with self._lock:
+            record = self._records.get(batch_id)
+            if record is not None:
+                return record
+
+            record_path = self.batch_folder / f"{Path(batch_id).name}.json"
+            if not record_path.exists():
+                return None
+            try:
+                with open(record_path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return None
+            self._records[batch_id] = record
+            return record
+
+    def record_submission(
+        self,
+        batch_id: str,
+        config: Dict[str, Any],
+        skipped: List[Dict[str, str]],
+    ) -> None:
+        """登记批次提交的转换配置，skipped 为未能提交的任务 [{"task_id", "error"}]"""
+        record = self.get(batch_id)
+        with self._lock:
+            record["submitted_at"] = datetime.now().isoformat()
+            record["config"] = config
+            errors = {item["task_id"]: item["error"] for item in skipped}
+            for task in record["tasks"]:
+                task["error"] = errors.get(task["task_id"])
+            self._write(record)
+
+    @staticmethod
+    def _task_state(task: Dict[str, Any], submitted: bool) -> Dict[str, Any]:
+        """单个成员任务的当前状态"""
+        if task.get("error"):
+            return {"status": "skipped", "progress": 0.0, "error": task["error"]}
+
+        state = progress_manager.get_progress(task["task_id"])
+        if state is not None:
+            return {
+                "status": state.get("status", "unknown"),
+                "progress": state.get("progress", 0.0),
+                "error": state.get("error"),
+            }
+
+        # 进度信息只保存在内存中，服务重启后按任务清单判断是否已有结果
+        record = task_manifest.get(task["task_id"]) or {}
+        if record.get("primary_output"):
+            return {"status": "completed", "progress": 100.0, "error": None}
+        return {
+            "status": "unknown" if submitted else "uploaded",
+            "progress": 0.0,
+            "error": None,
+        }
+
+    def get_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        汇总批次进度（按页数加权）
+
+        Returns:
+            Optional[Dict[str, Any]]: 批次状态，批次不存在时返回 None
+        """
+        record = self.get(batch_id)
+        if record is None:
+            return None
+
+        submitted = record["submitted_at"] is not None
+        tasks = []
+        counts: Dict[str, int] = {}
+        total_pages = done_pages = 0.0
+        for task in record["tasks"]:
+            state = self._task_state(task, submitted)
+            tasks.append({**task, **state})
+            counts[state["status"]] = counts.get(state["status"], 0) + 1
+            if state["status"] == "skipped":
+                continue
+            pages = max(task.get("pages") or 0, 1)
+            total_pages += pages
+            if state["status"] in FINISHED_STATUSES:
+                done_pages += pages
+            else:
+                done_pages += pages * state["progress"] / 100.0
+
+        active = counts.get("queued", 0) + counts.get("processing", 0)
+        if not submitted:
+            status = "uploaded"
+        elif active > 0:
+            status = "processing"
+        elif counts.get("completed", 0) == len(tasks):
+            status = "completed"
+        else:
+            status = "completed_with_errors"
+
+        return {
+            "batch_id": batch_id,
+            "status": status,
+            "progress": (
+                round(done_pages / total_pages * 100, 2) if total_pages else 0.0
+            ),
+            "created_at": record["created_at"],
+            "submitted_at": record["submitted_at"],
+            "total_tasks": len(tasks),
+            "counts": counts,
+            "rejected": record["rejected"],
+            "tasks": tasks,
+        }
+
+
+# 全局批次登记实例
+batch_registry = BatchRegistry()
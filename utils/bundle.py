@@ -0,0 +1,175 @@
+"""
+ZIP打包下载
+边生成边向客户端流式输出ZIP，不落临时文件；已压缩的图片格式以存储模式写入。
+生成完成的压缩包按内容摘要缓存，内容不变时直接复用
+"""
+
+import os
+import io
+import uuid
+import zipfile
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from utils.metrics import record_cache
+from utils.tracing import log_event
+
+# 流式输出分块大小
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# 已压缩格式，使用存储模式避免重复压缩
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip"}
+
+# 缓存目录名（位于任务输出目录下）
+BUNDLE_CACHE_DIRNAME = ".bundles"
+
+# 打包条目: (压缩包内路径, 源文件路径)
+BundleEntry = Tuple[str, Path]
+
+
+class _StreamBuffer(io.RawIOBase):
+    """不可回溯的写缓冲区，供 ZipFile 以流模式写入"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """取出已写入的数据"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def bundle_digest(entries: Iterable[Tuple[str, str]]) -> str:
+    """根据 (压缩包内路径, 校验和) 列表计算压缩包摘要"""
+    digest = hashlib.sha256()
+    for arcname, checksum in sorted(entries):
+        digest.update(f"{arcname}:{checksum}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def stream_zip(entries: Iterable[BundleEntry]) -> Iterator[bytes]:
+    """
+    流式生成ZIP数据
+
+    Args:
+        entries: 打包条目列表
+
+    Yields:
+        ZIP字节块
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        for arcname, file_path in entries:
+            file_path = Path(file_path)
+            compress_type = (
+                zipfile.ZIP_STORED
+                if file_path.suffix.lower() in STORED_EXTENSIONS
+                else zipfile.ZIP_DEFLATED
+            )
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+            zinfo.compress_type = compress_type
+
+            with open(file_path, "rb") as src, zipf.open(zinfo, "w") as dest:
+                for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b""):
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+    # 写入中央目录
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+class BundleCache:
+    """压缩包缓存 - 按任务、类型与内容摘要复用已生成的ZIP"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_dir(output_dir: Path) -> Path:
+        return output_dir / BUNDLE_CACHE_DIRNAME
+
+    def get_cached(self, output_dir: Path, kind: str, digest: str) -> Optional[Path]:
+        """获取已缓存的压缩包，不存在时返回 None"""
+        cached = self._cache_dir(output_dir) / f"{kind}-{digest}.zip"
+        hit = cached.exists()
+        record_cache("bundle", hit)
+        return cached if hit else None
+
+    def stream_and_cache(
+        self,
+        output_dir: Path,
+        kind: str,
+        digest: str,
+        entries: List[BundleEntry],
+    ) -> Iterator[bytes]:
+        """
+        流式输出ZIP并同步写入缓存
+
+        客户端中途断开时丢弃未完成的缓存文件
+        """
+        cache_dir = self._cache_dir(output_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        final_path = cache_dir / f"{kind}-{digest}.zip"
+        part_path = cache_dir / f"{kind}-{digest}.{uuid.uuid4().hex}.part"
+
+        completed = False
+        try:
+            with open(part_path, "wb") as cache_file:
+                for chunk in stream_zip(entries):
+                    cache_file.write(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                with self._lock:
+                    os.replace(part_path, final_path)
+                    self._evict_stale(cache_dir, kind, keep=final_path)
+            elif part_path.exists():
+                part_path.unlink()
+
+    @staticmethod
+    def _evict_stale(cache_dir: Path, kind: str, keep: Path) -> None:
+        """删除同类型的过期压缩包"""
+        for cached in cache_dir.glob(f"{kind}-*.zip"):
+            if cached != keep:
+                try:
+                    cached.unlink()
+                except OSError as e:
+                    log_event(
+                        "⚠️ 清理过期压缩包失败",
+                        logging.WARNING,
+                        path=str(cached),
+                        error=str(e),
+                    )
+
+
+# 全局压缩包缓存实例
+bundle_cache = BundleCache()
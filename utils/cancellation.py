@@ -0,0 +1,169 @@
+"""
+任务取消与超时
+每个运行中的转换任务持有一个取消令牌：用户取消、整体超时或单页超时都会让令牌失效，
+OCR 逐页循环在页与页之间检查令牌，Marker 子进程由父进程在检查到令牌失效后终止
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+# 取消原因
+REASON_USER = "user"
+REASON_TIMEOUT = "timeout"
+REASON_PAGE_TIMEOUT = "page_timeout"
+
+# 截止时间已过时单次调用的超时秒数（让调用立即超时而不是不限时运行）
+MIN_STEP_TIMEOUT = 0.01
+
+
+def time_left(deadline: float = 0) -> float:
+    """
+    距截止时间（time.monotonic）的剩余秒数，用作单次调用的超时
+
+    同一页的多次 Tesseract 调用共享一个截止时间，各自只获得剩余时间；
+    deadline 为 0 时返回 0（不限制）
+    """
+    if not deadline:
+        return 0
+    return max(deadline - time.monotonic(), MIN_STEP_TIMEOUT)
+
+
+class TaskCancelledError(Exception):
+    """任务已被取消或超时"""
+
+    def __init__(self, task_id: str, reason: str, message: str = ""):
+        self.task_id = task_id
+        self.reason = reason
+        super().__init__(message or f"任务已取消: {reason}")
+
+
+class CancellationToken:
+    """取消令牌 - 记录取消请求与截止时间"""
+
+    def __init__(
+        self,
+        task_id: str,
+        timeout_seconds: float = 0,
+        page_timeout_seconds: float = 0,
+        keep_partial: bool = False,
+    ):
+        self.task_id = task_id
+        self.timeout_seconds = timeout_seconds
+        self.page_timeout_seconds = page_timeout_seconds
+        self.keep_partial = keep_partial
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout_seconds if timeout_seconds else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    @property
+    def is_cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None:
+            if time.monotonic() >= self.deadline:
+                self.cancel(REASON_TIMEOUT)
+        return self._event.is_set()
+
+    def cancel(self, reason: str = REASON_USER, keep_partial: Optional[bool] = None):
+        """请求取消任务"""
+        if keep_partial is not None:
+            self.keep_partial = keep_partial
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def remaining_seconds(self) -> Optional[float]:
+        """距整体截止时间的剩余秒数，未设置超时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def step_timeout(self, pages: int = 1) -> Optional[float]:
+        """
+        处理指定页数可用的最长时间（取单页超时与整体剩余时间的较小值）
+
+        Returns:
+            Optional[float]: 秒数，均未设置时返回 None
+        """
+        limits = []
+        if self.page_timeout_seconds:
+            limits.append(self.page_timeout_seconds * pages)
+        remaining = self.remaining_seconds()
+        if remaining is not None:
+            limits.append(remaining)
+        return min(limits) if limits else None
+
+    def raise_if_cancelled(self) -> None:
+        """已取消时抛出 TaskCancelledError"""
+        if self.is_cancelled:
+            raise TaskCancelledError(self.task_id, self.reason)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "cancelled": self.is_cancelled,
+            "reason": self.reason,
+            "keep_partial": self.keep_partial,
+            "timeout_seconds": self.timeout_seconds,
+            "page_timeout_seconds": self.page_timeout_seconds,
+            "remaining_seconds": self.remaining_seconds(),
+        }
+
+
+class CancellationRegistry:
+    """取消令牌注册表 - 按任务ID管理令牌，超时按转换模式配置"""
+
+    def __init__(self):
+        # 整体超时（秒），0 表示不限制
+        self.task_timeouts = {
+            "ocr": float(os.getenv("OCR_TASK_TIMEOUT_SECONDS", 3600)),
+            "marker": float(os.getenv("MARKER_TASK_TIMEOUT_SECONDS", 3600)),
+        }
+        # 单页超时（秒），0 表示不限制
+        self.page_timeouts = {
+            "ocr": float(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", 120)),
+            "marker": float(os.getenv("MARKER_PAGE_TIMEOUT_SECONDS", 120)),
+        }
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+
+    def create(self, task_id: str, mode: str) -> CancellationToken:
+        """为任务创建令牌（已存在时直接返回，任务结束后由队列移除）"""
+        with self._lock:
+            token = self._tokens.get(task_id)
+            if token is None:
+                token = CancellationToken(
+                    task_id,
+                    timeout_seconds=self.task_timeouts.get(mode, 0),
+                    page_timeout_seconds=self.page_timeouts.get(mode, 0),
+                )
+                self._tokens[task_id] = token
+            return token
+
+    def get(self, task_id: str) -> Optional[CancellationToken]:
+        with self._lock:
+            return self._tokens.get(task_id)
+
+    def cancel(
+        self, task_id: str, reason: str = REASON_USER, keep_partial: bool = False
+    ) -> bool:
+        """
+        取消任务
+
+        Returns:
+            bool: 任务存在运行中的令牌时返回 True
+        """
+        token = self.get(task_id)
+        if token is None:
+            return False
+        token.cancel(reason, keep_partial)
+        return True
+
+    def remove(self, task_id: str) -> None:
+        with self._lock:
+            self._tokens.pop(task_id, None)
+
+
+# 全局取消令牌注册表
+cancellation_registry = CancellationRegistry()
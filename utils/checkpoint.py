@@ -0,0 +1,223 @@
+"""
+转换断点
+逐页（OCR）或逐分片（Marker）把已完成的结果写入任务输出目录下的 .checkpoints/，
+进程重启或任务重试时从已完成的页面继续，只需重做中断时正在处理的页面；
+断点按输入文件校验和与转换配置生成指纹，配置变化时自动作废。
+任务运行期间，已完成页面的断点同时作为"当前已有结果"供 /api/result 实时返回
+"""
+
+import os
+import json
+import uuid
+import pickle
+import shutil
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from utils.task_manifest import task_manifest, compute_checksum
+
+CHECKPOINT_DIRNAME = ".checkpoints"
+CHECKPOINT_MANIFEST = "checkpoint.json"
+
+# 不影响转换结果的配置项，不参与指纹计算
+FINGERPRINT_EXCLUDED_KEYS = {"capture_profile", "gpu_config"}
+
+
+def config_fingerprint(
+    task_id: str, pdf_path: str, mode: str, config: Dict[str, Any], **extra
+) -> str:
+    """
+    计算断点指纹
+
+    Args:
+        task_id: 任务ID（用于从任务清单读取输入校验和）
+        pdf_path: 输入文件路径
+        mode: 转换模式
+        config: 转换配置
+        **extra: 其他影响结果划分的参数（如分片页数）
+
+    Returns:
+        str: 指纹
+    """
+    record = task_manifest.get(task_id) or {}
+    checksum = (record.get("input") or {}).get("sha256") or compute_checksum(
+        Path(pdf_path)
+    )
+    relevant = {k: v for k, v in config.items() if k not in FINGERPRINT_EXCLUDED_KEYS}
+    payload = json.dumps(
+        {"input": checksum, "mode": mode, "config": relevant, **extra},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class CheckpointStore:
+    """单个任务的断点存储"""
+
+    def __init__(
+        self, output_dir: Path, fingerprint: str, total_pages: Optional[int] = None
+    ):
+        self.directory = Path(output_dir) / CHECKPOINT_DIRNAME
+        self.fingerprint = fingerprint
+        self.total_pages = total_pages
+        self._prepare()
+
+    def _prepare(self) -> None:
+        """指纹不一致时清空旧断点"""
+        manifest_file = self.directory / CHECKPOINT_MANIFEST
+        if manifest_file.exists():
+            try:
+                with open(manifest_file, "r", encoding="utf-8") as f:
+                    if json.load(f).get("fingerprint") == self.fingerprint:
+                        return
+            except (OSError, json.JSONDecodeError):
+                pass
+            self.clear()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(
+            manifest_file,
+            json.dumps(
+                {
+                    "fingerprint": self.fingerprint,
+                    "total_pages": self.total_pages,
+                    "created_at": datetime.now().isoformat(),
+                },
+                ensure_ascii=False,
+            ).encode("utf-8"),
+        )
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    # ==================== OCR 逐页断点 ====================
+
+    def _page_file(self, page_number: int) -> Path:
+        return self.directory / f"page-{page_number:05d}.json"
+
+    def save_page(self, page_number: int, data: Dict[str, Any]) -> None:
+        """保存单页结果（页码从1开始）"""
+        self._atomic_write(
+            self._page_file(page_number),
+            json.dumps({"page": page_number, **data}, ensure_ascii=False).encode(
+                "utf-8"
+            ),
+        )
+
+    def load_page(self, page_number: int) -> Optional[Dict[str, Any]]:
+        """读取单页结果，不存在或损坏时返回 None"""
+        page_file = self._page_file(page_number)
+        if not page_file.exists():
+            return None
+        try:
+            with open(page_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def completed_pages(self) -> List[int]:
+        """已完成的页码（升序）"""
+        return sorted(
+            int(path.stem.split("-")[1]) for path in self.directory.glob("page-*.json")
+        )
+
+    # ==================== Marker 分片断点 ====================
+
+    def _shard_file(self, index: int) -> Path:
+        return self.directory / f"shard-{index:04d}.pkl"
+
+    def save_shard(self, index: int, payload: Dict[str, Any], pages: List[int]) -> None:
+        """
+        保存分片结果（含图片对象，使用 pickle），并写入仅含文本的预览供实时查看
+
+        Args:
+            index: 分片序号
+            payload: 分片转换结果
+            pages: 分片包含的页码（从1开始）
+        """
+        self._atomic_write(self._shard_file(index), pickle.dumps(payload))
+        # 预览只包含文本（markdown）内容，其他格式的渲染结果不是字符串
+        content = payload.get("content")
+        self._atomic_write(
+            self._shard_file(index).with_suffix(".json"),
+            json.dumps(
+                {
+                    "shard": index,
+                    "pages": pages,
+                    "content": content if isinstance(content, str) else "",
+                },
+                ensure_ascii=False,
+            ).encode("utf-8"),
+        )
+
+    def load_shards(self, indexes: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """读取已完成的分片结果，损坏的分片视为未完成"""
+        shards = {}
+        for index in indexes:
+            shard_file = self._shard_file(index)
+            if not shard_file.exists():
+                continue
+            try:
+                with open(shard_file, "rb") as f:
+                    shards[index] = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                continue
+        return shards
+
+    # ==================== 实时结果 ====================
+
+    @classmethod
+    def read_partial(cls, output_dir: Path) -> Optional[Dict[str, Any]]:
+        """
+        读取运行中任务已完成的页面（OCR逐页 / Marker逐分片），按页码排序
+
+        Args:
+            output_dir: 任务输出目录
+
+        Returns:
+            Optional[Dict[str, Any]]: {"total_pages", "completed_pages", "segments"}，
+            segments 每项为 {"kind", "pages": [页码...], "content"}；没有断点时返回 None
+        """
+        directory = Path(output_dir) / CHECKPOINT_DIRNAME
+        try:
+            with open(directory / CHECKPOINT_MANIFEST, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        segments = []
+        for kind, pattern in (("page", "page-*.json"), ("shard", "shard-*.json")):
+            for path in directory.glob(pattern):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    # 正在被清理或写入中的文件，下次查询再读取
+                    continue
+                if kind == "page":
+                    pages = [data["page"]]
+                    content = data.get("text", "")
+                else:
+                    pages, content = data["pages"], data.get("content", "")
+                segments.append({"kind": kind, "pages": pages, "content": content})
+
+        segments.sort(key=lambda segment: segment["pages"][0])
+        return {
+            "total_pages": manifest.get("total_pages"),
+            "completed_pages": sum(len(s["pages"]) for s in segments),
+            "segments": segments,
+        }
+
+    # ==================== 清理 ====================
+
+    def clear(self) -> None:
+        """删除全部断点"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,184 @@
+"""
+CPU 线程预算
+Marker（torch 算子内线程）、Tesseract（OpenMP）与 OpenCV 默认都按全部核心创建线程，
+多个任务同时运行时严重超额订阅。本模块按全局计划为每个任务分配线程数：
+转换队列在线程预算允许时才启动任务，Marker 子进程按任务设置 torch 线程数，
+Tesseract 与 OpenCV 的线程数在服务进程内统一设置（两者都是进程级设置）。
+
+CPU_BUDGET_MODE 选择计划：
+- throughput：核心平均分给全部并发槽位，各任务单线程运行 Tesseract/OpenCV，总吞吐优先
+- latency：每个任务独占全部核心，同一时间只运行一个任务，单个任务完成时间优先
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+from utils.metrics import metrics_registry
+from utils.tracing import log_event
+
+MODE_THROUGHPUT = "throughput"
+MODE_LATENCY = "latency"
+MODES = (MODE_THROUGHPUT, MODE_LATENCY)
+
+
+@dataclass
+class ThreadPlan:
+    """线程分配计划"""
+
+    mode: str
+    cores: int
+    slots: int  # 并发转换槽位数
+    threads_per_job: int  # 每个任务占用的线程预算
+    torch_threads: int  # Marker 子进程的 torch 算子内线程数
+    tesseract_threads: int  # Tesseract 进程的 OpenMP 线程上限（OMP_THREAD_LIMIT）
+    opencv_threads: int  # 服务进程内 OpenCV 的线程数
+
+    @property
+    def max_parallel_jobs(self) -> int:
+        """线程预算允许同时运行的任务数"""
+        return min(self.slots, max(self.cores // self.threads_per_job, 1))
+
+
+def build_plan(mode: str, cores: int, slots: int) -> ThreadPlan:
+    """
+    按模式计算线程分配计划
+
+    Args:
+        mode: throughput / latency
+        cores: 可用核心数
+        slots: 并发转换槽位数
+    """
+    if mode == MODE_LATENCY:
+        threads = cores
+        return ThreadPlan(mode, cores, slots, threads, threads, threads, threads)
+    # Tesseract 与 OpenCV 多线程收益有限，并发运行时单线程总吞吐最高
+    threads = max(cores // max(slots, 1), 1)
+    return ThreadPlan(mode, cores, slots, threads, threads, 1, 1)
+
+
+def _describe(plan: ThreadPlan) -> Dict[str, Any]:
+    return {**asdict(plan), "max_parallel_jobs": plan.max_parallel_jobs}
+
+
+class CPUBudget:
+    """CPU 线程预算管理器 - 按计划为任务分配线程并设置各引擎的线程数"""
+
+    def __init__(self):
+        self.mode = os.getenv("CPU_BUDGET_MODE", MODE_THROUGHPUT).lower()
+        if self.mode not in MODES:
+            log_event(
+                "⚠️ 未知CPU预算模式，使用 throughput",
+                logging.WARNING,
+                mode=self.mode,
+            )
+            self.mode = MODE_THROUGHPUT
+        self.cores = int(os.getenv("CPU_BUDGET_CORES", 0)) or os.cpu_count() or 1
+        self.slots = int(os.getenv("MAX_CONCURRENT_JOBS", 2))
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._applied: Optional[ThreadPlan] = None
+
+    @property
+    def plan(self) -> ThreadPlan:
+        """当前计划"""
+        return build_plan(self.mode, self.cores, self.slots)
+
+    # ==================== 分配与释放 ====================
+
+    def _reserved(self) -> int:
+        return sum(self._leases.values())
+
+    def can_start(self) -> bool:
+        """线程预算是否允许再启动一个任务（没有运行中任务时总是允许）"""
+        with self._lock:
+            return (
+                not self._leases
+                or self._reserved() + self.plan.threads_per_job <= self.cores
+            )
+
+    def acquire(self, task_id: str) -> int:
+        """为任务分配线程预算，返回线程数"""
+        threads = self.plan.threads_per_job
+        with self._lock:
+            self._leases[task_id] = threads
+        return threads
+
+    async def acquire_async(self, task_id: str, poll_interval: float = 0.5) -> int:
+        """等待线程预算后分配（供不经过转换队列的调用方使用，如命令行批量转换）"""
+        while not self.can_start():
+            await asyncio.sleep(poll_interval)
+        return self.acquire(task_id)
+
+    def release(self, task_id: str) -> None:
+        """释放任务的线程预算"""
+        with self._lock:
+            self._leases.pop(task_id, None)
+
+    def threads_for(self, task_id: str) -> int:
+        """任务的线程数（未分配时按计划）"""
+        with self._lock:
+            return self._leases.get(task_id, self.plan.threads_per_job)
+
+    # ==================== 应用到各引擎 ====================
+
+    def worker_environment(self) -> Dict[str, str]:
+        """Marker 子进程的线程环境变量（在导入 torch 之前设置）"""
+        threads = str(self.plan.torch_threads)
+        return {
+            "OMP_NUM_THREADS": threads,
+            "MKL_NUM_THREADS": threads,
+            # 覆盖服务进程为 Tesseract 设置的上限
+            "OMP_THREAD_LIMIT": threads,
+        }
+
+    def apply_ocr_limits(self) -> None:
+        """
+        设置 Tesseract 与 OpenCV 的线程数（OCR 在服务进程的线程中运行）
+
+        pytesseract 以服务进程的环境变量启动 Tesseract，cv2.setNumThreads 也是进程级设置，
+        两者在同一计划下对所有 OCR 任务相同，只在计划变化后设置一次
+        """
+        plan = self.plan
+        if self._applied == plan:
+            return
+        import cv2
+
+        os.environ["OMP_THREAD_LIMIT"] = str(plan.tesseract_threads)
+        cv2.setNumThreads(plan.opencv_threads)
+        self._applied = plan
+        log_event(
+            "🧵 已设置OCR线程数",
+            tesseract_threads=plan.tesseract_threads,
+            opencv_threads=plan.opencv_threads,
+        )
+
+    # ==================== 状态查询 ====================
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取当前计划、各模式的对比计划与线程占用"""
+        with self._lock:
+            leases = dict(self._leases)
+        return {
+            "plan": _describe(self.plan),
+            "alternatives": {
+                mode: _describe(build_plan(mode, self.cores, self.slots))
+                for mode in MODES
+                if mode != self.mode
+            },
+            "reserved_threads": sum(leases.values()),
+            "leases": leases,
+        }
+
+
+# 全局 CPU 线程预算实例
+cpu_budget = CPUBudget()
+
+metrics_registry.gauge(
+    "cpu_threads_reserved",
+    "运行中任务占用的CPU线程预算",
+    callback=lambda: cpu_budget.get_status()["reserved_threads"],
+)
@@ -0,0 +1,295 @@
+"""
+设备调度
+服务启动时在线程中盘点可用设备（nvidia-smi，或由 DEVICE_INVENTORY 指定），按任务分配设备；
+转换子进程只在自身环境中设置 CUDA_VISIBLE_DEVICES / TORCH_DEVICE（在导入 torch 之前），
+不修改服务进程的全局环境变量，并发任务之间互不影响。
+启用GPU的配置按实际设备容量校验；没有GPU的机器可用 DEVICE_INVENTORY=cpu:0,cpu:1 模拟设备
+"""
+
+import os
+import asyncio
+import logging
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+from utils.tracing import log_event
+
+# nvidia-smi 查询超时（秒）
+NVIDIA_SMI_TIMEOUT_SECONDS = 10
+
+
+@dataclass
+class Device:
+    """可分配的设备"""
+
+    kind: str  # cuda / cpu
+    index: int
+    name: str = ""
+    memory_mb: float = 0.0
+
+    @property
+    def device_id(self) -> str:
+        return f"{self.kind}:{self.index}"
+
+
+@dataclass
+class DeviceLease:
+    """任务占用的设备"""
+
+    task_id: str
+    devices: List[Device]
+    num_workers: int
+
+    def environment(self) -> Dict[str, str]:
+        """转换子进程的设备环境变量"""
+        cuda = [device for device in self.devices if device.kind == "cuda"]
+        return {
+            # CPU 设备隐藏全部GPU
+            "CUDA_VISIBLE_DEVICES": ",".join(str(device.index) for device in cuda),
+            "TORCH_DEVICE": "cuda" if cuda else "cpu",
+            "NUM_DEVICES": str(len(self.devices)),
+            "NUM_WORKERS": str(self.num_workers),
+        }
+
+
+def parse_inventory(spec: str) -> List[Device]:
+    """
+    解析设备清单字符串
+
+    Args:
+        spec: 逗号分隔的设备，如 "cuda:0,cuda:1" 或 "cpu:0,cpu:1"
+
+    Raises:
+        ValueError: 格式无效
+    """
+    devices = []
+    for item in spec.split(","):
+        kind, _, index = item.strip().partition(":")
+        if kind not in ("cuda", "cpu") or not index.isdigit():
+            raise ValueError(f"设备格式无效: {item}（应为 cuda:N 或 cpu:N）")
+        devices.append(Device(kind=kind, index=int(index), name=item.strip()))
+    return devices
+
+
+def query_nvidia_devices() -> List[Device]:
+    """通过 nvidia-smi 查询GPU（不在服务进程中初始化CUDA），按服务进程的 CUDA_VISIBLE_DEVICES 过滤"""
+    try:
+        output = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-gpu=index,name,memory.total",
+                "--format=csv,noheader,nounits",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=NVIDIA_SMI_TIMEOUT_SECONDS,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+
+    devices = []
+    for line in output.strip().splitlines():
+        index, name, memory = (part.strip() for part in line.split(","))
+        devices.append(
+            Device(kind="cuda", index=int(index), name=name, memory_mb=float(memory))
+        )
+
+    visible = os.getenv("CUDA_VISIBLE_DEVICES")
+    if visible is not None:
+        allowed = {int(i) for i in visible.split(",") if i.strip().isdigit()}
+        devices = [device for device in devices if device.index in allowed]
+    return devices
+
+
+class DeviceScheduler:
+    """设备调度器 - 盘点设备、按任务分配并校验GPU配置"""
+
+    def __init__(self, devices: Optional[List[Device]] = None):
+        # 每个设备同时运行的任务数
+        self.jobs_per_device = int(os.getenv("DEVICE_JOBS_PER_GPU", 1))
+        self._devices = devices
+        self._leases: Dict[str, DeviceLease] = {}
+        self._lock = threading.Lock()
+        # 盘点单独加锁：持有 _lock 的分配逻辑也会读取设备列表
+        self._inventory_lock = threading.Lock()
+
+    def discover(self) -> List[Device]:
+        """
+        盘点可用设备（只执行一次）
+
+        nvidia-smi 最长可能阻塞 NVIDIA_SMI_TIMEOUT_SECONDS 秒，服务启动时在线程中调用，
+        请求处理中读取 devices 时直接使用盘点结果，不阻塞事件循环
+        """
+        with self._inventory_lock:
+            if self._devices is None:
+                spec = os.getenv("DEVICE_INVENTORY", "").strip()
+                self._devices = (
+                    parse_inventory(spec) if spec else query_nvidia_devices()
+                )
+                log_event(
+                    "🎛️ 设备盘点完成",
+                    devices=",".join(d.device_id for d in self._devices) or "无",
+                )
+        return self._devices
+
+    @property
+    def devices(self) -> List[Device]:
+        """可分配的设备（尚未盘点时立即盘点，如命令行批量转换）"""
+        if self._devices is None:
+            return self.discover()
+        return self._devices
+
+    @property
+    def has_gpu(self) -> bool:
+        """是否盘点到GPU"""
+        return any(d.kind == "cuda" for d in self.devices)
+
+    def _candidates(self, gpu_config: Dict[str, Any]) -> List[Device]:
+        """配置允许使用的设备：有GPU时只分配GPU，cuda_visible_devices 限定可选编号"""
+        devices = [d for d in self.devices if d.kind == "cuda"] or self.devices
+        allowed = gpu_config.get("cuda_visible_devices")
+        if allowed:
+            indexes = {int(i) for i in str(allowed).split(",") if i.strip().isdigit()}
+            devices = [d for d in devices if d.index in indexes]
+        return devices
+
+    # ==================== 校验 ====================
+
+    def validate(self, gpu_config: Optional[Dict[str, Any]]) -> List[str]:
+        """
+        按实际设备容量校验GPU配置
+
+        Returns:
+            List[str]: 错误列表，为空表示可以执行
+        """
+        gpu_config = gpu_config or {}
+        if not gpu_config.get("enabled", False):
+            return []
+        if not self.devices:
+            return ["服务器没有可用的GPU设备，请关闭GPU加速"]
+
+        errors = []
+        allowed = str(gpu_config.get("cuda_visible_devices") or "")
+        parts = [part.strip() for part in allowed.split(",") if part.strip()]
+        if any(not part.isdigit() for part in parts):
+            errors.append(f"cuda_visible_devices 格式无效: {allowed}")
+        else:
+            known = {d.index for d in self._candidates({})}
+            missing = [part for part in parts if int(part) not in known]
+            if missing:
+                errors.append(
+                    f"GPU设备 {','.join(missing)} 不存在"
+                    f"（可用: {','.join(str(i) for i in sorted(known))}）"
+                )
+
+        requested = int(gpu_config.get("num_devices", 1))
+        available = len(self._candidates(gpu_config))
+        if not errors and requested > available:
+            errors.append(f"请求 {requested} 个GPU设备，可用设备只有 {available} 个")
+        return errors
+
+    # ==================== 分配与释放 ====================
+
+    def _free_devices(self, gpu_config: Dict[str, Any]) -> List[Device]:
+        """有空闲槽位的候选设备，负载低的优先"""
+        load: Dict[str, int] = {}
+        for lease in self._leases.values():
+            for device in lease.devices:
+                load[device.device_id] = load.get(device.device_id, 0) + 1
+        free = [
+            d
+            for d in self._candidates(gpu_config)
+            if load.get(d.device_id, 0) < self.jobs_per_device
+        ]
+        return sorted(free, key=lambda d: (load.get(d.device_id, 0), d.index))
+
+    def can_start(self, gpu_config: Optional[Dict[str, Any]]) -> bool:
+        """是否有足够的空闲设备（未启用GPU的任务不占用设备）"""
+        gpu_config = gpu_config or {}
+        if not gpu_config.get("enabled", False):
+            return True
+        with self._lock:
+            return len(self._free_devices(gpu_config)) >= int(
+                gpu_config.get("num_devices", 1)
+            )
+
+    def acquire(
+        self, task_id: str, gpu_config: Optional[Dict[str, Any]]
+    ) -> Optional[DeviceLease]:
+        """
+        为任务分配设备
+
+        Returns:
+            Optional[DeviceLease]: 分配结果，未启用GPU或设备不足时返回 None
+        """
+        gpu_config = gpu_config or {}
+        if not gpu_config.get("enabled", False):
+            return None
+        requested = int(gpu_config.get("num_devices", 1))
+        with self._lock:
+            free = self._free_devices(gpu_config)
+            if len(free) < requested:
+                return None
+            lease = DeviceLease(
+                task_id=task_id,
+                devices=free[:requested],
+                num_workers=int(gpu_config.get("num_workers", 4)),
+            )
+            self._leases[task_id] = lease
+        log_event(
+            "🎛️ 已分配设备",
+            logging.DEBUG,
+            task_id=task_id,
+            devices=",".join(d.device_id for d in lease.devices),
+        )
+        return lease
+
+    async def acquire_async(
+        self,
+        task_id: str,
+        gpu_config: Optional[Dict[str, Any]],
+        poll_interval: float = 0.5,
+    ) -> Optional[DeviceLease]:
+        """等待设备空闲后分配（供不经过转换队列的调用方使用，如命令行批量转换）"""
+        while not self.can_start(gpu_config):
+            await asyncio.sleep(poll_interval)
+        return self.acquire(task_id, gpu_config)
+
+    def release(self, task_id: str) -> None:
+        """释放任务占用的设备"""
+        with self._lock:
+            self._leases.pop(task_id, None)
+
+    def get_lease(self, task_id: str) -> Optional[DeviceLease]:
+        """获取任务占用的设备"""
+        with self._lock:
+            return self._leases.get(task_id)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取设备分配状态"""
+        devices = self.devices
+        with self._lock:
+            leases = list(self._leases.values())
+        return {
+            "jobs_per_device": self.jobs_per_device,
+            "devices": [
+                {
+                    "id": device.device_id,
+                    "name": device.name,
+                    "memory_mb": device.memory_mb,
+                    "tasks": [
+                        lease.task_id
+                        for lease in leases
+                        if any(d.device_id == device.device_id for d in lease.devices)
+                    ],
+                }
+                for device in devices
+            ],
+        }
+
+
+# 全局设备调度器实例
+device_scheduler = DeviceScheduler()
@@ -1,10 +1,16 @@
 import os
+import io
 import uuid
 import shutil
+import hashlib
 import threading
 from pathlib import Path
-from typing import Optional, Set
+from typing import BinaryIO, Optional, Set
 from fastapi import UploadFile
+from utils.task_manifest import task_manifest
+
+# 流式保存上传内容时每次读取的字节数
+COPY_CHUNK_SIZE = 1024 * 1024
 
 
 class FileHandler:
@@ -75,13 +81,42 @@ class FileHandler:
         """保存上传文件"""
         self.validate_file(file.filename, file.size)
 
-        file_path = self.upload_folder / f"{task_id}_{file.filename}"
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # 使用异步方式保存文件
+        # 使用异步方式读取文件
         content = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        return self.save_upload_bytes(content, file.filename, task_id)
+
+    def save_upload_bytes(self, content: bytes, filename: str, task_id: str) -> Path:
+        """保存已读取的上传内容"""
+        self.validate_file(filename, len(content))
+        return self.save_upload_stream(io.BytesIO(content), filename, task_id)
+
+    def save_upload_stream(self, source: BinaryIO, filename: str, task_id: str) -> Path:
+        """
+        逐块保存上传内容（批量上传的文件与ZIP成员不整体读入内存）
+
+        超过大小上限或读取失败时删除已写入的部分文件并抛出异常
+        """
+        self.validate_file(filename, None)
+
+        file_path = self.upload_folder / f"{task_id}_{filename}"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(file_path, "wb") as buffer:
+                while chunk := source.read(COPY_CHUNK_SIZE):
+                    size += len(chunk)
+                    self.validate_file(filename, size)
+                    digest.update(chunk)
+                    buffer.write(chunk)
+        except BaseException:
+            file_path.unlink(missing_ok=True)
+            raise
+
+        # 登记任务清单，后续按任务ID直接定位文件
+        task_manifest.register_upload(
+            task_id, file_path, filename, checksum=digest.hexdigest()
+        )
 
         return file_path
 
@@ -95,6 +130,13 @@ class FileHandler:
         """获取上传文件路径"""
         return self.upload_folder / f"{task_id}_{filename}"
 
+    def find_upload_file(self, task_id: str) -> Optional[Path]:
+        """通过任务清单查找上传文件"""
+        upload_path = task_manifest.get_upload_path(task_id)
+        if upload_path is None or not upload_path.exists():
+            return None
+        return upload_path
+
     def get_output_directory(self, task_id: str) -> Path:
         """获取输出目录路径"""
         return self.output_folder / task_id
@@ -102,12 +144,12 @@ class FileHandler:
     def cleanup_task_files(self, task_id: str) -> None:
         """清理任务相关文件"""
         # 清理上传文件
-        upload_pattern = f"{task_id}_*"
-        for file_path in self.upload_folder.glob(upload_pattern):
+        upload_path = task_manifest.get_upload_path(task_id)
+        if upload_path is not None and upload_path.exists():
             try:
-                file_path.unlink()
+                upload_path.unlink()
             except Exception as e:
-                print(f"清理上传文件失败: {file_path}, 错误: {e}")
+                print(f"清理上传文件失败: {upload_path}, 错误: {e}")
 
         # 清理输出目录
         output_dir = self.output_folder / task_id
@@ -117,17 +159,23 @@ class FileHandler:
             except Exception as e:
                 print(f"清理输出目录失败: {output_dir}, 错误: {e}")
 
+        # 清理任务清单
+        task_manifest.remove(task_id)
+
     def get_file_info(self, task_id: str) -> dict:
         """获取任务文件信息"""
-        upload_files = list(self.upload_folder.glob(f"{task_id}_*"))
+        record = task_manifest.get(task_id) or {}
         output_dir = self.output_folder / task_id
+        upload_info = record.get("input")
 
         return {
             "task_id": task_id,
-            "upload_files": [str(f) for f in upload_files],
+            "upload_files": [upload_info["path"]] if upload_info else [],
             "output_directory": str(output_dir),
             "output_exists": output_dir.exists(),
-            "output_files": (list(output_dir.glob("*")) if output_dir.exists() else []),
+            "output_files": [
+                entry["path"] for entry in record.get("outputs", {}).values()
+            ],
         }
 
 
@@ -0,0 +1,265 @@
+"""
+存储清理任务
+后台定期回收 uploads/ 与 outputs/ 中的过期文件：按产物类型配置保留时长，
+超出总磁盘配额时按最近访问时间（LRU）淘汰任务，处理中或已固定的任务不会被清理
+"""
+
+import os
+import shutil
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from utils.file_handler import FileHandler
+from utils.metrics import (
+    metrics_registry,
+    STORAGE_BYTES_RECLAIMED,
+    STORAGE_FILES_RECLAIMED,
+    STORAGE_TASKS_EVICTED,
+    STORAGE_USAGE_BYTES,
+)
+from utils.progress import progress_manager
+from utils.task_manifest import task_manifest
+from utils.bundle import BUNDLE_CACHE_DIRNAME
+from utils.tracing import log_event
+
+
+def _hours_from_env(name: str, default: float) -> float:
+    """读取以小时为单位的环境变量，0 表示不按时长清理"""
+    return float(os.getenv(name, default))
+
+
+class StorageJanitor:
+    """存储清理器 - TTL过期回收 + 磁盘配额LRU淘汰"""
+
+    def __init__(self):
+        # 各类产物的保留时长（小时）
+        self.ttl_hours: Dict[str, float] = {
+            "upload": _hours_from_env("UPLOAD_TTL_HOURS", 24),
+            "output": _hours_from_env("OUTPUT_TTL_HOURS", 24 * 7),
+            "bundle": _hours_from_env("BUNDLE_TTL_HOURS", 6),
+        }
+        # 总磁盘配额（字节），0 表示不限制
+        self.quota_bytes = int(float(os.getenv("DISK_QUOTA_MB", 10 * 1024)) * 1024**2)
+        # 清理间隔（秒）
+        self.interval_seconds = float(os.getenv("JANITOR_INTERVAL_SECONDS", 600))
+
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics: Dict[str, Any] = {
+            "bytes_reclaimed_total": 0,
+            "files_reclaimed_total": 0,
+            "tasks_evicted_total": 0,
+            "runs_total": 0,
+            "last_run": None,
+            "last_run_duration": 0.0,
+            "usage_bytes": {"uploads": 0, "outputs": 0, "bundles": 0, "total": 0},
+            "quota_bytes": self.quota_bytes,
+        }
+
+    # ==================== 保护判断 ====================
+
+    @staticmethod
+    def is_protected(record: Dict[str, Any]) -> bool:
+        """排队中、处理中或已固定的任务不可清理"""
+        if record.get("pinned"):
+            return True
+        task_data = progress_manager.get_progress(record["task_id"])
+        return bool(task_data and task_data.get("status") in ("queued", "processing"))
+
+    @staticmethod
+    def _age_hours(timestamp: Optional[str], now: datetime) -> float:
+        if not timestamp:
+            return 0.0
+        return (now - datetime.fromisoformat(timestamp)).total_seconds() / 3600
+
+    # ==================== 用量统计 ====================
+
+    @staticmethod
+    def _bundle_dir(task_id: str) -> Path:
+        return FileHandler().get_output_directory(task_id) / BUNDLE_CACHE_DIRNAME
+
+    def _task_usage(self, record: Dict[str, Any]) -> Dict[str, int]:
+        """根据清单统计单个任务占用的空间"""
+        upload_bytes = record["input"]["size"] if record.get("input") else 0
+        output_bytes = sum(entry["size"] for entry in record["outputs"].values())
+        output_bytes += sum(image["size"] for image in record["images"])
+
+        bundle_bytes = 0
+        bundle_dir = self._bundle_dir(record["task_id"])
+        if bundle_dir.exists():
+            bundle_bytes = sum(p.stat().st_size for p in bundle_dir.glob("*.zip"))
+
+        return {
+            "uploads": upload_bytes,
+            "outputs": output_bytes,
+            "bundles": bundle_bytes,
+        }
+
+    # ==================== 回收操作 ====================
+
+    def _reclaim(self, path: Path) -> int:
+        """删除文件或目录并返回回收的字节数"""
+        if not path.exists():
+            return 0
+
+        if path.is_dir():
+            files = [p for p in path.rglob("*") if p.is_file()]
+            size = sum(p.stat().st_size for p in files)
+            shutil.rmtree(path)
+        else:
+            files = [path]
+            size = path.stat().st_size
+            path.unlink()
+
+        self.metrics["bytes_reclaimed_total"] += size
+        self.metrics["files_reclaimed_total"] += len(files)
+        STORAGE_BYTES_RECLAIMED.inc(size)
+        STORAGE_FILES_RECLAIMED.inc(len(files))
+        return size
+
+    def _evict_task(self, task_id: str) -> int:
+        """整体淘汰一个任务的上传文件、输出目录与清单"""
+        reclaimed = 0
+        upload_path = task_manifest.get_upload_path(task_id)
+        if upload_path is not None:
+            reclaimed += self._reclaim(upload_path)
+        reclaimed += self._reclaim(FileHandler().get_output_directory(task_id))
+        task_manifest.remove(task_id)
+        progress_manager.remove_task(task_id)
+        self.metrics["tasks_evicted_total"] += 1
+        STORAGE_TASKS_EVICTED.inc()
+        return reclaimed
+
+    def run_once(self) -> Dict[str, Any]:
+        """执行一轮清理"""
+        with self._lock:
+            started = datetime.now()
+            usage = {"uploads": 0, "outputs": 0, "bundles": 0}
+            candidates: List[tuple] = []
+
+            for record in list(task_manifest.iter_records()):
+                task_id = record["task_id"]
+                try:
+                    if self.is_protected(record):
+                        task_usage = self._task_usage(record)
+                        for key, value in task_usage.items():
+                            usage[key] += value
+                        continue
+
+                    # 1. 输出过期：整体淘汰任务
+                    output_ttl = self.ttl_hours["output"]
+                    if output_ttl and (
+                        self._age_hours(record["updated_at"], started) > output_ttl
+                    ):
+                        self._evict_task(task_id)
+                        continue
+
+                    # 2. 上传文件过期：仅删除上传文件
+                    upload_ttl = self.ttl_hours["upload"]
+                    if (
+                        upload_ttl
+                        and record.get("input")
+                        and self._age_hours(record["created_at"], started) > upload_ttl
+                    ):
+                        self._reclaim(Path(record["input"]["path"]))
+                        task_manifest.clear_input(task_id)
+
+                    # 3. 压缩包缓存过期
+                    bundle_ttl = self.ttl_hours["bundle"]
+                    bundle_dir = self._bundle_dir(task_id)
+                    if bundle_ttl and bundle_dir.exists():
+                        for bundle in bundle_dir.glob("*.zip"):
+                            mtime = datetime.fromtimestamp(bundle.stat().st_mtime)
+                            age = (started - mtime).total_seconds() / 3600
+                            if age > bundle_ttl:
+                                self._reclaim(bundle)
+
+                    task_usage = self._task_usage(record)
+                    for key, value in task_usage.items():
+                        usage[key] += value
+                    candidates.append(
+                        (
+                            record.get("last_accessed") or record["created_at"],
+                            task_id,
+                            sum(task_usage.values()),
+                        )
+                    )
+
+                except Exception as e:
+                    log_event(
+                        "⚠️ 清理任务失败",
+                        logging.WARNING,
+                        task_id=task_id,
+                        error=str(e),
+                    )
+
+            # 4. 超出配额时按最近访问时间淘汰
+            total = sum(usage.values())
+            if self.quota_bytes and total > self.quota_bytes:
+                for _, task_id, task_bytes in sorted(candidates):
+                    if total <= self.quota_bytes:
+                        break
+                    try:
+                        self._evict_task(task_id)
+                        total -= task_bytes
+                    except Exception as e:
+                        log_event(
+                            "⚠️ 配额淘汰失败",
+                            logging.WARNING,
+                            task_id=task_id,
+                            error=str(e),
+                        )
+
+            usage["total"] = total
+            self.metrics["usage_bytes"] = usage
+            for area, value in usage.items():
+                STORAGE_USAGE_BYTES.set(value, area=area)
+            self.metrics["runs_total"] += 1
+            self.metrics["last_run"] = started.isoformat()
+            self.metrics["last_run_duration"] = (
+                datetime.now() - started
+            ).total_seconds()
+            return dict(self.metrics)
+
+    # ==================== 后台调度 ====================
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                log_event("⚠️ 存储清理异常", logging.WARNING, error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """在当前事件循环中启动后台清理"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """停止后台清理"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取清理统计与当前用量"""
+        return {**self.metrics, "ttl_hours": dict(self.ttl_hours)}
+
+
+# 全局存储清理实例
+storage_janitor = StorageJanitor()
+
+metrics_registry.gauge(
+    "storage_quota_bytes",
+    "总磁盘配额（字节），0 表示不限制",
+    callback=lambda: storage_janitor.quota_bytes,
+)
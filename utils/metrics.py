@@ -0,0 +1,340 @@
+"""
+运行指标
+轻量的 Prometheus 指标实现（计数器、仪表、直方图），以文本格式输出到 /metrics；
+阶段计时器基于 perf_counter，开销足够低，可在生产环境常开
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, List, Callable, Iterator, Optional
+
+from utils.profiling import get_current_profile
+from utils.tracing import tracer
+
+# 默认直方图分桶（秒），覆盖单页毫秒级阶段到整本文档的长耗时
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    1800.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """转义标签值中的反斜杠、引号与换行"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    """格式化标签"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        # 无标签的计数器在首次递增前也输出 0，便于告警规则计算增量
+        if not values and not self.labelnames:
+            values[()] = 0.0
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """仪表，支持直接设置或在采集时通过回调取值"""
+
+    metric_type = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kw):
+        super().__init__(*args, **kw)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception:
+                value = float("nan")
+            return [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+                for key, v in sorted(self._values.items())
+            ]
+
+
+class Histogram(_Metric):
+    """直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kw):
+        super().__init__(*args, **kw)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各分桶计数..., 总数, 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{cumulative}"
+                )
+            inf = 'le="+Inf"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} "
+                f"{state[-2]}"
+            )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {state[-2]}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback=callback))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
+
+# ==================== 转换指标 ====================
+
+STAGE_SECONDS = metrics_registry.histogram(
+    "pdf_conversion_stage_seconds",
+    "各转换阶段耗时（秒）",
+    ("stage", "mode"),
+)
+CONVERSION_SECONDS = metrics_registry.histogram(
+    "pdf_conversion_duration_seconds",
+    "整个转换任务耗时（秒）",
+    ("mode",),
+)
+CONVERSIONS_TOTAL = metrics_registry.counter(
+    "pdf_conversions_total",
+    "转换任务数量",
+    ("mode", "status"),
+)
+PAGES_TOTAL = metrics_registry.counter(
+    "pdf_pages_processed_total",
+    "已处理页数",
+    ("mode",),
+)
+
+# ==================== OCR指标 ====================
+
+OCR_CONFIG_SELECTED = metrics_registry.counter(
+    "ocr_config_selected_total",
+    "OCR配置选择次数",
+    ("config",),
+)
+TESSERACT_SECONDS = metrics_registry.histogram(
+    "ocr_tesseract_seconds",
+    "单次 Tesseract 调用耗时（秒）",
+    ("config",),
+)
+
+# ==================== 缓存与队列指标 ====================
+
+CACHE_REQUESTS = metrics_registry.counter(
+    "cache_requests_total",
+    "缓存查询次数",
+    ("cache", "result"),
+)
+ADMISSION_REJECTIONS = metrics_registry.counter(
+    "admission_rejections_total",
+    "准入控制拒绝次数",
+    ("reason",),
+)
+SPECULATION_DISCARDED = metrics_registry.counter(
+    "speculation_discarded_total",
+    "未被使用而丢弃的推测性预处理（预渲染页面、预热进程）",
+    ("kind",),
+)
+WORKER_RECYCLES = metrics_registry.counter(
+    "marker_worker_recycles_total",
+    "达到任务数或内存阈值而回收的 Marker 子进程数",
+    ("reason",),
+)
+
+# ==================== 存储指标 ====================
+
+STORAGE_BYTES_RECLAIMED = metrics_registry.counter(
+    "storage_bytes_reclaimed_total",
+    "存储清理回收的字节数",
+)
+STORAGE_FILES_RECLAIMED = metrics_registry.counter(
+    "storage_files_reclaimed_total",
+    "存储清理删除的文件数",
+)
+STORAGE_TASKS_EVICTED = metrics_registry.counter(
+    "storage_tasks_evicted_total",
+    "过期或超出配额而整体淘汰的任务数",
+)
+STORAGE_USAGE_BYTES = metrics_registry.gauge(
+    "storage_usage_bytes",
+    "最近一轮清理后各类产物占用的空间（字节）",
+    ("area",),
+)
+
+
+@contextmanager
+def stage_timer(stage: str, mode: str) -> Iterator[None]:
+    """记录一个转换阶段的耗时，并开启对应的追踪 span"""
+    start = time.perf_counter()
+    try:
+        with tracer.span(f"stage.{stage}", stage=stage, mode=mode):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, mode=mode)
+        profile = get_current_profile()
+        if profile is not None:
+            profile.record_stage(stage, elapsed)
+
+
+@contextmanager
+def tesseract_timer(config_name: str) -> Iterator[None]:
+    """记录一次 Tesseract 调用的耗时，并开启对应的追踪 span"""
+    start = time.perf_counter()
+    try:
+        with tracer.span("tesseract", config=config_name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        TESSERACT_SECONDS.observe(elapsed, config=config_name)
+        profile = get_current_profile()
+        if profile is not None:
+            profile.record_tesseract(config_name, elapsed)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """记录缓存命中情况"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
@@ -5,12 +5,13 @@ OCR智能引擎
 """
 
 import re
-import numpy as np
+import logging
 from typing import Dict, Any, Tuple, List
-import cv2
 from PIL import Image
-from langdetect import detect, detect_langs, LangDetectException
 import pytesseract
+from utils.cancellation import time_left
+from utils.metrics import tesseract_timer
+from utils.tracing import log_event
 
 # 设置Tesseract路径（Windows）
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -232,6 +233,9 @@ class OCREngine:
         Returns:
             Tuple[str, float]: (语言代码, 置信度)
         """
+        # langdetect 加载语言模型较慢，首次检测时才导入
+        from langdetect import detect, detect_langs, LangDetectException
+
         if (
             not text
             or len(text.strip())
@@ -305,6 +309,8 @@ class OCREngine:
         Returns:
             Tuple[str, float]: (语言类型, 置信度)
         """
+        from langdetect import detect_langs, LangDetectException
+
         if (
             not text
             or len(text.strip())
@@ -397,12 +403,13 @@ class OCREngine:
             )
 
     @staticmethod
-    def get_sample_text_for_detection(image) -> str:
+    def get_sample_text_for_detection(image, deadline: float = 0) -> str:
         """
         从图像中提取用于语言检测的样本文本（增强版）
 
         Args:
             image: PIL Image对象
+            deadline: 本页 OCR 的截止时间（time.monotonic），0 表示不限制
 
         Returns:
             str: 样本文本
@@ -413,9 +420,13 @@ class OCREngine:
             custom_config = f'--psm {sample_config["psm"]} --dpi {sample_config["dpi"]}'
 
             # 执行快速OCR
-            sample_text = pytesseract.image_to_string(
-                image, lang=sample_config["lang"], config=custom_config
-            )
+            with tesseract_timer("language_sample"):
+                sample_text = pytesseract.image_to_string(
+                    image,
+                    lang=sample_config["lang"],
+                    config=custom_config,
+                    timeout=time_left(deadline),
+                )
 
             # 清理和截取样本
             sample_text = sample_text.strip()
@@ -427,9 +438,13 @@ class OCREngine:
             ):
                 # 使用更高DPI的配置重新提取
                 high_dpi_config = f'--psm {sample_config["psm"]} --dpi 200'
-                high_dpi_text = pytesseract.image_to_string(
-                    image, lang=sample_config["lang"], config=high_dpi_config
-                )
+                with tesseract_timer("language_sample_retry"):
+                    high_dpi_text = pytesseract.image_to_string(
+                        image,
+                        lang=sample_config["lang"],
+                        config=high_dpi_config,
+                        timeout=time_left(deadline),
+                    )
 
                 if len(high_dpi_text.strip()) > len(sample_text):
                     sample_text = high_dpi_text.strip()
@@ -444,7 +459,7 @@ class OCREngine:
             return sample_text
 
         except Exception as e:
-            print(f"⚠️ 样本文本提取失败: {e}")
+            log_event("⚠️ 样本文本提取失败", logging.WARNING, error=str(e))
             return ""
 
     @staticmethod
@@ -521,7 +536,7 @@ class OCREngine:
             return "technical"
 
         except Exception as e:
-            print(f"⚠️ 文档类型检测失败: {e}")
+            log_event("⚠️ 文档类型检测失败", logging.WARNING, error=str(e))
             return "technical"  # 默认回退
 
     @staticmethod
@@ -535,6 +550,9 @@ class OCREngine:
         Returns:
             bool: 是否包含表格结构
         """
+        import cv2
+        import numpy as np
+
         try:
             # 转换为OpenCV格式
             img_array = np.array(image)
@@ -594,14 +612,17 @@ class OCREngine:
                 and total_lines >= table_config["min_lines"]
             )
 
-            print(
-                f"📊 表格检测: 水平线比例={horizontal_ratio:.2f}, "
-                f"垂直线比例={vertical_ratio:.2f}, 总线条数={total_lines}"
+            log_event(
+                "📊 表格检测",
+                logging.DEBUG,
+                horizontal_ratio=round(horizontal_ratio, 2),
+                vertical_ratio=round(vertical_ratio, 2),
+                total_lines=total_lines,
             )
             return is_table
 
         except Exception as e:
-            print(f"⚠️ 表格结构检测失败: {e}")
+            log_event("⚠️ 表格结构检测失败", logging.WARNING, error=str(e))
             return False
 
     @staticmethod
@@ -678,14 +699,19 @@ class OCREngine:
                 >= OCREngine.DOCUMENT_TYPE_DETECTION_CONFIG["academic"]["threshold"]
             )
 
-            print(
-                f"📚 学术论文检测: 关键词匹配={keyword_matches}, 引用匹配={citation_matches}, "
-                f"章节匹配={section_matches}, 公式匹配={math_matches}, 总分={total_score}"
+            log_event(
+                "📚 学术论文检测",
+                logging.DEBUG,
+                keyword_matches=keyword_matches,
+                citation_matches=citation_matches,
+                section_matches=section_matches,
+                math_matches=math_matches,
+                total_score=total_score,
             )
             return is_academic
 
         except Exception as e:
-            print(f"⚠️ 学术论文特征检测失败: {e}")
+            log_event("⚠️ 学术论文特征检测失败", logging.WARNING, error=str(e))
             return False
 
     @staticmethod
@@ -731,14 +757,17 @@ class OCREngine:
                 ]
             )
 
-            print(
-                f"🇨🇳 纯中文检测: 中文字符比例={chinese_ratio:.2f}, "
-                f"英文字符比例={english_ratio:.2f}, 中文字符数={chinese_chars}"
+            log_event(
+                "🇨🇳 纯中文检测",
+                logging.DEBUG,
+                chinese_ratio=round(chinese_ratio, 2),
+                english_ratio=round(english_ratio, 2),
+                chinese_chars=chinese_chars,
             )
             return is_pure
 
         except Exception as e:
-            print(f"⚠️ 纯中文检测失败: {e}")
+            log_event("⚠️ 纯中文检测失败", logging.WARNING, error=str(e))
             return False
 
     @staticmethod
@@ -789,7 +818,7 @@ class OCREngine:
             return features
 
         except Exception as e:
-            print(f"⚠️ 文档特征分析失败: {e}")
+            log_event("⚠️ 文档特征分析失败", logging.WARNING, error=str(e))
             return {"document_type": "technical", "error": str(e)}
 
     # ==================== 配置选择方法 ====================
@@ -817,12 +846,15 @@ class OCREngine:
             document_type, OCREngine.DEFAULT_CHINESE_OCR_CONFIG
         )
 
-        print(f"🎯 智能配置选择: 文档类型={document_type}")
-        print(f"📋 选择配置: {selected_config['name']}")
-        print(f"📋 配置描述: {selected_config['description']}")
-        print(f"🔧 PSM模式: {selected_config['psm']}")
-        print(f"🔧 DPI设置: {selected_config['dpi']}")
-        print(f"🔧 语言模型: {selected_config['lang']}")
+        log_event(
+            "🎯 智能配置选择",
+            logging.DEBUG,
+            document_type=document_type,
+            config=selected_config["name"],
+            psm=selected_config["psm"],
+            dpi=selected_config["dpi"],
+            lang=selected_config["lang"],
+        )
 
         return selected_config
 
@@ -0,0 +1,185 @@
+"""
+PDF 预检
+上传后立即用 PyMuPDF 解析文档结构（不渲染页面）：页数、文本层、图片覆盖率、页面尺寸与加密状态，
+据此判断文档类型、推荐转换模式并估算成本；结果登记到任务清单，供准入控制与调度直接使用
+"""
+
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from utils.task_manifest import task_manifest
+from utils.admission import estimate_cost
+from utils.tracing import log_event
+
+# 图片占满的页面上至少包含多少字符才视为有可用文本层（避免把扫描页上的零星文字当作文本层）
+TEXT_LAYER_MIN_CHARS = int(os.getenv("PREFLIGHT_TEXT_MIN_CHARS", 50))
+
+# 无文本层且图片覆盖率不低于该值的页面视为扫描页
+SCANNED_IMAGE_COVERAGE = float(os.getenv("PREFLIGHT_SCANNED_IMAGE_COVERAGE", 0.6))
+
+# 文本页占比不低于该值时视为文本型文档
+TEXT_DOCUMENT_RATIO = 0.9
+
+
+def _image_coverage(page) -> Tuple[int, float]:
+    """页面中图片的数量与覆盖率（按图片外框面积累加，上限为1）"""
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    images = page.get_image_info()
+    if not images or page_area <= 0:
+        return len(images), 0.0
+
+    covered = 0.0
+    for image in images:
+        bbox = fitz.Rect(image["bbox"]) & page_rect
+        if not bbox.is_empty:
+            covered += bbox.width * bbox.height
+    return len(images), min(covered / page_area, 1.0)
+
+
+def _has_text_layer(text_chars: int, image_coverage: float) -> bool:
+    """判断页面是否有可用文本层"""
+    if text_chars >= TEXT_LAYER_MIN_CHARS:
+        return True
+    return text_chars > 0 and image_coverage < SCANNED_IMAGE_COVERAGE
+
+
+def _classify(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按逐页统计判断文档类型并推荐转换模式"""
+    if not pages:
+        return {"document_type": "empty", "recommended_mode": None}
+
+    text_pages = sum(1 for page in pages if page["has_text_layer"])
+    scanned_pages = sum(
+        1
+        for page in pages
+        if not page["has_text_layer"]
+        and page["image_coverage"] >= SCANNED_IMAGE_COVERAGE
+    )
+    text_ratio = text_pages / len(pages)
+
+    if text_ratio >= TEXT_DOCUMENT_RATIO:
+        document_type = "text"
+    elif text_pages == 0:
+        document_type = "scanned"
+    else:
+        document_type = "mixed"
+
+    return {
+        "document_type": document_type,
+        "recommended_mode": "marker" if text_ratio >= 0.5 else "ocr",
+        "text_pages": text_pages,
+        "scanned_pages": scanned_pages,
+        "text_ratio": round(text_ratio, 3),
+    }
+
+
+def analyze_pdf(pdf_path: str) -> Dict[str, Any]:
+    """
+    预检PDF文件（只读取文档结构与文本层，不光栅化页面）
+
+    Args:
+        pdf_path: PDF文件路径
+
+    Returns:
+        Dict[str, Any]: 预检报告
+    """
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as pdf_document:
+        report: Dict[str, Any] = {
+            "page_count": pdf_document.page_count,
+            "encrypted": bool(pdf_document.is_encrypted),
+            "needs_password": bool(pdf_document.needs_pass),
+            "metadata": {k: v for k, v in (pdf_document.metadata or {}).items() if v},
+        }
+
+        pages: List[Dict[str, Any]] = []
+        page_sizes: Dict[str, int] = {}
+        # 需要密码的文档无法读取页面内容
+        if not pdf_document.needs_pass:
+            for page in pdf_document:
+                text_chars = len(page.get_text("text").strip())
+                image_count, coverage = _image_coverage(page)
+                size = f"{round(page.rect.width)}x{round(page.rect.height)}"
+                page_sizes[size] = page_sizes.get(size, 0) + 1
+                pages.append(
+                    {
+                        "page": page.number + 1,
+                        "width": round(page.rect.width, 1),
+                        "height": round(page.rect.height, 1),
+                        "text_chars": text_chars,
+                        "has_text_layer": _has_text_layer(text_chars, coverage),
+                        "image_count": image_count,
+                        "image_coverage": round(coverage, 3),
+                    }
+                )
+
+    report.update(_classify(pages))
+    report["page_sizes"] = page_sizes
+    report["estimated_cost"] = {
+        mode: estimate_cost({"conversion_mode": mode}, report["page_count"]).to_dict()
+        for mode in ("marker", "ocr")
+    }
+    report["pages"] = pages
+    report["analysis_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return report
+
+
+class PreflightAnalyzer:
+    """预检器 - 分析上传文件并将结果登记到任务清单"""
+
+    def run(self, task_id: str, pdf_path: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        预检任务的上传文件并登记结果
+
+        Args:
+            task_id: 任务ID
+            pdf_path: 上传文件路径，为 None 时从任务清单查找
+
+        Returns:
+            Dict[str, Any]: 预检报告
+
+        Raises:
+            FileNotFoundError: 上传文件不存在
+        """
+        pdf_path = pdf_path or task_manifest.get_upload_path(task_id)
+        if pdf_path is None or not Path(pdf_path).exists():
+            raise FileNotFoundError(f"未找到任务 {task_id} 的上传文件")
+
+        report = analyze_pdf(str(pdf_path))
+        task_manifest.record_preflight(task_id, self.summarize(report), report["pages"])
+        log_event(
+            "🔎 预检完成",
+            task_id=task_id,
+            pages=report["page_count"],
+            document_type=report["document_type"],
+            analysis_ms=report["analysis_ms"],
+        )
+        return report
+
+    def get(self, task_id: str, pages: bool = True) -> Dict[str, Any]:
+        """获取预检结果，尚未预检（或需要的逐页明细缺失）时立即执行"""
+        report = task_manifest.get_preflight(task_id, pages) or self.run(task_id)
+        return report if pages else self.summarize(report)
+
+    def try_run(self, task_id: str, pdf_path: Path) -> Optional[Dict[str, Any]]:
+        """上传后自动预检，失败时只记录日志（转换时会重新读取文档）"""
+        try:
+            return self.run(task_id, pdf_path)
+        except Exception as e:
+            log_event("⚠️ 预检失败", logging.WARNING, task_id=task_id, error=str(e))
+            return None
+
+    @staticmethod
+    def summarize(report: Dict[str, Any]) -> Dict[str, Any]:
+        """去掉逐页明细的预检摘要"""
+        return {k: v for k, v in report.items() if k != "pages"}
+
+
+# 全局预检器实例
+preflight_analyzer = PreflightAnalyzer()
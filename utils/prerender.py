@@ -0,0 +1,148 @@
+"""
+推测性预渲染
+上传完成到用户点击转换之间服务器通常处于空闲，按预检结果提前把扫描型文档的前几页
+渲染为OCR所用分辨率的图片；转换时优先取用，未被使用的渲染结果过期或任务以其他模式转换时直接丢弃
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import fitz  # PyMuPDF
+
+from utils.metrics import record_cache, SPECULATION_DISCARDED
+from utils.tracing import log_event
+
+
+def speculation_enabled() -> bool:
+    """是否启用推测性预处理（预渲染与 Marker 预热）"""
+    return os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+
+
+class PrerenderCache:
+    """预渲染缓存 - 后台单线程渲染，按任务保存 PNG 数据"""
+
+    def __init__(self):
+        self.enabled = speculation_enabled()
+        # 每个任务预渲染的页数
+        self.pages = int(os.getenv("PRERENDER_PAGES", 3))
+        # 渲染结果的保留时间（秒）
+        self.ttl_seconds = float(os.getenv("PRERENDER_TTL_SECONDS", 300))
+        # 同时保留预渲染结果的任务数
+        self.max_tasks = int(os.getenv("PRERENDER_MAX_TASKS", 8))
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prerender"
+        )
+
+    def schedule(self, task_id: str, pdf_path: str, scale: float) -> bool:
+        """
+        安排预渲染任务文档的前几页
+
+        Args:
+            task_id: 任务ID
+            pdf_path: PDF文件路径
+            scale: 渲染缩放系数（与OCR渲染一致）
+
+        Returns:
+            bool: 是否已安排
+        """
+        if not self.enabled or self.pages <= 0:
+            return False
+
+        entry = {
+            "scale": scale,
+            "created_at": time.monotonic(),
+            "pages": {},
+            "stopped": False,
+        }
+        with self._lock:
+            self._evict_locked()
+            self._entries[task_id] = entry
+        self._executor.submit(self._render, task_id, entry, pdf_path)
+        return True
+
+    def _render(self, task_id: str, entry: Dict[str, Any], pdf_path: str) -> None:
+        """后台渲染（转换开始或结果被丢弃后停止）"""
+        rendered = 0
+        try:
+            with fitz.open(pdf_path) as pdf_document:
+                matrix = fitz.Matrix(entry["scale"], entry["scale"])
+                for page_num in range(min(self.pages, pdf_document.page_count)):
+                    if entry["stopped"]:
+                        break
+                    pix = pdf_document.load_page(page_num).get_pixmap(matrix=matrix)
+                    data = pix.tobytes("png")
+                    with self._lock:
+                        if entry["stopped"]:
+                            break
+                        entry["pages"][page_num] = data
+                    rendered += 1
+        except Exception as e:
+            log_event("⚠️ 预渲染失败", task_id=task_id, error=str(e))
+            return
+        log_event("🖼️ 预渲染完成", task_id=task_id, pages=rendered)
+
+    def take(self, task_id: str, page_num: int, scale: float) -> Optional[bytes]:
+        """
+        取出一页预渲染结果（取出后即从缓存删除）
+
+        Returns:
+            Optional[bytes]: PNG 数据，未命中时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return None
+            # 转换开始后不再继续渲染，避免与转换重复渲染同一页
+            entry["stopped"] = True
+            data = (
+                entry["pages"].pop(page_num, None) if entry["scale"] == scale else None
+            )
+        record_cache("prerender", data is not None)
+        return data
+
+    def discard(self, task_id: str) -> None:
+        """丢弃任务的预渲染结果"""
+        with self._lock:
+            entry = self._entries.pop(task_id, None)
+            if entry is None:
+                return
+            entry["stopped"] = True
+            unused = len(entry["pages"])
+        if unused:
+            SPECULATION_DISCARDED.inc(unused, kind="prerender_page")
+
+    def _evict_locked(self) -> None:
+        """清理过期结果，并在超出任务数上限时淘汰最早的任务"""
+        now = time.monotonic()
+        expired = [
+            task_id
+            for task_id, entry in self._entries.items()
+            if now - entry["created_at"] > self.ttl_seconds
+        ]
+        while len(self._entries) - len(expired) >= self.max_tasks:
+            oldest = next(t for t in self._entries if t not in expired)
+            expired.append(oldest)
+        for task_id in expired:
+            entry = self._entries.pop(task_id)
+            entry["stopped"] = True
+            if entry["pages"]:
+                SPECULATION_DISCARDED.inc(len(entry["pages"]), kind="prerender_page")
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            tasks: List[Dict[str, Any]] = [
+                {"task_id": task_id, "pages": sorted(entry["pages"])}
+                for task_id, entry in self._entries.items()
+            ]
+        return {"enabled": self.enabled, "pages_per_task": self.pages, "tasks": tasks}
+
+
+# 全局预渲染缓存实例
+prerender_cache = PrerenderCache()
@@ -0,0 +1,181 @@
+"""
+任务耗时剖析
+为单个转换任务记录结构化的耗时明细：每页各阶段耗时、Tesseract调用及所选OCR配置，
+保存为输出目录下的 profile.json；可按请求开启 cProfile 采集
+"""
+
+import io
+import json
+import time
+import pstats
+import cProfile
+import contextvars
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+PROFILE_FILENAME = "profile.json"
+CPROFILE_FILENAME = "profile.prof"
+CPROFILE_STATS_FILENAME = "profile_stats.txt"
+
+# cProfile 统计输出的函数数量
+CPROFILE_TOP_N = 50
+
+# 当前上下文中的任务剖析（asyncio.to_thread 会复制上下文到工作线程）
+_current_profile: contextvars.ContextVar[Optional["TaskProfile"]] = (
+    contextvars.ContextVar("current_task_profile", default=None)
+)
+
+
+class TaskProfile:
+    """单个任务的耗时剖析记录"""
+
+    def __init__(self, task_id: str, mode: str):
+        self.task_id = task_id
+        self.mode = mode
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+
+        self.stages: Dict[str, float] = {}
+        self.pages: Dict[int, Dict[str, Any]] = {}
+        self.current_page: Optional[int] = None
+        self.tesseract_calls = 0
+
+    # ==================== 记录方法 ====================
+
+    def start_page(self, page_number: int) -> None:
+        """开始记录新的一页"""
+        self.current_page = page_number
+        self.pages[page_number] = {
+            "stages": {},
+            "tesseract_calls": [],
+            "ocr_config": None,
+            "document_type": None,
+        }
+
+    def end_page(self) -> None:
+        """结束逐页记录，后续阶段仅计入任务总计"""
+        self.current_page = None
+
+    def _page(self) -> Optional[Dict[str, Any]]:
+        if self.current_page is None:
+            return None
+        return self.pages.get(self.current_page)
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        """记录阶段耗时（累加到任务总计与当前页）"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        page = self._page()
+        if page is not None:
+            page["stages"][stage] = page["stages"].get(stage, 0.0) + seconds
+
+    def record_tesseract(self, config_name: str, seconds: float) -> None:
+        """记录一次 Tesseract 调用"""
+        self.tesseract_calls += 1
+        page = self._page()
+        if page is not None:
+            page["tesseract_calls"].append(
+                {"config": config_name, "seconds": round(seconds, 4)}
+            )
+
+    def record_ocr_config(
+        self, config_name: str, document_type: Optional[str] = None
+    ) -> None:
+        """记录当前页选用的OCR配置"""
+        page = self._page()
+        if page is not None:
+            page["ocr_config"] = config_name
+            page["document_type"] = document_type
+
+    # ==================== 输出 ====================
+
+    def finish(self) -> None:
+        """结束计时"""
+        self.end_page()
+        self.total_seconds = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = (
+            self.total_seconds
+            if self.total_seconds is not None
+            else time.perf_counter() - self._start
+        )
+        config_counts: Dict[str, int] = {}
+        for page in self.pages.values():
+            if page["ocr_config"]:
+                config_counts[page["ocr_config"]] = (
+                    config_counts.get(page["ocr_config"], 0) + 1
+                )
+
+        return {
+            "task_id": self.task_id,
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "total_seconds": round(total, 4),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "tesseract_calls": self.tesseract_calls,
+            "ocr_configs": config_counts,
+            "pages": [
+                {
+                    "page": number,
+                    "stages": {k: round(v, 4) for k, v in page["stages"].items()},
+                    "tesseract_calls": page["tesseract_calls"],
+                    "ocr_config": page["ocr_config"],
+                    "document_type": page["document_type"],
+                }
+                for number, page in sorted(self.pages.items())
+            ],
+        }
+
+    def save(self, output_dir: Path) -> Path:
+        """保存到输出目录（与 metadata.json 同目录）"""
+        profile_file = Path(output_dir) / PROFILE_FILENAME
+        with open(profile_file, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return profile_file
+
+    @contextmanager
+    def activate(self) -> Iterator["TaskProfile"]:
+        """将该剖析设置为当前上下文的活动剖析"""
+        token = _current_profile.set(self)
+        try:
+            yield self
+        finally:
+            _current_profile.reset(token)
+
+
+def get_current_profile() -> Optional[TaskProfile]:
+    """获取当前上下文中的任务剖析"""
+    return _current_profile.get()
+
+
+@contextmanager
+def cprofile_capture(enabled: bool, output_dir: Path) -> Iterator[None]:
+    """
+    在当前线程中采集 cProfile 数据
+
+    Args:
+        enabled: 是否启用
+        output_dir: 输出目录，写入 profile.prof 与 profile_stats.txt
+    """
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        output_dir = Path(output_dir)
+        profiler.dump_stats(str(output_dir / CPROFILE_FILENAME))
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(CPROFILE_TOP_N)
+        (output_dir / CPROFILE_STATS_FILENAME).write_text(
+            stream.getvalue(), encoding="utf-8"
+        )
@@ -15,6 +15,14 @@ class ProgressManager:
             "error": None,
         }
 
+    def queue_task(self, task_id: str):
+        """任务进入排队状态"""
+        self.tasks[task_id] = {
+            "status": "queued",
+            "progress": 0.0,
+            "error": None,
+        }
+
     def update_progress(self, task_id: str, progress: float):
         """只更新进度"""
         if task_id not in self.tasks:
@@ -41,6 +49,19 @@ class ProgressManager:
 
         self.tasks[task_id].update({"status": "failed", "error": error})
 
+    def cancel_task(self, task_id: str, reason: str, partial: bool = False):
+        """任务已取消（partial 表示保留了已完成部分的输出）"""
+        if task_id not in self.tasks:
+            self.tasks[task_id] = {"progress": 0.0}
+
+        self.tasks[task_id].update(
+            {
+                "status": "cancelled",
+                "error": f"任务已取消: {reason}",
+                "partial": partial,
+            }
+        )
+
     def get_progress(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务进度"""
         return self.tasks.get(task_id)
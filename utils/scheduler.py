@@ -0,0 +1,143 @@
+"""
+调度策略
+为转换队列决定排队任务的启动顺序：
+按预计成本优先调度短任务，等待时间带来的老化补偿避免大任务饿死，
+并按客户端最近占用的服务时间进行公平分配
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict, List, TYPE_CHECKING
+
+from utils.tracing import log_event
+
+if TYPE_CHECKING:
+    from utils.task_queue import ConversionJob
+
+# 衰减后低于该值（秒）的客户端占用记录视为已清零并删除
+USAGE_EPSILON_SECONDS = 0.01
+
+
+class SchedulingPolicy:
+    """调度策略基类"""
+
+    name = "base"
+
+    def order(self, pending: List["ConversionJob"]) -> List["ConversionJob"]:
+        """返回排队任务的启动顺序"""
+        raise NotImplementedError
+
+    def on_start(self, job: "ConversionJob") -> None:
+        """任务开始运行时的回调"""
+
+    def get_status(self) -> Dict:
+        return {"policy": self.name}
+
+
+class FIFOPolicy(SchedulingPolicy):
+    """先进先出"""
+
+    name = "fifo"
+
+    def order(self, pending: List["ConversionJob"]) -> List["ConversionJob"]:
+        return sorted(pending, key=lambda job: job.submitted_at)
+
+
+class ShortestEstimatedJobFirstPolicy(SchedulingPolicy):
+    """
+    短任务优先 + 老化 + 客户端公平分配
+
+    任务优先级分数（越小越先运行）:
+        预计耗时 - 老化系数 × 已等待秒数 + 公平系数 × 客户端近期占用秒数
+    """
+
+    name = "sejf"
+
+    def __init__(self):
+        # 每等待1秒抵扣的预计耗时秒数
+        self.aging_factor = float(os.getenv("SCHEDULER_AGING_FACTOR", 1.0))
+        # 客户端近期占用服务时间的权重
+        self.fair_share_weight = float(os.getenv("SCHEDULER_FAIR_SHARE_WEIGHT", 0.5))
+        # 客户端占用时间的衰减半衰期（秒）
+        self.usage_half_life = float(os.getenv("SCHEDULER_USAGE_HALF_LIFE", 600))
+
+        self._lock = threading.Lock()
+        self._client_usage: Dict[str, float] = {}
+        self._usage_updated: Dict[str, float] = {}
+
+    def _decayed_usage(self, client_id: str, now: float) -> float:
+        """按半衰期衰减后的客户端占用时间"""
+        usage = self._client_usage.get(client_id, 0.0)
+        if not usage:
+            return 0.0
+        elapsed = now - self._usage_updated.get(client_id, now)
+        return usage * math.pow(0.5, elapsed / self.usage_half_life)
+
+    def _prune(self, now: float) -> None:
+        """删除已衰减到接近零的客户端记录，客户端数量不会无限增长"""
+        expired = [
+            client_id
+            for client_id in self._client_usage
+            if self._decayed_usage(client_id, now) < USAGE_EPSILON_SECONDS
+        ]
+        for client_id in expired:
+            self._client_usage.pop(client_id, None)
+            self._usage_updated.pop(client_id, None)
+
+    def score(self, job: "ConversionJob", now: float) -> float:
+        """计算任务优先级分数"""
+        waited = now - job.submitted_at
+        return (
+            job.cost.duration_seconds
+            - self.aging_factor * waited
+            + self.fair_share_weight * self._decayed_usage(job.client_id, now)
+        )
+
+    def order(self, pending: List["ConversionJob"]) -> List["ConversionJob"]:
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                pending, key=lambda job: (self.score(job, now), job.submitted_at)
+            )
+
+    def on_start(self, job: "ConversionJob") -> None:
+        """记录客户端占用的服务时间"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            usage = self._decayed_usage(job.client_id, now)
+            self._client_usage[job.client_id] = usage + job.cost.duration_seconds
+            self._usage_updated[job.client_id] = now
+
+    def get_status(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            return {
+                "policy": self.name,
+                "aging_factor": self.aging_factor,
+                "fair_share_weight": self.fair_share_weight,
+                "client_usage_seconds": {
+                    client_id: round(self._decayed_usage(client_id, now), 2)
+                    for client_id in self._client_usage
+                },
+            }
+
+
+SCHEDULING_POLICIES = {
+    FIFOPolicy.name: FIFOPolicy,
+    ShortestEstimatedJobFirstPolicy.name: ShortestEstimatedJobFirstPolicy,
+}
+
+
+def create_policy(name: str = None) -> SchedulingPolicy:
+    """根据名称创建调度策略，默认读取 SCHEDULER_POLICY 环境变量"""
+    name = name or os.getenv("SCHEDULER_POLICY", ShortestEstimatedJobFirstPolicy.name)
+    policy_class = SCHEDULING_POLICIES.get(name)
+    if policy_class is None:
+        log_event("⚠️ 未知调度策略，使用先进先出", logging.WARNING, policy=name)
+        policy_class = FIFOPolicy
+    return policy_class()
@@ -0,0 +1,141 @@
+"""
+流式 JSON 序列化
+文档树（Marker 的 JSON / chunks 输出）按字段与列表元素逐块编码并写入文件，
+不先构建整个文档的字典副本；pydantic 模型由 pydantic-core 直接编码，
+其他值优先使用 orjson（可选依赖），未安装时回退到标准库。默认紧凑输出，
+JSON_OUTPUT_PRETTY=true 时缩进；chunks 可按 JSON Lines 写出，每行一个块，便于流式读取
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 逐块编码的嵌套层数：文档 → 页面 → 块，更深的内容整体编码
+STREAM_DEPTH = 3
+
+# 缩进输出时每层的缩进
+INDENT = b"  "
+
+
+def pretty_output() -> bool:
+    """是否缩进输出 JSON（默认紧凑）"""
+    return os.getenv("JSON_OUTPUT_PRETTY", "false").lower() == "true"
+
+
+def chunks_as_jsonl() -> bool:
+    """chunks 是否以 JSON Lines 输出（CHUNKS_OUTPUT=jsonl）"""
+    return os.getenv("CHUNKS_OUTPUT", "json").lower() == "jsonl"
+
+
+def _default(value: Any) -> Any:
+    """编码器不支持的值：嵌套的 pydantic 模型转为字典，其他值转为字符串"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def encode(value: Any, pretty: bool = False) -> bytes:
+    """编码单个值为 UTF-8 JSON"""
+    if isinstance(value, BaseModel):
+        return value.model_dump_json(indent=2 if pretty else None).encode("utf-8")
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(value, default=_default, option=option)
+        except TypeError:
+            # orjson 不支持的值（如超出64位的整数）交给标准库
+            pass
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        default=_default,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+    ).encode("utf-8")
+
+
+def _fields(value: Any) -> Optional[Iterator[Tuple[str, Any]]]:
+    """对象的字段（pydantic 模型按 model_dump 的字段，跳过排除的字段），非对象返回 None"""
+    if isinstance(value, BaseModel):
+        return (
+            (name, getattr(value, name))
+            for name, field in type(value).model_fields.items()
+            if not field.exclude
+        )
+    if isinstance(value, dict):
+        return ((str(key), item) for key, item in value.items())
+    return None
+
+
+def iter_json(value: Any, pretty: bool = False, level: int = 0) -> Iterator[bytes]:
+    """
+    逐块产出 JSON 字节
+
+    Args:
+        value: pydantic 模型、字典、列表或其他可编码的值
+        pretty: 是否缩进
+        level: 当前嵌套层数
+    """
+    fields = _fields(value) if level < STREAM_DEPTH else None
+    is_list = isinstance(value, (list, tuple)) and level < STREAM_DEPTH
+    if fields is None and not is_list:
+        data = encode(value, pretty)
+        # 字符串中的换行已转义，缩进输出时可直接按层级补齐缩进
+        yield data.replace(b"\n", b"\n" + INDENT * level) if pretty else data
+        return
+
+    items = ((None, item) for item in value) if is_list else fields
+    newline = b"\n" + INDENT * (level + 1) if pretty else b""
+    separator = b": " if pretty else b":"
+    yield b"[" if is_list else b"{"
+    empty = True
+    for key, item in items:
+        yield newline if empty else b"," + newline
+        empty = False
+        if key is not None:
+            yield encode(key) + separator
+        yield from iter_json(item, pretty, level + 1)
+    if not empty and pretty:
+        yield b"\n" + INDENT * level
+    yield b"]" if is_list else b"}"
+
+
+def write_json(value: Any, path: Path, pretty: Optional[bool] = None) -> Path:
+    """流式写入 JSON 文件，pretty 为 None 时按 JSON_OUTPUT_PRETTY"""
+    pretty = pretty_output() if pretty is None else pretty
+    with open(path, "wb") as f:
+        for part in iter_json(value, pretty):
+            f.write(part)
+    return path
+
+
+def write_jsonl(value: Any, path: Path, list_field: str) -> Dict[str, Any]:
+    """
+    按 JSON Lines 写入对象的列表字段，每行一个元素
+
+    Args:
+        value: pydantic 模型或字典
+        path: 输出文件路径
+        list_field: 逐行写出的列表字段（如 chunks 的 blocks）
+
+    Returns:
+        Dict[str, Any]: 未写入文件的其他字段（由调用方另行保存）
+    """
+    rest = {}
+    with open(path, "wb") as f:
+        for key, item in _fields(value) or ():
+            if key != list_field:
+                rest[key] = json.loads(encode(item))
+                continue
+            for element in item or ():
+                f.write(encode(element))
+                f.write(b"\n")
+    return rest
@@ -0,0 +1,478 @@
+"""
+任务清单索引
+为每个任务维护一份清单记录（上传文件、各格式输出文件、图片、大小、校验和），
+按任务ID直接定位文件，避免对 uploads/ 与 outputs/ 目录做 glob 扫描
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+
+from utils.metrics import record_cache
+from utils.tracing import log_event
+
+# 校验和计算的分块大小
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+# 迁移完成标记文件
+MIGRATION_MARKER = ".migrated"
+
+# 访问时间的最小刷新间隔（秒），避免每次读取都写清单文件
+TOUCH_INTERVAL_SECONDS = 60
+
+
+def compute_checksum(file_path: Path) -> str:
+    """分块计算文件的 SHA-256 校验和"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_output_format(file_path: Path) -> Optional[str]:
+    """根据输出文件名推断输出格式"""
+    name = file_path.name
+    if name == "metadata.json":
+        return None
+    if name.endswith(("_chunks.json", "_chunks.jsonl")):
+        return "chunks"
+    suffix_mapping = {
+        ".md": "markdown",
+        ".json": "json",
+        ".html": "html",
+        ".txt": "text",
+    }
+    return suffix_mapping.get(file_path.suffix.lower())
+
+
+class TaskManifest:
+    """任务清单管理器 - 每个任务一个JSON记录，按任务ID O(1) 查找"""
+
+    def __init__(self, manifest_folder: Optional[Path] = None):
+        self.manifest_folder = Path(
+            manifest_folder or os.getenv("MANIFEST_DIR", "manifests")
+        )
+        self.manifest_folder.mkdir(parents=True, exist_ok=True)
+
+        # 最近使用的清单记录缓存（LRU），避免重复读取清单文件；
+        # 任务数可达数十万，缓存只保留最近使用的记录，其余按需读取（每次一个文件）
+        self.cache_size = int(os.getenv("MANIFEST_CACHE_SIZE", 1024))
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    # ==================== 基础读写 ====================
+
+    def _record_path(self, task_id: str) -> Path:
+        """清单文件路径 - 按任务ID前两位分桶，避免单目录文件过多"""
+        return self.manifest_folder / task_id[:2] / f"{task_id}.json"
+
+    def _preflight_pages_path(self, task_id: str) -> Path:
+        """预检逐页明细文件路径（与清单记录分开保存，不进入缓存）"""
+        return self.manifest_folder / task_id[:2] / f"{task_id}.preflight"
+
+    @staticmethod
+    def _atomic_write_json(path: Path, data: Any, indent: Optional[int] = None):
+        """原子写入JSON文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp_path, path)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """原子写入清单记录"""
+        self._atomic_write_json(self._record_path(record["task_id"]), record, indent=2)
+        self._cache(record)
+
+    def _cache(self, record: Dict[str, Any]) -> None:
+        """放入LRU缓存，超出容量时淘汰最久未使用的记录"""
+        self._records[record["task_id"]] = record
+        self._records.move_to_end(record["task_id"])
+        while len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务清单记录"""
+        with self._lock:
+            record = self._records.get(task_id)
+            record_cache("manifest", record is not None)
+            if record is not None:
+                self._records.move_to_end(task_id)
+                return record
+
+            record = self._read_record_file(self._record_path(task_id))
+            if record is not None:
+                self._cache(record)
+            return record
+
+    @staticmethod
+    def _read_record_file(record_path: Path) -> Optional[Dict[str, Any]]:
+        """读取清单文件"""
+        if not record_path.exists():
+            return None
+
+        try:
+            with open(record_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log_event(
+                "⚠️ 读取任务清单失败",
+                logging.WARNING,
+                task_id=record_path.stem,
+                error=str(e),
+            )
+            return None
+
+    def _get_or_create(self, task_id: str) -> Dict[str, Any]:
+        """获取或新建任务清单记录"""
+        record = self.get(task_id)
+        if record is None:
+            now = datetime.now().isoformat()
+            record = {
+                "task_id": task_id,
+                "created_at": now,
+                "updated_at": now,
+                "last_accessed": now,
+                "pinned": False,
+                "input": None,
+                "preflight": None,
+                "outputs": {},
+                "primary_output": None,
+                "metadata_file": None,
+                "images": [],
+            }
+        return record
+
+    @staticmethod
+    def _describe_file(file_path: Path, checksum: Optional[str] = None) -> dict:
+        """生成文件描述信息"""
+        return {
+            "path": str(file_path),
+            "size": file_path.stat().st_size,
+            "sha256": checksum or compute_checksum(file_path),
+        }
+
+    # ==================== 记录更新 ====================
+
+    def register_upload(
+        self,
+        task_id: str,
+        file_path: Path,
+        filename: str,
+        checksum: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        登记上传文件
+
+        Args:
+            task_id: 任务ID
+            file_path: 上传文件保存路径
+            filename: 原始文件名
+            checksum: 已计算好的校验和（可选）
+
+        Returns:
+            更新后的清单记录
+        """
+        with self._lock:
+            record = self._get_or_create(task_id)
+            record["input"] = {
+                "filename": filename,
+                **self._describe_file(Path(file_path), checksum),
+            }
+            record["updated_at"] = datetime.now().isoformat()
+            self._write(record)
+            return record
+
+    def record_preflight(
+        self,
+        task_id: str,
+        summary: Dict[str, Any],
+        pages: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        登记上传文件的预检结果
+
+        Args:
+            task_id: 任务ID
+            summary: 去掉逐页明细的预检摘要（保存在清单记录中）
+            pages: 逐页明细（单独保存，只在查询明细时读取）
+        """
+        with self._lock:
+            if pages is not None:
+                self._atomic_write_json(self._preflight_pages_path(task_id), pages)
+            record = self._get_or_create(task_id)
+            record["preflight"] = summary
+            record["updated_at"] = datetime.now().isoformat()
+            self._write(record)
+
+    def record_outputs(
+        self,
+        task_id: str,
+        output_files: Iterable[str],
+        image_paths: Optional[Iterable[str]] = None,
+        metadata_file: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        登记转换输出
+
+        Args:
+            task_id: 任务ID
+            output_files: 输出文件路径列表，第一个视为主输出
+            image_paths: 图片文件路径列表
+            metadata_file: 元数据文件路径
+
+        Returns:
+            更新后的清单记录
+        """
+        with self._lock:
+            record = self._get_or_create(task_id)
+
+            primary_output = None
+            for output_file in output_files:
+                if not output_file:
+                    continue
+                output_path = Path(output_file)
+                output_format = detect_output_format(output_path)
+                if output_format is None or not output_path.exists():
+                    continue
+                record["outputs"][output_format] = self._describe_file(output_path)
+                if primary_output is None:
+                    primary_output = output_format
+
+            # 重新转换为其他格式时主输出随本次转换更新
+            if primary_output is not None:
+                record["primary_output"] = primary_output
+
+            if image_paths is not None:
+                record["images"] = [
+                    {"name": Path(p).name, **self._describe_file(Path(p))}
+                    for p in image_paths
+                    if Path(p).exists()
+                ]
+
+            if metadata_file:
+                record["metadata_file"] = str(metadata_file)
+
+            record["updated_at"] = datetime.now().isoformat()
+            self._write(record)
+            return record
+
+    def remove(self, task_id: str) -> None:
+        """删除任务清单记录"""
+        with self._lock:
+            self._records.pop(task_id, None)
+            self._record_path(task_id).unlink(missing_ok=True)
+            self._preflight_pages_path(task_id).unlink(missing_ok=True)
+
+    def clear_input(self, task_id: str) -> None:
+        """上传文件被回收后清除输入登记"""
+        with self._lock:
+            record = self.get(task_id)
+            if record is None or record.get("input") is None:
+                return
+            record["input"] = None
+            record["updated_at"] = datetime.now().isoformat()
+            self._write(record)
+
+    def touch(self, task_id: str) -> None:
+        """刷新任务的最近访问时间（用于LRU淘汰）"""
+        with self._lock:
+            record = self.get(task_id)
+            if record is None:
+                return
+            now = datetime.now()
+            last_accessed = record.get("last_accessed") or record["created_at"]
+            elapsed = now - datetime.fromisoformat(last_accessed)
+            if elapsed.total_seconds() < TOUCH_INTERVAL_SECONDS:
+                return
+            record["last_accessed"] = now.isoformat()
+            self._write(record)
+
+    def set_pinned(self, task_id: str, pinned: bool) -> Optional[Dict[str, Any]]:
+        """固定/取消固定任务，固定的任务不会被自动清理"""
+        with self._lock:
+            record = self.get(task_id)
+            if record is None:
+                return None
+            record["pinned"] = pinned
+            record["updated_at"] = datetime.now().isoformat()
+            self._write(record)
+            return record
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """遍历全部清单记录（仅供后台任务使用）"""
+        for bucket in self.manifest_folder.iterdir():
+            if not bucket.is_dir():
+                continue
+            for record_path in bucket.glob("*.json"):
+                # 优先使用缓存，未缓存的记录直接读取而不放入缓存
+                record = self._records.get(record_path.stem)
+                if record is None:
+                    record = self._read_record_file(record_path)
+                if record is not None:
+                    yield record
+
+    # ==================== 查询方法 ====================
+
+    def get_upload_path(self, task_id: str) -> Optional[Path]:
+        """获取任务的上传文件路径"""
+        record = self.get(task_id)
+        if not record or not record.get("input"):
+            return None
+        return Path(record["input"]["path"])
+
+    def get_preflight(
+        self, task_id: str, pages: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取任务的预检结果，未预检时返回 None
+
+        Args:
+            task_id: 任务ID
+            pages: 是否附带逐页明细（明细文件缺失时返回 None，由调用方重新预检）
+        """
+        record = self.get(task_id)
+        preflight = record.get("preflight") if record else None
+        if preflight is None:
+            return None
+        # 旧版本的清单记录直接包含逐页明细
+        if "pages" in preflight:
+            if pages:
+                return preflight
+            return {k: v for k, v in preflight.items() if k != "pages"}
+        if not pages:
+            return preflight
+
+        pages_path = self._preflight_pages_path(task_id)
+        if not pages_path.exists():
+            return None
+        try:
+            with open(pages_path, "r", encoding="utf-8") as f:
+                return {**preflight, "pages": json.load(f)}
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def get_output_file(
+        self, task_id: str, output_format: Optional[str] = None
+    ) -> Optional[Path]:
+        """
+        获取任务输出文件路径
+
+        Args:
+            task_id: 任务ID
+            output_format: 输出格式，为 None 时返回主输出
+
+        Returns:
+            输出文件路径，未登记或任务未生成指定格式时返回 None
+        """
+        record = self.get(task_id)
+        if not record or not record["outputs"]:
+            return None
+
+        if output_format == "md":
+            output_format = "markdown"
+
+        entry = record["outputs"].get(output_format or record["primary_output"])
+        return Path(entry["path"]) if entry else None
+
+    def get_images(self, task_id: str) -> List[Dict[str, Any]]:
+        """获取任务图片列表"""
+        record = self.get(task_id)
+        return record["images"] if record else []
+
+    # ==================== 目录迁移 ====================
+
+    def migrate_existing_directories(
+        self, upload_folder: Path, output_folder: Path
+    ) -> int:
+        """
+        为已有的上传与输出目录建立清单索引（一次性迁移）
+
+        Args:
+            upload_folder: 上传目录
+            output_folder: 输出目录
+
+        Returns:
+            新建立索引的任务数量
+        """
+        indexed = set()
+
+        if upload_folder.exists():
+            for file_path in upload_folder.iterdir():
+                if not file_path.is_file() or "_" not in file_path.name:
+                    continue
+                task_id, filename = file_path.name.split("_", 1)
+                record = self.get(task_id)
+                if record and record.get("input"):
+                    continue
+                self.register_upload(task_id, file_path, filename)
+                indexed.add(task_id)
+
+        if output_folder.exists():
+            for output_dir in output_folder.iterdir():
+                if not output_dir.is_dir():
+                    continue
+                task_id = output_dir.name
+                record = self.get(task_id)
+                if record and record["outputs"]:
+                    continue
+
+                output_files = sorted(
+                    p
+                    for p in output_dir.iterdir()
+                    if p.is_file() and detect_output_format(p)
+                )
+                image_dir = output_dir / "images"
+                image_paths = (
+                    sorted(str(p) for p in image_dir.iterdir() if p.is_file())
+                    if image_dir.exists()
+                    else []
+                )
+                metadata_file = output_dir / "metadata.json"
+
+                if not output_files and not image_paths:
+                    continue
+
+                self.record_outputs(
+                    task_id,
+                    [str(p) for p in output_files],
+                    image_paths=image_paths,
+                    metadata_file=(
+                        str(metadata_file) if metadata_file.exists() else None
+                    ),
+                )
+                indexed.add(task_id)
+
+        return len(indexed)
+
+    def ensure_migrated(self, upload_folder: Path, output_folder: Path) -> int:
+        """仅在首次启动时执行目录迁移"""
+        marker = self.manifest_folder / MIGRATION_MARKER
+        if marker.exists():
+            return 0
+
+        count = self.migrate_existing_directories(upload_folder, output_folder)
+        marker.write_text(datetime.now().isoformat(), encoding="utf-8")
+        log_event("🗂️ 任务清单迁移完成", indexed_tasks=count)
+        return count
+
+
+# 全局任务清单实例
+task_manifest = TaskManifest()
+
+
+if __name__ == "__main__":
+    from utils.file_handler import FileHandler
+
+    handler = FileHandler()
+    total = task_manifest.migrate_existing_directories(
+        handler.upload_folder, handler.output_folder
+    )
+    print(f"🗂️ 已建立索引的任务数量: {total}")
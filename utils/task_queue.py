@@ -0,0 +1,261 @@
+"""
+转换任务队列
+限制同时运行的转换任务数量，其余任务排队等待并按调度策略决定启动顺序；
+结合准入控制在内存预算允许、设备调度器有空闲设备、CPU 线程预算允许时才启动任务，
+并提供队列预计排空时间
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+from utils.admission import admission_controller, JobCost
+from utils.cancellation import cancellation_registry, REASON_USER
+from utils.cpu_budget import cpu_budget
+from utils.devices import device_scheduler
+from utils.progress import progress_manager
+from utils.scheduler import SchedulingPolicy, create_policy
+from utils.metrics import metrics_registry, CONVERSION_SECONDS, CONVERSIONS_TOTAL
+from utils.tracing import tracer, log_event, Span
+
+
+@dataclass
+class ConversionJob:
+    """排队中的转换任务"""
+
+    task_id: str
+    func: Callable[..., Awaitable[Dict[str, Any]]]
+    kwargs: Dict[str, Any]
+    cost: JobCost
+    client_id: str = "anonymous"
+    batch_id: Optional[str] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+
+    @property
+    def gpu_config(self) -> Optional[Dict[str, Any]]:
+        return self.kwargs.get("config", {}).get("gpu_config")
+
+
+class ConversionQueue:
+    """转换任务队列 - 控制并发并跟踪排队状态"""
+
+    def __init__(self, policy: Optional[SchedulingPolicy] = None):
+        self.max_concurrent = int(os.getenv("MAX_CONCURRENT_JOBS", 2))
+        # 批次连续调度的让步上限：队首任务等待超过该秒数时不再优先同批次任务
+        self.batch_affinity_max_wait = float(
+            os.getenv("BATCH_AFFINITY_MAX_WAIT_SECONDS", 300)
+        )
+        self.policy = policy or create_policy()
+        self.pending: List[ConversionJob] = []
+        self.running: Dict[str, ConversionJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # ==================== 提交与调度 ====================
+
+    def submit(self, job: ConversionJob) -> int:
+        """
+        提交任务到队列
+
+        Returns:
+            int: 任务在队列中的位置（0 表示立即开始）
+        """
+        self.pending.append(job)
+        progress_manager.queue_task(job.task_id)
+        self._dispatch()
+        return self.position(job.task_id)
+
+    def submit_many(self, jobs: List[ConversionJob]) -> None:
+        """批量提交任务（全部入队后统一调度）"""
+        for job in jobs:
+            self.pending.append(job)
+            progress_manager.queue_task(job.task_id)
+        self._dispatch()
+
+    def _select_next(self, batch_id: Optional[str] = None) -> Optional[ConversionJob]:
+        """
+        按调度策略选择下一个可启动的任务
+
+        Args:
+            batch_id: 刚结束任务所属的批次，同批次任务优先启动以复用已加载的模型与OCR配置
+        """
+        if not cpu_budget.can_start():
+            return None
+        ordered = self.policy.order(self.pending)
+        if batch_id and ordered:
+            waited = time.monotonic() - ordered[0].submitted_at
+            if waited < self.batch_affinity_max_wait:
+                ordered.sort(key=lambda job: job.batch_id != batch_id)
+        for job in ordered:
+            if admission_controller.can_start(
+                job.task_id
+            ) and device_scheduler.can_start(job.gpu_config):
+                return job
+        return None
+
+    def _dispatch(self, batch_id: Optional[str] = None) -> None:
+        """在并发与内存预算允许时启动排队任务"""
+        while len(self.running) < self.max_concurrent and self.pending:
+            job = self._select_next(batch_id)
+            if job is None:
+                break
+            self.pending.remove(job)
+            job.started_at = time.monotonic()
+            self._record_queue_wait(job)
+            self.running[job.task_id] = job
+            cancellation_registry.create(job.task_id, job.cost.mode)
+            admission_controller.mark_running(job.task_id)
+            device_scheduler.acquire(job.task_id, job.gpu_config)
+            cpu_budget.acquire(job.task_id)
+            self.policy.on_start(job)
+            self._tasks[job.task_id] = asyncio.get_running_loop().create_task(
+                self._run(job)
+            )
+
+    def _record_queue_wait(self, job: ConversionJob) -> None:
+        """记录任务的排队等待 span"""
+        now = time.time()
+        waited = job.started_at - job.submitted_at
+        tracer.record_span(
+            "queue.wait",
+            now - waited,
+            now,
+            task_id=job.task_id,
+            client_id=job.client_id,
+            estimated_seconds=round(job.cost.duration_seconds, 2),
+        )
+
+    async def _run(self, job: ConversionJob) -> None:
+        """执行任务并在结束后释放资源"""
+        with tracer.span(
+            "convert",
+            root=True,
+            task_id=job.task_id,
+            mode=job.cost.mode,
+            pages=job.cost.pages,
+            client_id=job.client_id,
+        ) as span:
+            try:
+                await job.func(**job.kwargs)
+            except Exception as e:
+                log_event("❌ 转换任务异常", logging.ERROR, error=str(e))
+                progress_manager.fail_task(job.task_id, f"转换失败: {str(e)}")
+            finally:
+                self._finish(job, span)
+
+    def _finish(self, job: ConversionJob, span: Span) -> None:
+        """记录任务结果并释放资源"""
+        task_data = progress_manager.get_progress(job.task_id) or {}
+        status = task_data.get("status", "unknown")
+        span.set_attribute("status", status)
+        if status == "failed":
+            span.set_error(task_data.get("error", ""))
+
+        CONVERSION_SECONDS.observe(
+            time.monotonic() - job.started_at, mode=job.cost.mode
+        )
+        CONVERSIONS_TOTAL.inc(mode=job.cost.mode, status=status)
+        self.running.pop(job.task_id, None)
+        self._tasks.pop(job.task_id, None)
+        cancellation_registry.remove(job.task_id)
+        admission_controller.release(job.task_id)
+        device_scheduler.release(job.task_id)
+        cpu_budget.release(job.task_id)
+        self._dispatch(job.batch_id)
+
+    def cancel(self, task_id: str, keep_partial: bool = False) -> Optional[str]:
+        """
+        取消任务：排队中的任务直接移出队列，运行中的任务通过取消令牌停止
+
+        Returns:
+            Optional[str]: "queued" / "running"，任务不在队列中时返回 None
+        """
+        for job in self.pending:
+            if job.task_id == task_id:
+                self.pending.remove(job)
+                admission_controller.release(task_id)
+                progress_manager.cancel_task(task_id, REASON_USER)
+                CONVERSIONS_TOTAL.inc(mode=job.cost.mode, status="cancelled")
+                log_event("⏹️ 已取消排队任务", task_id=task_id)
+                self._dispatch()
+                return "queued"
+
+        if task_id in self.running:
+            cancellation_registry.cancel(task_id, REASON_USER, keep_partial)
+            log_event("⏹️ 已请求取消运行中的任务", task_id=task_id)
+            return "running"
+
+        return None
+
+    # ==================== 状态查询 ====================
+
+    def position(self, task_id: str) -> int:
+        """任务在队列中的位置，运行中或不存在时返回 0"""
+        for index, job in enumerate(self.policy.order(self.pending)):
+            if job.task_id == task_id:
+                return index + 1
+        return 0
+
+    def projected_finish_times(self) -> List[Tuple[str, float]]:
+        """
+        按当前调度顺序模拟各任务的预计完成时间
+
+        Returns:
+            List[Tuple[str, float]]: [(任务ID, 距现在的秒数)]
+        """
+        now = time.monotonic()
+        slots = []
+        finish_times = []
+
+        for job in self.running.values():
+            elapsed = now - (job.started_at or now)
+            remaining = max(job.cost.duration_seconds - elapsed, 0.0)
+            slots.append(remaining)
+            finish_times.append((job.task_id, remaining))
+
+        slots.extend([0.0] * max(self.max_concurrent - len(slots), 0))
+        for job in self.policy.order(self.pending):
+            slots.sort()
+            finish = slots[0] + job.cost.duration_seconds
+            slots[0] = finish
+            finish_times.append((job.task_id, finish))
+
+        return finish_times
+
+    def projected_drain_seconds(self) -> float:
+        """队列预计排空时间"""
+        return max((f for _, f in self.projected_finish_times()), default=0.0)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取队列状态"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "scheduler": self.policy.get_status(),
+            "running": list(self.running.keys()),
+            "pending": [job.task_id for job in self.policy.order(self.pending)],
+            "queue_depth": len(self.pending),
+            "projected_drain_seconds": self.projected_drain_seconds(),
+        }
+
+
+# 全局转换队列实例
+conversion_queue = ConversionQueue()
+
+metrics_registry.gauge(
+    "conversion_queue_depth",
+    "排队等待的转换任务数",
+    callback=lambda: len(conversion_queue.pending),
+)
+metrics_registry.gauge(
+    "conversion_workers_busy",
+    "运行中的转换任务数",
+    callback=lambda: len(conversion_queue.running),
+)
+metrics_registry.gauge(
+    "conversion_worker_utilization",
+    "转换并发槽位利用率",
+    callback=lambda: len(conversion_queue.running) / conversion_queue.max_concurrent,
+)
@@ -0,0 +1,245 @@
+"""
+链路追踪
+OpenTelemetry 风格的轻量 span 实现：覆盖 上传 → 排队等待 → 转换 → 逐页阶段 → 保存，
+同一任务的所有 span 以 task_id 派生同一 trace_id，并统一携带 task_id 属性；
+已结束的 span 以 JSON Lines 导出到本地文件（可作为采集器的替身），并保留最近的 span 供查询
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import contextvars
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+logger = logging.getLogger("textprocess")
+
+# 当前上下文中的活动 span（asyncio.to_thread 会复制上下文到工作线程）
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def trace_id_for_task(task_id: Optional[str]) -> str:
+    """由任务ID派生 trace_id，使同一任务跨请求的 span 归入同一条链路"""
+    if not task_id:
+        return uuid.uuid4().hex
+    compact = task_id.replace("-", "").lower()
+    if len(compact) == 32 and all(c in "0123456789abcdef" for c in compact):
+        return compact
+    return hashlib.sha256(task_id.encode("utf-8")).hexdigest()[:32]
+
+
+class Span:
+    """单个 span"""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time: Optional[float] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.start_time = start_time if start_time is not None else time.time()
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+        self.status_message: Optional[str] = None
+
+    @property
+    def task_id(self) -> Optional[str]:
+        return self.attributes.get("task_id")
+
+    @property
+    def duration_seconds(self) -> float:
+        end = self.end_time if self.end_time is not None else time.time()
+        return end - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append(
+            {"name": name, "time": time.time(), "attributes": attributes}
+        )
+
+    def set_error(self, message: str) -> None:
+        self.status = "error"
+        self.status_message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": int(self.start_time * 1e9),
+            "endTimeUnixNano": int((self.end_time or time.time()) * 1e9),
+            "durationMs": round(self.duration_seconds * 1000, 3),
+            "attributes": self.attributes,
+            "events": [
+                {
+                    "name": event["name"],
+                    "timeUnixNano": int(event["time"] * 1e9),
+                    "attributes": event["attributes"],
+                }
+                for event in self.events
+            ],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class JsonlSpanExporter:
+    """将已结束的 span 追加写入 JSON Lines 文件，超过大小上限时轮转"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                    os.replace(self.path, self.path.with_suffix(".jsonl.1"))
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"⚠️ 追踪数据导出失败: {e}")
+
+
+class Tracer:
+    """追踪器 - 创建 span 并在结束时导出"""
+
+    def __init__(self):
+        self.enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        export_path = os.getenv("TRACE_EXPORT_PATH", "./logs/traces.jsonl")
+        max_mb = float(os.getenv("TRACE_EXPORT_MAX_MB", 50))
+        self.exporter = (
+            JsonlSpanExporter(export_path, int(max_mb * 1024 * 1024))
+            if export_path
+            else None
+        )
+        # 最近结束的 span，供按任务查询
+        self._recent: deque = deque(maxlen=int(os.getenv("TRACE_BUFFER_SIZE", 5000)))
+        self._lock = threading.Lock()
+
+    def _new_span(
+        self,
+        name: str,
+        attributes: Dict[str, Any],
+        start_time: Optional[float],
+        root: bool,
+    ) -> Span:
+        parent = None if root else _current_span.get()
+        # 子 span 继承父 span 的 task_id，保证属性一致
+        if parent is not None and "task_id" not in attributes and parent.task_id:
+            attributes["task_id"] = parent.task_id
+        if parent is not None and parent.task_id == attributes.get("task_id"):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = trace_id_for_task(attributes.get("task_id")), None
+        return Span(name, trace_id, parent_id, attributes, start_time)
+
+    def end_span(self, span: Span, end_time: Optional[float] = None) -> None:
+        """结束 span 并导出"""
+        span.end_time = end_time if end_time is not None else time.time()
+        if not self.enabled:
+            return
+        with self._lock:
+            self._recent.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, root: bool = False, **attributes) -> Iterator[Span]:
+        """
+        在当前上下文中开启一个 span，异常时标记为错误
+
+        Args:
+            name: span 名称
+            root: 是否作为任务链路的顶层 span（不挂到当前 span 下）
+            **attributes: span 属性
+        """
+        span = self._new_span(name, attributes, None, root)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def record_span(
+        self, name: str, start_time: float, end_time: float, **attributes
+    ) -> Span:
+        """记录一个已知起止时间的顶层 span（如排队等待）"""
+        span = self._new_span(name, attributes, start_time, root=True)
+        self.end_span(span, end_time)
+        return span
+
+    def get_task_spans(self, task_id: str) -> List[Dict[str, Any]]:
+        """获取任务最近的 span（按开始时间排序）"""
+        with self._lock:
+            spans = [s for s in self._recent if s.task_id == task_id]
+        return [s.to_dict() for s in sorted(spans, key=lambda s: s.start_time)]
+
+    def summarize_task(self, task_id: str) -> Dict[str, Any]:
+        """汇总任务的等待与处理耗时"""
+        spans = self.get_task_spans(task_id)
+        totals: Dict[str, float] = {}
+        for span in spans:
+            if span["parentSpanId"] is None:
+                totals[span["name"]] = (
+                    totals.get(span["name"], 0.0) + span["durationMs"] / 1000
+                )
+        return {
+            "task_id": task_id,
+            "trace_id": trace_id_for_task(task_id),
+            "root_spans_seconds": {k: round(v, 4) for k, v in totals.items()},
+            "spans": spans,
+        }
+
+
+def get_current_span() -> Optional[Span]:
+    """获取当前上下文中的活动 span"""
+    return _current_span.get()
+
+
+def log_event(message: str, level: int = logging.INFO, **attributes) -> None:
+    """
+    记录日志事件：写入当前 span 的事件列表，并带上 task_id 输出日志
+
+    Args:
+        message: 事件描述
+        level: 日志级别
+        **attributes: 附加属性
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.add_event(message, **attributes)
+
+    task_id = attributes.get("task_id") or (span.task_id if span else None)
+    prefix = f"[{task_id}] " if task_id else ""
+    details = " ".join(f"{k}={v}" for k, v in attributes.items() if k != "task_id")
+    logger.log(level, f"{prefix}{message}" + (f" ({details})" if details else ""))
+
+
+# 全局追踪器实例
+tracer = Tracer()